@@ -1,19 +1,28 @@
-import sqlite3
 import tkinter as tk
-from tkinter import ttk, messagebox
-import subprocess  # To open homepage.py
+from tkinter import ttk, messagebox, filedialog
+import migrations
+import data_access
+import export
+import diagnostics
+import search
+from db_worker import DBWorker, show_db_error
+from virtual_grid import VirtualGrid
+from datetime import date, timedelta
 
 class AdminPanel:
-    def __init__(self, root):
+    # Analytics period -> days of history (None = everything)
+    ANALYTICS_PERIODS = {"Last 4 weeks": 28, "Last 12 weeks": 84, "Last 52 weeks": 364, "All time": None}
+
+    def __init__(self, root, db, user=None):
         self.root = root
-        self.root.title("Admin Panel - Hotel Food Donation System")
-        self.root.geometry("1100x550")
+        self.user = user
 
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.container = tk.Frame(self.root)
+        self.container.pack(fill=tk.BOTH, expand=True)
 
         # Header
         self.header_label = tk.Label(
-            self.root,
+            self.container,
             text="Admin - Hotel Food Donation Management System",
             font=("Arial", 16, "bold"),
             fg="black",
@@ -22,15 +31,11 @@ class AdminPanel:
         )
         self.header_label.pack(fill=tk.X)
 
-        # Database connections
-        self.conn_users = sqlite3.connect("users.db")
-        self.cursor_users = self.conn_users.cursor()
-
-        self.conn_food = sqlite3.connect("hotel_food_donation.db")
-        self.cursor_food = self.conn_food.cursor()
+        # Database worker; callbacks are dropped once the panel is closed
+        self.db = db.scoped(self.container)
 
         # Tabs
-        self.tab_control = ttk.Notebook(self.root)
+        self.tab_control = ttk.Notebook(self.container)
 
         # -------------------- Manage Users Tab -------------------- #
         self.user_tab = ttk.Frame(self.tab_control)
@@ -48,10 +53,19 @@ class AdminPanel:
         self.user_show_all_btn = tk.Button(self.user_search_frame, text="Show All", command=self.load_users)
         self.user_show_all_btn.pack(side=tk.LEFT, padx=5)
 
-        self.user_tree = ttk.Treeview(self.user_tab, columns=("ID", "Name", "Email", "Phone", "Role", "Address", "Organization"), show="headings")
+        self.user_export_btn = tk.Button(self.user_search_frame, text="Export...", command=self.export_users)
+        self.user_export_btn.pack(side=tk.RIGHT, padx=5)
+
+        self.user_tree_frame = tk.Frame(self.user_tab)
+        self.user_tree_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.user_tree = ttk.Treeview(self.user_tree_frame, columns=("ID", "Name", "Email", "Phone", "Role", "Address", "Organization"), show="headings")
         for col in ("ID", "Name", "Email", "Phone", "Role", "Address", "Organization"):
             self.user_tree.heading(col, text=col)
+        self.user_scrollbar = ttk.Scrollbar(self.user_tree_frame, orient="vertical", command=self.user_tree.yview)
+        self.user_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.user_tree.pack(fill=tk.BOTH, expand=True)
+        self.user_grid = VirtualGrid(self.user_tree, self.fetch_users_page, self.fetch_user, scrollbar=self.user_scrollbar)
 
         self.delete_user_button = tk.Button(self.user_tab, text="Delete User", command=self.delete_user, bg="red", fg="white")
         self.delete_user_button.pack(side=tk.LEFT, padx=10, pady=5)
@@ -59,6 +73,9 @@ class AdminPanel:
         self.update_user_button = tk.Button(self.user_tab, text="Update User", command=self.update_user, bg="green", fg="white")
         self.update_user_button.pack(side=tk.LEFT, padx=10, pady=5)
 
+        self.bulk_user_button = tk.Button(self.user_tab, text="Delete Matching...", command=self.open_bulk_users)
+        self.bulk_user_button.pack(side=tk.LEFT, padx=10, pady=5)
+
         # -------------------- Manage Food Donations Tab -------------------- #
         self.food_tab = ttk.Frame(self.tab_control)
         self.tab_control.add(self.food_tab, text="Manage Food Donations")
@@ -75,23 +92,117 @@ class AdminPanel:
         self.food_show_all_btn = tk.Button(self.food_search_frame, text="Show All", command=self.load_food_donations)
         self.food_show_all_btn.pack(side=tk.LEFT, padx=5)
 
+        # Searches and exports include archived donations (see archive.py) unless unticked
+        self.food_search_archive = tk.BooleanVar(value=True)
+        tk.Checkbutton(self.food_search_frame, text="Include archived", variable=self.food_search_archive).pack(side=tk.LEFT, padx=5)
+
+        self.food_export_btn = tk.Button(self.food_search_frame, text="Export...", command=self.export_food_donations)
+        self.food_export_btn.pack(side=tk.RIGHT, padx=5)
+
+        self.food_tree_frame = tk.Frame(self.food_tab)
+        self.food_tree_frame.pack(fill=tk.BOTH, expand=True)
+
         self.food_tree = ttk.Treeview(
-            self.food_tab,
+            self.food_tree_frame,
             columns=("ID", "Food Name", "Quantity", "Document Path", "Document ID", 
-                     "Orphanage Phone", "Hotel Address", "Donation Date", "Status"),
+                     "Orphanage Phone", "Orphanage", "Hotel", "Hotel Address", "Donation Date", "Status"),
             show="headings"
         )
         for col in self.food_tree["columns"]:
             self.food_tree.heading(col, text=col)
             self.food_tree.column(col, anchor="center", width=120)
 
+        self.food_scrollbar = ttk.Scrollbar(self.food_tree_frame, orient="vertical", command=self.food_tree.yview)
+        self.food_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.food_tree.pack(fill=tk.BOTH, expand=True)
+        self.food_grid = VirtualGrid(self.food_tree, self.fetch_food_page, self.fetch_food, scrollbar=self.food_scrollbar,
+                                     fetch_rows=self.fetch_food_rows)
 
         self.style = ttk.Style()
         self.style.configure("Treeview", foreground="black")
 
-        self.delete_food_button = tk.Button(self.food_tab, text="Delete Food", command=self.delete_food, bg="red", fg="white")
-        self.delete_food_button.pack(pady=5)
+        # Actions apply to every selected row (Ctrl/Shift-click to select several)
+        self.food_action_frame = tk.Frame(self.food_tab)
+        self.food_action_frame.pack(pady=5)
+
+        self.delete_food_button = tk.Button(self.food_action_frame, text="Delete Food", command=self.delete_food, bg="red", fg="white")
+        self.delete_food_button.pack(side=tk.LEFT, padx=10)
+
+        self.food_status = ttk.Combobox(self.food_action_frame, values=data_access.DONATION_STATUSES, state="readonly", width=10)
+        self.food_status.set("Accepted")
+        self.food_status.pack(side=tk.LEFT, padx=5)
+        tk.Button(self.food_action_frame, text="Set Status", command=self.set_food_status).pack(side=tk.LEFT, padx=5)
+
+        tk.Button(self.food_action_frame, text="Apply to Matching...", command=self.open_bulk_food).pack(side=tk.LEFT, padx=10)
+
+        # -------------------- Analytics Tab -------------------- #
+        self.analytics_tab = ttk.Frame(self.tab_control)
+        self.tab_control.add(self.analytics_tab, text="Analytics")
+
+        self.analytics_bar = tk.Frame(self.analytics_tab)
+        self.analytics_bar.pack(fill=tk.X, padx=10, pady=5)
+
+        tk.Label(self.analytics_bar, text="Period:").pack(side=tk.LEFT, padx=5)
+        self.analytics_period = ttk.Combobox(self.analytics_bar, values=list(self.ANALYTICS_PERIODS), state="readonly", width=15)
+        self.analytics_period.set("Last 12 weeks")
+        self.analytics_period.pack(side=tk.LEFT, padx=5)
+        self.analytics_period.bind("<<ComboboxSelected>>", lambda _: self.load_analytics())
+
+        tk.Button(self.analytics_bar, text="Refresh", command=self.load_analytics).pack(side=tk.LEFT, padx=5)
+
+        self.analytics_totals = tk.Label(self.analytics_tab, text="", font=("Arial", 12, "bold"), anchor="w")
+        self.analytics_totals.pack(fill=tk.X, padx=10, pady=5)
+
+        tk.Label(self.analytics_tab, text="Donations per hotel per week", font=("Arial", 11, "bold"), anchor="w").pack(fill=tk.X, padx=10)
+        self.hotel_week_tree = ttk.Treeview(self.analytics_tab, columns=("Week", "Hotel", "Donations", "Accepted", "Accepted %"), show="headings", height=10)
+        for col in self.hotel_week_tree["columns"]:
+            self.hotel_week_tree.heading(col, text=col)
+            self.hotel_week_tree.column(col, anchor="center", width=120)
+        self.hotel_week_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        tk.Label(self.analytics_tab, text="Donations per orphanage", font=("Arial", 11, "bold"), anchor="w").pack(fill=tk.X, padx=10)
+        self.orphanage_stats_tree = ttk.Treeview(self.analytics_tab, columns=("Orphanage Phone", "Donations", "Pending", "Accepted", "Rejected", "Expired"), show="headings", height=8)
+        for col in self.orphanage_stats_tree["columns"]:
+            self.orphanage_stats_tree.heading(col, text=col)
+            self.orphanage_stats_tree.column(col, anchor="center", width=120)
+        self.orphanage_stats_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        # -------------------- Diagnostics Tab -------------------- #
+        # Latency histograms from diagnostics.py; statements of this process only
+        self.diagnostics_tab = ttk.Frame(self.tab_control)
+        self.tab_control.add(self.diagnostics_tab, text="Diagnostics")
+
+        self.diagnostics_bar = tk.Frame(self.diagnostics_tab)
+        self.diagnostics_bar.pack(fill=tk.X, padx=10, pady=5)
+
+        self.tracing_btn = tk.Button(self.diagnostics_bar, command=self.toggle_tracing)
+        self.tracing_btn.pack(side=tk.LEFT, padx=5)
+        tk.Button(self.diagnostics_bar, text="Refresh", command=self.load_diagnostics).pack(side=tk.LEFT, padx=5)
+        tk.Button(self.diagnostics_bar, text="Reset", command=self.reset_diagnostics).pack(side=tk.LEFT, padx=5)
+        tk.Button(self.diagnostics_bar, text="Save JSONL...", command=self.dump_diagnostics).pack(side=tk.RIGHT, padx=5)
+
+        latency_columns = ("Calls", "Mean ms", "p95 ms", "p99 ms", "Max ms")
+        tk.Label(self.diagnostics_tab, text="Slowest statements (select one for its query plan)", font=("Arial", 11, "bold"), anchor="w").pack(fill=tk.X, padx=10)
+        self.statement_tree = ttk.Treeview(self.diagnostics_tab, columns=("Statement",) + latency_columns, show="headings", height=8)
+        self.handler_tree = ttk.Treeview(self.diagnostics_tab, columns=("Kind", "Name") + latency_columns, show="headings", height=8)
+        for tree in (self.statement_tree, self.handler_tree):
+            for col in tree["columns"]:
+                tree.heading(col, text=col)
+                tree.column(col, anchor="center", width=80)
+        self.statement_tree.column("Statement", anchor="w", width=520)
+        self.handler_tree.column("Name", anchor="w", width=360)
+        self.statement_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.statement_tree.bind("<<TreeviewSelect>>", self.explain_statement)
+
+        self.query_plan = tk.Text(self.diagnostics_tab, height=6, state=tk.DISABLED)
+        self.query_plan.pack(fill=tk.X, padx=10, pady=5)
+
+        tk.Label(self.diagnostics_tab, text="UI handlers and database jobs", font=("Arial", 11, "bold"), anchor="w").pack(fill=tk.X, padx=10)
+        self.handler_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.statement_samples = {}  # tree item -> slowest traced statement with its values
+
+        # Recomputed from the summary table each time the tab is opened
+        self.tab_control.bind("<<NotebookTabChanged>>", self.on_tab_changed)
 
         self.tab_control.pack(expand=1, fill="both")
 
@@ -99,59 +210,66 @@ class AdminPanel:
         self.load_users()
         self.load_food_donations()
 
-    def execute_query_users(self, query, params=()):
-        try:
-            self.cursor_users.execute(query, params)
-            self.conn_users.commit()
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", str(e))
+    # Writes run on the database worker; on_done is called once committed
+    def execute_query_users(self, query, params=(), on_done=None):
+        self.db.submit(data_access.execute_users, query, params, on_done=on_done)
+
+    def execute_query_food(self, query, params=(), on_done=None):
+        self.db.submit(data_access.execute_food, query, params, on_done=on_done)
 
-    def execute_query_food(self, query, params=()):
-        try:
-            self.cursor_food.execute(query, params)
-            self.conn_food.commit()
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", str(e))
+    # Keyset page / single-row readers used by the virtual grids
+    def fetch_users_page(self, anchor_id, limit, forward, on_rows, on_error):
+        self.db.submit(data_access.users_page, anchor_id, limit, forward, on_done=on_rows,
+                       on_error=lambda e: (on_error(e), show_db_error(e)))
 
+    def fetch_user(self, user_id, on_row):
+        self.db.submit(data_access.user_row, user_id, on_done=on_row)
+
+    def fetch_food_page(self, anchor_id, limit, forward, on_rows, on_error):
+        self.db.submit(data_access.food_page, anchor_id, limit, forward, on_done=on_rows,
+                       on_error=lambda e: (on_error(e), show_db_error(e)))
+
+    def fetch_food(self, food_id, on_row):
+        self.db.submit(data_access.food_row, food_id, on_done=on_row)
+
+    def fetch_food_rows(self, food_ids, on_rows):
+        self.db.submit(data_access.food_rows, food_ids, on_done=on_rows)
+
+    # Ids of the selected rows
+    @staticmethod
+    def selected_ids(tree):
+        return [tree.item(item, "values")[0] for item in tree.selection()]
+
+    @diagnostics.timed("AdminPanel.load_users")
     def load_users(self):
-        for row in self.user_tree.get_children():
-            self.user_tree.delete(row)
-        self.cursor_users.execute("SELECT id, name, email, phone, role, address, organization_name FROM users")
-        for user in self.cursor_users.fetchall():
-            self.user_tree.insert("", tk.END, values=user)
+        self.user_grid.reload()
 
+    @diagnostics.timed("AdminPanel.search_user")
     def search_user(self):
         keyword = self.user_search_entry.get().strip()
-        query = """
-            SELECT id, name, email, phone, role, address, organization_name FROM users 
-            WHERE name LIKE ? OR email LIKE ? OR phone LIKE ? OR role LIKE ? OR address LIKE ? OR organization_name LIKE ?
-        """
-        params = tuple([f"%{keyword}%"] * 6)
-        self.cursor_users.execute(query, params)
-        results = self.cursor_users.fetchall()
-        self.user_tree.delete(*self.user_tree.get_children())
-        for user in results:
-            self.user_tree.insert("", tk.END, values=user)
+        if not keyword:
+            self.load_users()
+            return
+        self.db.submit(data_access.search_users, keyword, on_done=self.user_grid.show_rows)
 
     def delete_user(self):
-        selected_item = self.user_tree.selection()
-        if not selected_item:
+        user_ids = self.selected_ids(self.user_tree)
+        if not user_ids:
             messagebox.showwarning("Selection Error", "Please select a user to delete.")
             return
-        user_id = self.user_tree.item(selected_item, "values")[0]
-        confirm = messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete User ID {user_id}?")
+        what = f"User ID {user_ids[0]}" if len(user_ids) == 1 else f"{len(user_ids)} users"
+        confirm = messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {what}?")
         if confirm:
-            self.execute_query_users("DELETE FROM users WHERE id=?", (user_id,))
-            self.load_users()
+            self.db.submit(data_access.delete_users, user_ids, on_done=self.user_grid.remove_rows)
 
     def update_user(self):
         selected_item = self.user_tree.selection()
-        if not selected_item:
-            messagebox.showwarning("Selection Error", "Please select a user to update.")
+        if len(selected_item) != 1:
+            messagebox.showwarning("Selection Error", "Please select one user to update.")
             return
         item_values = self.user_tree.item(selected_item, "values")
         user_id, user_name, user_email, user_phone, user_role, user_address, user_org = item_values
-        update_window = tk.Toplevel(self.root)
+        update_window = tk.Toplevel(self.container)
         update_window.title("Update User")
         update_window.geometry("400x400")
         labels = ["Name:", "Email:", "Phone:", "Role:", "Address:", "Organization Name:"]
@@ -162,50 +280,271 @@ class AdminPanel:
             entries[i].pack()
         def save_updated_user():
             new_values = [entry.get() for entry in entries]
-            self.execute_query_users("UPDATE users SET name=?, email=?, phone=?, role=?, address=?, organization_name=? WHERE id=?", (*new_values, user_id))
-            self.load_users()
+            self.execute_query_users(data_access.UPDATE_USER, (*new_values, user_id),
+                                     on_done=lambda _: self.user_grid.refresh_row(user_id))
             update_window.destroy()
         tk.Button(update_window, text="Save", command=save_updated_user, bg="blue", fg="white").pack(pady=10)
 
+    @diagnostics.timed("AdminPanel.load_food_donations")
     def load_food_donations(self):
-        for row in self.food_tree.get_children():
-            self.food_tree.delete(row)
-        self.cursor_food.execute("SELECT id, food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date, status FROM food_donations")
-        for food in self.cursor_food.fetchall():
-            self.food_tree.insert("", tk.END, values=food)
+        self.food_grid.reload()
 
+    @diagnostics.timed("AdminPanel.search_food")
     def search_food(self):
         keyword = self.food_search_entry.get().strip()
-        query = """
-            SELECT id, food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date, status 
-            FROM food_donations
-            WHERE food_name LIKE ? OR quantity LIKE ? OR document_id LIKE ? OR orphanage_phone LIKE ? OR hotel_address LIKE ? OR status LIKE ?
-        """
-        params = tuple([f"%{keyword}%"] * 6)
-        self.cursor_food.execute(query, params)
-        results = self.cursor_food.fetchall()
-        self.food_tree.delete(*self.food_tree.get_children())
-        for food in results:
-            self.food_tree.insert("", tk.END, values=food)
+        if not keyword:
+            self.load_food_donations()
+            return
+        self.db.submit(data_access.search_donations, keyword, self.food_search_archive.get(), on_done=self.food_grid.show_rows)
+
+    # Selected donation ids, without archived search results: those rows live
+    # in food_donations_archive and can't be deleted or updated from here.
+    # The user is told which were skipped.
+    def selected_live_donations(self, verb):
+        food_ids, archived = [], []
+        for item in self.food_tree.selection():
+            values = self.food_tree.item(item, "values")
+            (archived if values[-1].endswith(search.ARCHIVED_SUFFIX) else food_ids).append(values[0])
+        if archived:
+            shown = ", ".join(archived[:10]) + (f" and {len(archived) - 10} more" if len(archived) > 10 else "")
+            messagebox.showwarning("Archived Donations", f"Archived donations can't be {verb}; skipping Food ID {shown}.")
+        return food_ids, archived
 
     def delete_food(self):
-        selected_item = self.food_tree.selection()
-        if not selected_item:
-            messagebox.showwarning("Selection Error", "Please select a food donation to delete.")
+        food_ids, archived = self.selected_live_donations("deleted")
+        if not food_ids:
+            if not archived:
+                messagebox.showwarning("Selection Error", "Please select a food donation to delete.")
             return
-        food_id = self.food_tree.item(selected_item, "values")[0]
-        confirm = messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete Food ID {food_id}?")
+        what = f"Food ID {food_ids[0]}" if len(food_ids) == 1 else f"{len(food_ids)} food donations"
+        confirm = messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {what}?")
         if confirm:
-            self.execute_query_food("DELETE FROM food_donations WHERE id=?", (food_id,))
-            self.load_food_donations()
-
-    def on_closing(self):
-        self.conn_users.close()
-        self.conn_food.close()
-        self.root.destroy()
-        subprocess.Popen(["python", "homepage.py"])
+            self.db.submit(data_access.delete_donations, food_ids, on_done=self.food_grid.remove_rows)
 
-if __name__ == "__main__":
+    def set_food_status(self):
+        food_ids, archived = self.selected_live_donations("updated")
+        if not food_ids:
+            if not archived:
+                messagebox.showwarning("Selection Error", "Please select a food donation to update.")
+            return
+        self.db.submit(data_access.set_donations_status, self.food_status.get(), food_ids,
+                       on_done=self.food_grid.refresh_rows)
+
+    # -------------------- Bulk actions on every matching row -------------------- #
+    # Ask for filters and an action, count the matching rows, confirm, then run
+    # the action as one statement; run_action(action, filters, on_done)
+    def open_bulk_dialog(self, title, fields, actions, count_fn, run_action):
+        window = tk.Toplevel(self.container)
+        window.title(title)
+        entries = {}
+        for i, (key, label) in enumerate(fields):
+            tk.Label(window, text=label).grid(row=i, column=0, sticky="w", padx=10, pady=3)
+            entries[key] = tk.Entry(window, width=25)
+            entries[key].grid(row=i, column=1, padx=10, pady=3)
+        tk.Label(window, text="Action:").grid(row=len(fields), column=0, sticky="w", padx=10, pady=3)
+        action = ttk.Combobox(window, values=actions, state="readonly", width=22)
+        action.set(actions[0])
+        action.grid(row=len(fields), column=1, padx=10, pady=3)
+
+        def apply():
+            filters = {key: entry.get().strip() or None for key, entry in entries.items()}
+            if not any(filters.values()):
+                messagebox.showwarning("No Filter", "Enter at least one filter.", parent=window)
+                return
+            chosen = action.get()
+
+            def confirm(count):
+                if count == 0:
+                    messagebox.showinfo("No Matches", "No rows match these filters.", parent=window)
+                elif messagebox.askyesno("Confirm", f"{chosen}: {count} matching row(s). Continue?", parent=window):
+                    window.destroy()
+                    run_action(chosen, filters, lambda ids: self.on_bulk_done(chosen, ids))
+            self.db.submit(count_fn, filters, on_done=confirm)
+
+        tk.Button(window, text="Apply", command=apply, bg="red", fg="white").grid(row=len(fields) + 1, column=0, columnspan=2, pady=10)
+
+    def open_bulk_users(self):
+        def run_action(_action, filters, on_done):
+            self.db.submit(data_access.delete_users, None, filters,
+                           on_done=lambda ids: (self.user_grid.remove_rows(ids), on_done(ids)))
+        self.open_bulk_dialog("Delete Matching Users", [("role", "Role:"), ("keyword", "Search text:")],
+                              ["Delete"], data_access.count_users, run_action)
+
+    def open_bulk_food(self):
+        actions = ["Delete"] + [f"Set status to {status}" for status in data_access.DONATION_STATUSES]
+
+        def run_action(action, filters, on_done):
+            if action == "Delete":
+                self.db.submit(data_access.delete_donations, None, filters,
+                               on_done=lambda ids: (self.food_grid.remove_rows(ids), on_done(ids)))
+            else:
+                self.db.submit(data_access.set_donations_status, action.rsplit(" ", 1)[1], None, filters,
+                               on_done=lambda ids: (self.food_grid.refresh_rows(ids), on_done(ids)))
+        fields = [("status", "Status:"), ("date_from", "From (YYYY-MM-DD):"), ("date_to", "To (YYYY-MM-DD):"),
+                  ("orphanage_phone", "Orphanage Phone:"), ("keyword", "Search text:")]
+        self.open_bulk_dialog("Apply to Matching Donations", fields, actions, data_access.count_donations, run_action)
+
+    def on_bulk_done(self, action, ids):
+        messagebox.showinfo("Done", f"{action}: {len(ids)} row(s) changed.")
+
+    # -------------------- Analytics -------------------- #
+    def on_tab_changed(self, _event):
+        if self.tab_control.select() == str(self.analytics_tab):
+            self.load_analytics()
+        elif self.tab_control.select() == str(self.diagnostics_tab):
+            self.load_diagnostics()
+
+    @diagnostics.timed("AdminPanel.load_analytics")
+    def load_analytics(self):
+        days = self.ANALYTICS_PERIODS[self.analytics_period.get()]
+        since = (date.today() - timedelta(days=days)).isoformat() if days else None
+        self.db.submit(data_access.analytics, since, on_done=self.show_analytics)
+
+    def show_analytics(self, result):
+        status_totals, by_hotel_week, by_orphanage = result
+        total = sum(count for _, count in status_totals)
+        parts = [f"{status}: {count}" for status, count in status_totals]
+        self.analytics_totals.config(text=f"Total donations: {total}    " + "    ".join(parts))
+
+        self.hotel_week_tree.delete(*self.hotel_week_tree.get_children())
+        for week, hotel, donations, accepted in by_hotel_week:
+            self.hotel_week_tree.insert("", tk.END, values=(week or "-", hotel or "-", donations, accepted,
+                                                            f"{100 * accepted / donations:.0f}%"))
+
+        self.orphanage_stats_tree.delete(*self.orphanage_stats_tree.get_children())
+        for row in by_orphanage:
+            self.orphanage_stats_tree.insert("", tk.END, values=row)
+
+    # -------------------- Diagnostics -------------------- #
+    def load_diagnostics(self):
+        self.tracing_btn.config(text="Stop Tracing" if diagnostics.enabled else "Start Tracing")
+        self.statement_tree.delete(*self.statement_tree.get_children())
+        self.statement_samples.clear()
+        for sql, summary, sample in diagnostics.slowest_statements():
+            item = self.statement_tree.insert("", tk.END, values=(sql, *self.latency_values(summary)))
+            self.statement_samples[item] = sample
+        self.handler_tree.delete(*self.handler_tree.get_children())
+        for kind, name, summary in diagnostics.handler_summaries():
+            self.handler_tree.insert("", tk.END, values=(kind, name, *self.latency_values(summary)))
+
+    @staticmethod
+    def latency_values(summary):
+        return (summary["calls"], *(f"{summary[key]:.2f}" for key in ("mean_ms", "p95_ms", "p99_ms", "max_ms")))
+
+    # Connections only trace if opened while tracing is on, so the worker
+    # reconnects after every switch
+    def toggle_tracing(self):
+        if diagnostics.enabled:
+            diagnostics.disable()
+        else:
+            diagnostics.enable()
+        self.db.submit(lambda db: db.close(), quiet=True)
+        self.load_diagnostics()
+
+    def reset_diagnostics(self):
+        diagnostics.reset()
+        self.load_diagnostics()
+
+    def explain_statement(self, _event):
+        selected_item = self.statement_tree.selection()
+        if not selected_item:
+            return
+        self.db.submit(data_access.explain_query_plan, self.statement_samples[selected_item[0]],
+                       on_done=self.show_query_plan, on_error=self.show_query_plan)
+
+    # `plan` is [(id, parent, detail)] or the error explaining why there is none
+    def show_query_plan(self, plan):
+        if isinstance(plan, Exception):
+            text = str(plan)
+        else:
+            depth = {0: -1}
+            lines = []
+            for node, parent, detail in plan:
+                depth[node] = depth.get(parent, -1) + 1
+                lines.append("  " * depth[node] + detail)
+            text = "\n".join(lines)
+        self.query_plan.config(state=tk.NORMAL)
+        self.query_plan.delete("1.0", tk.END)
+        self.query_plan.insert(tk.END, text)
+        self.query_plan.config(state=tk.DISABLED)
+
+    def dump_diagnostics(self):
+        path = filedialog.asksaveasfilename(title="Save Diagnostics", defaultextension=".jsonl",
+                                            filetypes=[("JSON Lines", ".jsonl")])
+        if path:
+            count = diagnostics.dump(path)
+            messagebox.showinfo("Diagnostics Saved", f"Wrote {count} histogram(s) to {path}")
+
+    # -------------------- Export -------------------- #
+    # Ask for filters, then stream the rows to a file on the database worker
+    # options: [(key, label, default)] check boxes, passed to run_export with the filters
+    def open_export_dialog(self, title, fields, run_export, options=()):
+        window = tk.Toplevel(self.container)
+        window.title(title)
+        entries = {}
+        for i, (key, label) in enumerate(fields):
+            tk.Label(window, text=label).grid(row=i, column=0, sticky="w", padx=10, pady=3)
+            entries[key] = tk.Entry(window, width=25)
+            entries[key].grid(row=i, column=1, padx=10, pady=3)
+        checks = {}
+        for i, (key, label, default) in enumerate([("compress", "Compress (gzip)", False), *options]):
+            checks[key] = tk.BooleanVar(value=default)
+            tk.Checkbutton(window, text=label, variable=checks[key]).grid(row=len(fields) + i, column=0, columnspan=2, pady=3)
+        compress = checks.pop("compress")
+
+        def choose_file():
+            filters = {key: entry.get().strip() or None for key, entry in entries.items()}
+            filters.update({key: var.get() for key, var in checks.items()})
+            path = filedialog.asksaveasfilename(parent=window, title=title, defaultextension=".csv",
+                                                filetypes=[("CSV Files", ".csv"), ("JSON Lines", ".jsonl")])
+            if not path:
+                return
+            if compress.get():
+                path += ".gz"
+            window.destroy()
+            run_export(path, filters)
+
+        tk.Button(window, text="Export", command=choose_file, bg="blue", fg="white").grid(
+            row=len(fields) + len(options) + 1, column=0, columnspan=2, pady=10)
+
+    def export_users(self):
+        def run_export(path, filters):
+            self.db.submit(export.export_users, path, None, filters["role"],
+                           on_done=lambda count: self.on_exported(path, count))
+        self.open_export_dialog("Export Users", [("role", "Role:")], run_export)
+
+    def export_food_donations(self):
+        def run_export(path, filters):
+            self.db.submit(export.export_donations, path, None, filters["status"], filters["date_from"],
+                           filters["date_to"], filters["orphanage_phone"], filters["include_archive"],
+                           on_done=lambda count: self.on_exported(path, count))
+        fields = [("status", "Status:"), ("date_from", "From (YYYY-MM-DD):"),
+                  ("date_to", "To (YYYY-MM-DD):"), ("orphanage_phone", "Orphanage Phone:")]
+        self.open_export_dialog("Export Food Donations", fields, run_export,
+                                [("include_archive", "Include archived donations", True)])
+
+    def on_exported(self, path, count):
+        messagebox.showinfo("Export Complete", f"Exported {count} row(s) to {path}")
+
+    # Called by the application shell before the view is replaced
+    def close(self):
+        self.container.destroy()
+
+# Standalone window (the application shell in homepage.py embeds AdminPanel instead)
+def main():
+    migrations.migrate()
     root = tk.Tk()
-    app = AdminPanel(root)
+    root.title("Admin Panel - Hotel Food Donation System")
+    root.geometry("1100x550")
+    db = DBWorker(root)
+    app = AdminPanel(root, db)
+
+    def on_closing():
+        db.stop()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_closing)
     root.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import json
+import time
+
+import database
+import migrations
+
+# Hot/archive split of food_donations.
+# Completed donations (Accepted, Rejected, Expired) older than
+# ARCHIVE_AFTER_DAYS are moved to food_donations_archive in batches of
+# BATCH_SIZE rows, one short transaction each, so the orphanage and admin views
+# and their indexes only carry recent and pending rows. Archived rows keep their
+# ids and still count in the analytics rollups (see migrations.py, version 12).
+# History views read the archive only when asked (data_access.archived_donations,
+# search_donations(..., include_archive=True)).
+# Usage: python archive.py [--days 180] [--batch-size 1000] [--pause 0.05]
+
+ARCHIVE_AFTER_DAYS = 180
+BATCH_SIZE = 1000
+COMPLETED_STATUSES = ("Accepted", "Rejected", "Expired")
+COLUMNS = ("id, food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date, "
+           "status, hotel_phone, quantity_value, quantity_unit, donation_ts, orphanage_id, hotel_id, "
+           "document_digest, best_before_ts")
+
+
+# Move one batch of completed donations dated before `cutoff_ts`; returns how many moved
+def archive_batch(conn, cutoff_ts, batch_size=BATCH_SIZE):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # idx_donations_ts_unit gives the oldest donations first
+        ids = [row[0] for row in conn.execute(f"""
+            SELECT id FROM food_donations
+            WHERE donation_ts < ? AND status IN ({", ".join("?" * len(COMPLETED_STATUSES))})
+            ORDER BY donation_ts LIMIT ?
+        """, (cutoff_ts, *COMPLETED_STATUSES, batch_size))]
+        if ids:
+            batch = json.dumps(ids)
+            conn.execute(f"""
+                INSERT INTO food_donations_archive ({COLUMNS}, archived_at)
+                SELECT {COLUMNS}, ? FROM food_donations WHERE id IN (SELECT value FROM json_each(?))
+            """, (int(time.time()), batch))
+            conn.execute("DELETE FROM food_donations WHERE id IN (SELECT value FROM json_each(?))", (batch,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(ids)
+
+
+# Archive everything older than `days`, batch by batch. `pause` seconds between
+# batches leave room for other writers. Returns the number of rows moved.
+def archive_completed(conn, days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE, pause=0.0):
+    cutoff_ts = int(time.time()) - days * 86400
+    moved = 0
+    while True:
+        count = archive_batch(conn, cutoff_ts, batch_size)
+        moved += count
+        if count < batch_size:
+            return moved
+        if pause:
+            time.sleep(pause)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old completed donations to the archive table")
+    parser.add_argument("--db", default=migrations.DONATIONS_DB)
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive donations older than this")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to wait between batches")
+    args = parser.parse_args()
+
+    migrations.migrate(donations_db=args.db)
+    conn = database.connect(args.db)
+    try:
+        start = time.perf_counter()
+        moved = archive_completed(conn, args.days, args.batch_size, args.pause)
+        print(f"archived {moved} donation(s) in {time.perf_counter() - start:.1f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
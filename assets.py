@@ -0,0 +1,78 @@
+import glob
+import os
+import tempfile
+import tkinter as tk
+
+# Pre-rendered image cache.
+# The first request for (image, size) decodes and resizes the source once with
+# PIL and stores a pre-scaled PNG in .asset_cache/ next to the source, keyed
+# by source mtime and target size. Later requests in the same process reuse
+# the in-memory PhotoImage; later processes load the PNG straight into Tk,
+# which needs no PIL import and no decode of the original file.
+
+CACHE_DIR_NAME = ".asset_cache"
+
+_photos = {}  # (source path, mtime_ns, size) -> tk.PhotoImage
+
+
+def _cache_path(source, mtime_ns, size):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(source)), CACHE_DIR_NAME)
+    return cache_dir, os.path.join(cache_dir, f"{stem}-{size[0]}x{size[1]}-{mtime_ns}.png")
+
+
+# Decode + resize the source once and persist it atomically as PNG
+def _render(source, mtime_ns, size):
+    from PIL import Image  # only needed when the cache is cold
+    cache_dir, path = _cache_path(source, mtime_ns, size)
+    os.makedirs(cache_dir, exist_ok=True)
+    with Image.open(source) as image:
+        scaled = image.resize(size)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".png.tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            scaled.save(tmp, format="PNG")
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    # Drop renders of older versions of the source at this size
+    stem = os.path.splitext(os.path.basename(source))[0]
+    for stale in glob.glob(os.path.join(cache_dir, f"{stem}-{size[0]}x{size[1]}-*.png")):
+        if stale != path:
+            os.unlink(stale)
+    return path
+
+
+def _rendered(source, mtime_ns, size):
+    _, path = _cache_path(source, mtime_ns, size)
+    return path if os.path.exists(path) else _render(source, mtime_ns, size)
+
+
+# Path of the pre-scaled PNG, rendered first if the cache is cold. Uses no Tk,
+# so a worker thread can warm the cache before photo() is called.
+def rendered_path(source, size):
+    size = (int(size[0]), int(size[1]))
+    return _rendered(source, os.stat(source).st_mtime_ns, size)
+
+
+# PhotoImage for `source` scaled to `size` (width, height)
+def photo(source, size, master=None):
+    size = (int(size[0]), int(size[1]))
+    mtime_ns = os.stat(source).st_mtime_ns
+    key = (os.path.abspath(source), mtime_ns, size)
+    image = _photos.get(key)
+    if image is None:
+        image = tk.PhotoImage(master=master, file=_rendered(source, mtime_ns, size))
+        _photos[key] = image
+    return image
+
+
+# Pick the largest of `sizes` whose width fits in `fraction` of the screen width
+def fit_size(sizes, screen_width, fraction=1 / 3):
+    fitting = [size for size in sizes if size[0] <= screen_width * fraction]
+    return max(fitting) if fitting else min(sizes)
+
+
+def clear_memory_cache():
+    _photos.clear()
@@ -0,0 +1,72 @@
+import tkinter as tk
+
+# Type-ahead suggestions for an Entry: a list shown under the field while
+# typing. Down moves into the list; Return, a click or a double click copies
+# the chosen value into the field; Escape closes the list.
+# complete(text) returns [(value, label)] and must not block (it is called
+# on every key press), e.g. orphanage_directory.DirectoryCache.complete.
+
+NAVIGATION_KEYS = {"Up", "Down", "Return", "Escape", "Tab", "Shift_L", "Shift_R", "Control_L", "Control_R"}
+
+
+class Autocomplete:
+    def __init__(self, entry, complete):
+        self.entry = entry
+        self.complete = complete
+        self.values = []
+        self.listbox = tk.Listbox(entry.master, font=entry.cget("font"), activestyle="dotbox")
+        self.listbox.bind("<Return>", self.choose)
+        self.listbox.bind("<ButtonRelease-1>", self.choose)
+        self.listbox.bind("<Escape>", lambda _: self.hide(refocus=True))
+        self.listbox.bind("<FocusOut>", lambda _: self.entry.after(100, self.hide_unless_focused))
+        entry.bind("<KeyRelease>", self.on_key, add="+")
+        entry.bind("<Down>", self.enter_list, add="+")
+        entry.bind("<Escape>", lambda _: self.hide(), add="+")
+        entry.bind("<FocusOut>", lambda _: self.entry.after(100, self.hide_unless_focused), add="+")
+
+    def on_key(self, event):
+        if event.keysym in NAVIGATION_KEYS:
+            return
+        matches = self.complete(self.entry.get())
+        if not matches:
+            self.hide()
+            return
+        self.values = [value for value, _ in matches]
+        self.listbox.delete(0, tk.END)
+        for _, label in matches:
+            self.listbox.insert(tk.END, label)
+        self.listbox.configure(height=len(matches))
+        self.listbox.place(in_=self.entry, x=0, rely=1.0, relwidth=1.5)
+        self.listbox.lift()
+
+    def enter_list(self, _event=None):
+        if self.values and self.listbox.winfo_ismapped():
+            self.listbox.focus_set()
+            self.listbox.selection_clear(0, tk.END)
+            self.listbox.selection_set(0)
+            self.listbox.activate(0)
+            return "break"
+
+    def choose(self, _event=None):
+        selection = self.listbox.curselection()
+        if selection:
+            self.entry.delete(0, tk.END)
+            self.entry.insert(0, self.values[selection[0]])
+        self.hide(refocus=True)
+
+    def hide(self, refocus=False):
+        self.listbox.place_forget()
+        if refocus:
+            self.entry.focus_set()
+            self.entry.icursor(tk.END)
+
+    # Focus left the field: close the list unless it moved into the list
+    def hide_unless_focused(self):
+        if not self.listbox.winfo_exists():
+            return
+        try:
+            focused = self.entry.focus_get()
+        except KeyError:  # focus is in a Tk-internal window (e.g. a combobox list)
+            focused = None
+        if focused not in (self.entry, self.listbox):
+            self.hide()
@@ -0,0 +1,291 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+import data_access
+import database
+import generate_data
+import migrations
+from db_worker import Connections
+
+# Concurrency stress test: --processes processes (separate app instances)
+# with --threads threads each write one scratch copy of the databases at the
+# same time, through the same functions and SQL as the panels:
+#   submit_donation  hotel.py         data_access.submit_donation
+#   update_status    orphanage.py     data_access.set_donation_status
+#   delete_food      admin.py         data_access.delete_donations
+#   update_user      admin.py         data_access.execute_users(UPDATE_USER)
+# Reports throughput, latency and outcomes per operation ("locked" means
+# "database is locked" after the busy timeout; "conflict" means the donation
+# was no longer pending), then checks the result for lost or duplicated
+# updates and for drift between the analytics rollups and the donations.
+# Usage: python bench_concurrency.py [--processes 4] [--threads 4] [--seconds 10]
+#                                    [--data bench_data] [--busy-timeout-ms 5000] [--json out.json]
+
+MIX = {"submit_donation": 50, "update_status": 30, "delete_food": 10, "update_user": 10}
+SCRATCH_DATASET = (2_000, 20_000)
+URGENT_WINDOW = 20  # orphanages pick among the most urgent pending donations, so they collide
+
+
+def copy_database(source, target):
+    with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(target)) as dst:
+        src.backup(dst)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def is_locked(error):
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+
+# --- Worker side ---
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {name: [] for name in MIX}
+        self.outcomes = {name: {"ok": 0, "locked": 0, "conflict": 0, "error": 0} for name in MIX}
+        self.submitted = []  # document ids
+        self.status_set = []  # (donation id, status)
+        self.user_names = []  # (user id, name)
+        self.errors = []
+
+
+def worker_thread(config, worker_id, recorder, stop_at):
+    rnd = random.Random(worker_id)
+    db = Connections(config["users_db"], config["donations_db"])
+    conn = db.conn
+    names, weights = list(MIX), list(MIX.values())
+    n = 0
+    try:
+        while time.time() < stop_at:
+            n += 1
+            operation = rnd.choices(names, weights)[0]
+            # Pick targets before the clock starts; only the panel's own call is timed
+            if operation == "submit_donation":
+                document_id = f"STRESS-{worker_id}-{n}"
+                call = lambda: data_access.submit_donation(
+                    db, "Rice", "5 kg", config["document"], document_id, rnd.choice(config["orphanage_phones"]),
+                    "stress road", config["today"], rnd.choice(config["hotel_phones"]), "")
+            elif operation == "update_status":
+                row = conn.execute("""
+                    SELECT id FROM food_donations WHERE status = 'Pending'
+                    ORDER BY best_before_ts LIMIT 1 OFFSET ?
+                """, (rnd.randrange(URGENT_WINDOW),)).fetchone()
+                if row is None:
+                    continue
+                donation_id, status = row[0], rnd.choice(["Accepted", "Rejected"])
+                call = lambda: data_access.set_donation_status(db, donation_id, status)
+            elif operation == "delete_food":
+                donation_id = rnd.randrange(1, config["max_food_id"] + 1)
+                call = lambda: data_access.delete_donations(db, [donation_id])
+            else:
+                user = conn.execute(f"{data_access.USER_SELECT} WHERE id = ?", (rnd.randrange(1, config["max_user_id"] + 1),)).fetchone()
+                if user is None:
+                    continue
+                name = f"{user[1].split('#')[0]}#{worker_id}-{n}"
+                values = (name, user[2], user[3], user[4], user[5], user[6], user[0])
+                call = lambda: data_access.execute_users(db, data_access.UPDATE_USER, values)
+
+            start = time.perf_counter()
+            try:
+                result = call()
+            except Exception as e:
+                outcome = "locked" if is_locked(e) else "error"
+                if outcome == "error" and len(recorder.errors) < 20:
+                    recorder.errors.append(f"{operation}: {type(e).__name__}: {e}")
+                if conn.in_transaction:
+                    conn.rollback()
+            else:
+                outcome = "ok"
+                if operation == "submit_donation":
+                    recorder.submitted.append(document_id)
+                elif operation == "update_status":
+                    if result:
+                        recorder.status_set.append((donation_id, status))
+                    else:
+                        outcome = "conflict"
+                elif operation == "update_user":
+                    recorder.user_names.append((values[-1], name))
+            recorder.latencies[operation].append((time.perf_counter() - start) * 1000)
+            recorder.outcomes[operation][outcome] += 1
+    finally:
+        db.close()
+
+
+def worker_process(config, process_id, results):
+    database.BUSY_TIMEOUT_MS = config["busy_timeout_ms"]
+    os.chdir(config["workdir"])  # stored documents go to the scratch directory
+    recorder = Recorder()
+    stop_at = config["start_at"] + config["seconds"]
+    while time.time() < config["start_at"]:
+        time.sleep(0.001)
+    threads = [threading.Thread(target=worker_thread, args=(config, process_id * 1000 + t, recorder, stop_at))
+               for t in range(config["threads"])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(recorder.__dict__)
+
+
+# --- Checks after the run ---
+
+def verify(config, merged):
+    problems = []
+    conn = migrations.attach_users(database.connect(config["donations_db"]), config["users_db"])
+    # delete_food only targets rows that existed before the run, so every
+    # successful submit must still be there
+    present = {row[0] for row in conn.execute("SELECT document_id FROM food_donations WHERE document_id LIKE 'STRESS-%'")}
+    lost = [document_id for document_id in merged["submitted"] if document_id not in present]
+    if lost:
+        problems.append(f"{len(lost)} submitted donation(s) missing")
+    if len(present) > len(merged["submitted"]):
+        problems.append(f"{len(present) - len(merged['submitted'])} donation(s) stored but reported as failed")
+
+    decided = {}
+    for donation_id, status in merged["status_set"]:
+        decided.setdefault(donation_id, []).append(status)
+    doubles = [donation_id for donation_id, statuses in decided.items() if len(statuses) > 1]
+    if doubles:
+        problems.append(f"{len(doubles)} donation(s) accepted/rejected more than once")
+    for donation_id, statuses in decided.items():
+        row = conn.execute("SELECT status FROM food_donations WHERE id = ?", (donation_id,)).fetchone()
+        if row is not None and row[0] != statuses[-1]:
+            problems.append(f"donation {donation_id} is {row[0]}, expected {statuses[-1]}")
+            break
+
+    written = {}
+    for user_id, name in merged["user_names"]:
+        written.setdefault(user_id, set()).add(name)
+    for user_id, names in written.items():
+        row = conn.execute("SELECT name FROM users WHERE id = ?", (user_id,)).fetchone()
+        if row is not None and row[0] not in names:
+            problems.append(f"user {user_id} has a name no successful update wrote")
+            break
+
+    for table, keys, counters in migrations.rollups("d"):
+        stored = f"SELECT {', '.join([*keys, *counters])} FROM {table}"
+        expected = migrations.rollup_query(table)
+        drift = conn.execute(f"""
+            SELECT (SELECT COUNT(*) FROM ({expected} EXCEPT {stored})) + (SELECT COUNT(*) FROM ({stored} EXCEPT {expected}))
+        """).fetchone()[0]
+        if drift:
+            problems.append(f"{table} differs from the donations in {drift} group(s)")
+    if conn.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+        problems.append("integrity_check failed")
+    conn.close()
+    return problems
+
+
+def prepare(directory, data):
+    users_db = os.path.join(directory, migrations.USERS_DB)
+    donations_db = os.path.join(directory, migrations.DONATIONS_DB)
+    if data:
+        copy_database(os.path.join(data, migrations.USERS_DB), users_db)
+        copy_database(os.path.join(data, migrations.DONATIONS_DB), donations_db)
+        migrations.migrate(users_db, donations_db)
+    else:
+        generate_data.generate(directory, *SCRATCH_DATASET)
+    return users_db, donations_db
+
+
+def run(processes, threads, seconds, data, busy_timeout_ms):
+    with tempfile.TemporaryDirectory() as directory:
+        users_db, donations_db = prepare(directory, data)
+        document = os.path.join(directory, "stress-document.pdf")
+        with open(document, "wb") as f:
+            f.write(b"%PDF-1.4 stress document\n")
+        conn = migrations.attach_users(database.connect(donations_db), users_db)
+        config = {
+            "users_db": users_db, "donations_db": donations_db, "workdir": directory, "document": document,
+            "threads": threads, "seconds": seconds, "busy_timeout_ms": busy_timeout_ms,
+            "today": time.strftime("%Y-%m-%d"),
+            "orphanage_phones": [row[0] for row in conn.execute("SELECT phone FROM users WHERE role = 'Orphanage' LIMIT 200")],
+            "hotel_phones": [row[0] for row in conn.execute("SELECT phone FROM users WHERE role = 'Hotel' LIMIT 200")],
+            "max_food_id": conn.execute("SELECT MAX(id) FROM food_donations").fetchone()[0],
+            "max_user_id": conn.execute("SELECT MAX(id) FROM users").fetchone()[0],
+            "start_at": time.time() + 1.0 + 0.2 * processes,  # let every process start before the clock runs
+        }
+        conn.close()
+
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=worker_process, args=(config, p, results)) for p in range(processes)]
+        for process in workers:
+            process.start()
+        recorded = [results.get() for _ in workers]
+        for process in workers:
+            process.join()
+
+        merged = {key: [] for key in ("submitted", "status_set", "user_names", "errors")}
+        latencies = {name: [] for name in MIX}
+        outcomes = {name: {"ok": 0, "locked": 0, "conflict": 0, "error": 0} for name in MIX}
+        for recorder in recorded:
+            for key in merged:
+                merged[key] += recorder[key]
+            for name in MIX:
+                latencies[name] += recorder["latencies"][name]
+                for outcome, count in recorder["outcomes"][name].items():
+                    outcomes[name][outcome] += count
+        problems = verify(config, merged)
+
+    report = {"processes": processes, "threads": threads, "seconds": seconds, "busy_timeout_ms": busy_timeout_ms,
+              "operations": {}, "problems": problems, "errors": merged["errors"][:20]}
+    for name in MIX:
+        values = latencies[name]
+        report["operations"][name] = {
+            **outcomes[name],
+            "per_second": outcomes[name]["ok"] / seconds,
+            "p50_ms": statistics.median(values) if values else None,
+            "p99_ms": percentile(values, 0.99) if values else None,
+            "max_ms": max(values) if values else None,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{report['processes']} processes x {report['threads']} threads, {report['seconds']} s, "
+          f"busy timeout {report['busy_timeout_ms']} ms")
+    print(f"{'operation':>16} {'ok/s':>8} {'ok':>7} {'locked':>7} {'conflict':>9} {'error':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, stats in report["operations"].items():
+        timing = " ".join(f"{stats[key]:>8.2f}" if stats[key] is not None else f"{'-':>8}" for key in ("p50_ms", "p99_ms", "max_ms"))
+        print(f"{name:>16} {stats['per_second']:>8.1f} {stats['ok']:>7} {stats['locked']:>7} {stats['conflict']:>9} {stats['error']:>6} {timing}")
+    for error in report["errors"][:5]:
+        print(f"  {error}")
+    if report["problems"]:
+        for problem in report["problems"]:
+            print(f"PROBLEM: {problem}")
+    else:
+        print("consistency checks passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent writers against a scratch copy of the databases")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--data", help="copy users.db / hotel_food_donation.db from this directory "
+                                       "(default: a generated scratch dataset)")
+    parser.add_argument("--busy-timeout-ms", type=int, default=database.BUSY_TIMEOUT_MS)
+    parser.add_argument("--json", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.processes, args.threads, args.seconds, args.data, args.busy_timeout_ms)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
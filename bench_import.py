@@ -0,0 +1,99 @@
+import argparse
+import csv
+import os
+import tempfile
+import threading
+import time
+
+import bulk_import
+import database
+from bench_concurrency import prepare
+from db_worker import Connections
+
+# Bulk import benchmark: imports a generated CSV of --rows donations into a
+# scratch copy of the databases (from --data, or a small generated dataset)
+# and reports the total time, the longest write transaction of the import and
+# the longest wait of a probe writer that commits a tiny transaction every
+# PROBE_INTERVAL seconds meanwhile (it fails with "database is locked" after
+# the busy timeout).
+# Usage: python bench_import.py [--rows 100000] [--data bench_data]
+
+PROBE_INTERVAL = 0.05
+DOCUMENTS = 20  # distinct documents referenced by the rows
+
+
+def write_csv(path, rows, orphanage_phones, documents):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(bulk_import.FIELDS)
+        for i in range(rows):
+            writer.writerow([f"Food {i % 37}", f"{1 + i % 20} kg", documents[i % len(documents)], f"IMPORT{i:09d}",
+                             orphanage_phones[i % len(orphanage_phones)], f"{i % 500} Market Road",
+                             f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}"])
+
+
+# Commit an empty write transaction every PROBE_INTERVAL until `stop` is set;
+# returns [longest wait in seconds, failures]
+def probe_writer(donations_db, stop, result):
+    conn = database.connect(donations_db)
+    try:
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.commit()
+            except Exception:
+                result[1] += 1
+            result[0] = max(result[0], time.perf_counter() - start)
+            time.sleep(PROBE_INTERVAL)
+    finally:
+        conn.close()
+
+
+def run(rows, data):
+    with tempfile.TemporaryDirectory() as directory:
+        users_db, donations_db = prepare(directory, data)
+        cwd = os.getcwd()
+        os.chdir(directory)  # document_store writes under ./documents
+        try:
+            documents = []
+            for i in range(DOCUMENTS):
+                documents.append(os.path.join(directory, f"report-{i}.pdf"))
+                with open(documents[-1], "wb") as f:
+                    f.write(os.urandom(64 * 1024))
+            db = Connections(users_db, donations_db)
+            phones = [row[0] for row in db.users.execute("SELECT phone FROM users WHERE role = 'Orphanage'")]
+            path = os.path.join(directory, "import.csv")
+            write_csv(path, rows, phones, documents)
+
+            stop, probe = threading.Event(), [0.0, 0]
+            thread = threading.Thread(target=probe_writer, args=(donations_db, stop, probe))
+            thread.start()
+            start = time.perf_counter()
+            try:
+                report = bulk_import.import_file(db, path)
+            finally:
+                elapsed = time.perf_counter() - start
+                stop.set()
+                thread.join()
+                db.close()
+        finally:
+            os.chdir(cwd)
+    return report, elapsed, probe
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import throughput")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--data", help="copy users.db / hotel_food_donation.db from this directory")
+    args = parser.parse_args()
+
+    report, elapsed, (longest_wait, failures) = run(args.rows, args.data)
+    print(f"imported {report.inserted} of {args.rows} row(s) in {elapsed:.2f}s "
+          f"({report.inserted / elapsed:.0f} rows/s), {len(report.errors)} error(s)")
+    print(f"longest write transaction {report.write_seconds:.2f}s; probe writer waited at most "
+          f"{longest_wait * 1000:.0f} ms, {failures} failure(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+import database
+import migrations
+
+# Benchmark for the hot lookups covered by the schema indexes.
+# Usage: python bench_indexes.py [rows ...]   (default: 10000 100000 1000000)
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+PROBES = 200
+ORPHANAGE_COUNT = 2_000
+STATUSES = ["Pending", "Accepted", "Rejected"]
+
+LOOKUP_ORPHANAGE = "SELECT name, address, organization_name FROM users WHERE phone = ? AND role = 'Orphanage'"
+LOOKUP_PENDING = """
+    SELECT id, food_name, quantity, document_id, document_path, hotel_address, status, donation_date
+    FROM food_donations
+    WHERE status='Pending' AND orphanage_phone=?
+"""
+LOOKUP_DATE = "SELECT COUNT(*) FROM food_donations WHERE donation_date = ?"
+
+
+def phone_for(i):
+    return f"9{i:09d}"
+
+
+def fill_users(conn, rows):
+    roles = ["Hotel", "Orphanage"]
+    conn.executemany(
+        "INSERT INTO users (name, email, phone, password, role, address, organization_name) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((f"user{i}", f"user{i}@example.com", phone_for(i), "x", roles[i % 2], f"city{i % 500}", f"org{i}")
+         for i in range(rows)),
+    )
+    conn.commit()
+
+
+def fill_donations(conn, rows):
+    rnd = random.Random(42)
+    conn.executemany(
+        """INSERT INTO food_donations (food_name, quantity, document_path, document_id,
+           orphanage_phone, hotel_address, donation_date, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        ((f"food{i % 100}", f"{i % 20 + 1}kg", f"doc{i}.pdf", f"D{i}",
+          phone_for(rnd.randrange(ORPHANAGE_COUNT) * 2 + 1), f"city{i % 500}",
+          f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}", rnd.choice(STATUSES))
+         for i in range(rows)),
+    )
+    conn.commit()
+
+
+def build(directory, rows, indexed):
+    users_path = os.path.join(directory, f"users_{rows}_{int(indexed)}.db")
+    donations_path = os.path.join(directory, f"donations_{rows}_{int(indexed)}.db")
+    users_conn = database.connect(users_path)
+    donations_conn = database.connect(donations_path)
+    # Version 1 is the original unindexed schema and version 2 adds the lookup
+    # indexes; later versions (full-text search, rollup and change-log
+    # triggers) would only slow down the fill and are left out
+    steps = 2 if indexed else 1
+    users_steps = migrations.USERS_MIGRATIONS[:steps]
+    donation_steps = migrations.DONATIONS_MIGRATIONS[:steps]
+    migrations.apply_migrations(users_conn, users_steps)
+    migrations.apply_migrations(donations_conn, donation_steps)
+    fill_users(users_conn, rows)
+    fill_donations(donations_conn, rows)
+    users_conn.execute("ANALYZE")
+    donations_conn.execute("ANALYZE")
+    return users_conn, donations_conn
+
+
+def time_query(conn, query, params_list):
+    start = time.perf_counter()
+    for params in params_list:
+        conn.execute(query, params).fetchall()
+    return (time.perf_counter() - start) / len(params_list) * 1000
+
+
+def query_plan(conn, query, params):
+    return "; ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params))
+
+
+def run(sizes):
+    rnd = random.Random(7)
+    phones = [(phone_for(rnd.randrange(ORPHANAGE_COUNT) * 2 + 1),) for _ in range(PROBES)]
+    dates = [(f"2025-{rnd.randrange(12) + 1:02d}-{rnd.randrange(28) + 1:02d}",) for _ in range(PROBES)]
+    print(f"{'rows':>10} {'index':>6} {'user lookup ms':>15} {'pending ms':>11} {'by date ms':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            for indexed in (False, True):
+                users_conn, donations_conn = build(directory, rows, indexed)
+                user_ms = time_query(users_conn, LOOKUP_ORPHANAGE, phones)
+                pending_ms = time_query(donations_conn, LOOKUP_PENDING, phones)
+                date_ms = time_query(donations_conn, LOOKUP_DATE, dates)
+                print(f"{rows:>10} {'yes' if indexed else 'no':>6} {user_ms:>15.3f} {pending_ms:>11.3f} {date_ms:>11.3f}")
+                if indexed and rows == sizes[-1]:
+                    print("  plans:")
+                    print("   ", query_plan(users_conn, LOOKUP_ORPHANAGE, phones[0]))
+                    print("   ", query_plan(donations_conn, LOOKUP_PENDING, phones[0]))
+                    print("   ", query_plan(donations_conn, LOOKUP_DATE, dates[0]))
+                users_conn.close()
+                donations_conn.close()
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,89 @@
+import argparse
+import heapq
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import database
+import matching
+import migrations
+
+# Nearest-orphanage benchmark: a grid index over N random orphanages in
+# India's bounding box against a brute-force scan, plus the geocoding lookup
+# against a places table of the same size. Grid results are checked against
+# brute force.
+# Usage: python bench_matching.py [--orphanages 100000] [--queries 2000] [-k 5]
+
+LAT_RANGE = (8.0, 35.0)
+LON_RANGE = (68.0, 97.0)
+BRUTE_FORCE_QUERIES = 100
+
+
+def random_point(rnd):
+    return rnd.uniform(*LAT_RANGE), rnd.uniform(*LON_RANGE)
+
+
+def brute_force(points, latitude, longitude, k):
+    return heapq.nsmallest(k, ((matching.haversine_km(latitude, longitude, lat, lon), item) for lat, lon, item in points))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def time_each(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(*query)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+def run(orphanages, query_count, k):
+    rnd = random.Random(17)
+    points = [(*random_point(rnd), i) for i in range(orphanages)]
+    queries = [random_point(rnd) for _ in range(query_count)]
+
+    start = time.perf_counter()
+    grid = matching.GridIndex(points)
+    print(f"{orphanages} orphanages, grid of {len(grid.cells)} cells built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    grid_us = time_each(lambda lat, lon: grid.nearest(lat, lon, k), queries)
+    brute_us = time_each(lambda lat, lon: brute_force(points, lat, lon, k), queries[:BRUTE_FORCE_QUERIES])
+    for name, timings in (("grid", grid_us), ("brute force", brute_us)):
+        print(f"  {name:>11}: mean {statistics.mean(timings):9.1f} us   p99 {percentile(timings, 0.99):9.1f} us   ({len(timings)} queries)")
+
+    mismatches = 0
+    for lat, lon in queries[:BRUTE_FORCE_QUERIES]:
+        expected = [item for _, item in brute_force(points, lat, lon, k)]
+        if [item for _, item in grid.nearest(lat, lon, k)] != expected:
+            mismatches += 1
+    print(f"  grid vs brute force: {mismatches} mismatching result(s) in {BRUTE_FORCE_QUERIES} queries")
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = database.connect(os.path.join(directory, "users.db"))
+        migrations.apply_migrations(conn, migrations.USERS_MIGRATIONS)
+        with conn:
+            conn.executemany("INSERT INTO places (name, latitude, longitude) VALUES (?, ?, ?)",
+                             ((f"place{i}", lat, lon) for lat, lon, i in points))
+        addresses = [(f"near the bus stand, place{rnd.randrange(orphanages)} road",) for _ in range(query_count)]
+        geocode_us = time_each(lambda address: matching.geocode(conn, address), addresses)
+        print(f"  {'geocode':>11}: mean {statistics.mean(geocode_us):9.1f} us   p99 {percentile(geocode_us, 0.99):9.1f} us   ({len(geocode_us)} addresses)")
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest-orphanage matching benchmark")
+    parser.add_argument("--orphanages", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    run(args.orphanages, args.queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import data_access
+import database
+import expiry
+import generate_data
+import matching
+import orphanage_directory
+from db_worker import Connections
+
+# Benchmark suite for every database path used by the panels (homepage,
+# hotel, ht1, orphanage, admin), run against databases from generate_data.py.
+# Each case is timed over REPEAT calls with random probes drawn from a fixed
+# seed; writes are undone afterwards so runs can be repeated on the same data.
+# Results are written as JSON. With --baseline, each case's median is compared
+# with an earlier run and slowdowns beyond --threshold are flagged (exit code 1).
+# Usage: python bench_queries.py --data bench_data [--out results.json] [--baseline old.json]
+#        python bench_queries.py   (generates a small dataset in a temporary directory)
+
+REPEAT = 50
+WRITE_REPEAT = 20
+THRESHOLD = 1.3  # flag cases whose median grew by more than 30%...
+MIN_DELTA_MS = 0.05  # ...and by more than this, so sub-millisecond noise is ignored
+SMALL_DATASET = (10_000, 200_000)
+BENCH_PREFIX = "BENCH-"
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def time_case(fn, repeat):
+    fn()  # warm the page cache and the statement cache
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"calls": repeat, "mean_ms": statistics.mean(timings), "p50_ms": statistics.median(timings),
+            "p95_ms": percentile(timings, 0.95), "p99_ms": percentile(timings, 0.99), "max_ms": max(timings)}
+
+
+# (name, function, repeat) for every path; `db` is a db_worker.Connections
+def cases(db, rnd, document):
+    conn = db.conn
+    users = conn.execute("SELECT id, email, phone, role FROM users WHERE id % 97 = 0 LIMIT 500").fetchall()
+    orphanage_phones = [phone for _, _, phone, role in users if role == "Orphanage"]
+    hotel_phones = [phone for _, _, phone, role in users if role == "Hotel"]
+    max_user = conn.execute("SELECT MAX(id) FROM users").fetchone()[0]
+    max_food = conn.execute("SELECT MAX(id) FROM food_donations").fetchone()[0]
+    document_ids = [row[0] for row in conn.execute("SELECT document_id FROM food_donations WHERE id % 997 = 0 LIMIT 500")]
+    busiest = conn.execute("""
+        SELECT orphanage_phone FROM food_donations WHERE status = 'Pending'
+        GROUP BY orphanage_phone ORDER BY COUNT(*) DESC LIMIT 1
+    """).fetchone()
+    busiest = busiest[0] if busiest else orphanage_phones[0]
+    days = conn.execute("SELECT MIN(donation_date), MAX(donation_date) FROM food_donations").fetchone()
+    grid = matching.orphanage_index(db)[1]
+    addresses = [row[0] for row in conn.execute("SELECT address FROM users WHERE role = 'Hotel' LIMIT 200")]
+    counter = iter(range(10 ** 9))
+
+    def login():
+        user_id, email, _, _ = rnd.choice(users)
+        assert data_access.find_user(db, email, generate_data.hashed_password(user_id - 1)) is not None
+
+    def register():
+        n = next(counter)
+        data_access.register_user(db, f"Bench {n}", f"{BENCH_PREFIX}{n}@example.com", f"8{n:09d}", "x", "Hotel", "bench road", "Bench")
+
+    def submit_donation():
+        n = next(counter)
+        data_access.submit_donation(db, "Rice", "5 kg", document, f"{BENCH_PREFIX}{n}", rnd.choice(orphanage_phones),
+                                    "bench road", days[1], rnd.choice(hotel_phones), "")
+
+    def submit_food_request():
+        n = next(counter)
+        data_access.submit_food_request(db, "Rice", "5 kg", document, f"{BENCH_PREFIX}R{n}", rnd.choice(orphanage_phones),
+                                        "bench road", days[1], "")
+
+    state = {}
+
+    def refresh_unchanged():
+        if "watermark" not in state:  # taken on the untimed warm-up call
+            state["watermark"] = data_access.pending_snapshot(db, busiest)[1]
+        data_access.pending_changes(db, busiest, state["watermark"])
+
+    def directory_unchanged():
+        if "directory" not in state:  # taken on the untimed warm-up call
+            state["directory"] = orphanage_directory.load(db)[0]
+        orphanage_directory.load(db, state["directory"])
+
+    pending_ids = [row[0] for row in conn.execute("SELECT id FROM food_donations WHERE status = 'Pending' LIMIT 200")]
+    accepted = []
+
+    def accept():
+        if pending_ids:
+            donation_id = pending_ids.pop()
+            data_access.set_donation_status(db, donation_id, "Accepted")
+            accepted.append(donation_id)
+
+    def undo():
+        with conn:
+            conn.execute("DELETE FROM food_donations WHERE document_id LIKE ?", (BENCH_PREFIX + "%",))
+            conn.execute("DELETE FROM food_requests WHERE reference_id LIKE ?", (BENCH_PREFIX + "%",))
+            conn.execute("DELETE FROM sms_outbox WHERE dedupe_key LIKE ?", (f"donation:{BENCH_PREFIX}%",))
+            conn.execute("DELETE FROM users WHERE email LIKE ?", (BENCH_PREFIX + "%",))
+            conn.executemany("UPDATE food_donations SET status = 'Pending' WHERE id = ?", [(i,) for i in accepted])
+
+    return [
+        ("homepage.login", login, REPEAT),
+        ("homepage.register", register, WRITE_REPEAT),
+        ("hotel.find_orphanage", lambda: data_access.find_orphanage(db, rnd.choice(orphanage_phones)), REPEAT),
+        ("hotel.orphanage_directory_check", directory_unchanged, REPEAT),
+        ("hotel.orphanage_directory_load", lambda: orphanage_directory.load(db), 10),
+        ("hotel.submit_donation", submit_donation, WRITE_REPEAT),
+        ("hotel.donation_status", lambda: data_access.donation_status(db, rnd.choice(document_ids)), REPEAT),
+        ("hotel.nearby_orphanages", lambda: matching.nearest_orphanages(db, rnd.choice(addresses), 5, grid), REPEAT),
+        ("ht1.submit_food_request", submit_food_request, WRITE_REPEAT),
+        ("orphanage.load_donations", lambda: data_access.pending_snapshot(db, rnd.choice(orphanage_phones)), REPEAT),
+        ("orphanage.load_donations_busiest", lambda: data_access.pending_snapshot(db, busiest), REPEAT),
+        ("orphanage.refresh_unchanged", refresh_unchanged, REPEAT),
+        ("orphanage.past_donations", lambda: data_access.past_donations(db, rnd.choice(orphanage_phones)), REPEAT),
+        ("orphanage.archived_donations", lambda: data_access.archived_donations(db, rnd.choice(orphanage_phones)), REPEAT),
+        ("orphanage.update_status", accept, WRITE_REPEAT),
+        ("admin.users_first_page", lambda: data_access.users_page(db, 0, 100), REPEAT),
+        ("admin.users_deep_page", lambda: data_access.users_page(db, rnd.randrange(max_user), 100), REPEAT),
+        ("admin.food_first_page", lambda: data_access.food_page(db, 0, 100), REPEAT),
+        ("admin.food_deep_page", lambda: data_access.food_page(db, rnd.randrange(max_food), 100), REPEAT),
+        ("admin.food_last_page", lambda: data_access.food_page(db, max_food + 1, 100, False), REPEAT),
+        ("admin.user_row", lambda: data_access.user_row(db, rnd.randrange(1, max_user + 1)), REPEAT),
+        ("admin.food_row", lambda: data_access.food_row(db, rnd.randrange(1, max_food + 1)), REPEAT),
+        ("admin.search_users", lambda: data_access.search_users(db, rnd.choice(["aarav", "city4", "home", "98"])), REPEAT),
+        ("admin.search_donations", lambda: data_access.search_donations(db, rnd.choice(["rice", "pending", "gen0001", "city12"])), REPEAT),
+        ("admin.search_donations_archive", lambda: data_access.search_donations(db, rnd.choice(["gen0001", "city12", "paneer"]), True), REPEAT),
+        ("admin.analytics_month", lambda: data_access.analytics(db, days[1][:8] + "01"), REPEAT),
+        ("admin.analytics_all", lambda: data_access.analytics(db), 10),
+        ("report.quantity_totals_month", lambda: data_access.quantity_totals(db, days[1][:8] + "01", days[1]), REPEAT),
+        ("expiry.next_deadline", lambda: expiry.next_deadline(conn), REPEAT),
+    ], undo
+
+
+def run(users_db, donations_db, seed, only=None):
+    rnd = random.Random(seed)
+    db = Connections(users_db, donations_db)
+    document = os.path.join(tempfile.gettempdir(), "bench_queries_document.pdf")
+    with open(document, "wb") as f:
+        f.write(b"%PDF-1.4 bench document\n")
+    results = {}
+    all_cases, undo = cases(db, rnd, document)
+    try:
+        for name, fn, repeat in all_cases:
+            if only and not any(part in name for part in only):
+                continue
+            results[name] = time_case(fn, repeat)
+            print(f"{name:>34}  p50 {results[name]['p50_ms']:9.3f} ms   p99 {results[name]['p99_ms']:9.3f} ms")
+    finally:
+        undo()
+        db.close()
+    conn = database.connect(donations_db)
+    rows = conn.execute("SELECT COUNT(*) FROM food_donations").fetchone()[0]
+    conn.close()
+    return {"meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                     "sqlite": sqlite3.sqlite_version, "donations": rows, "seed": seed},
+            "results": results}
+
+
+# [(case, baseline ms, current ms, ratio)] for cases slower than the baseline
+def regressions(current, baseline, threshold=THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    found = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        old, new = before["p50_ms"], result["p50_ms"]
+        if new > old * threshold and new - old > min_delta_ms:
+            found.append((name, old, new, new / old))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every SQL path of the panels")
+    parser.add_argument("--data", help="directory with users.db and hotel_food_donation.db from generate_data.py")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="*", help="run only cases whose name contains one of these")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.data:
+            users_db = os.path.join(args.data, "users.db")
+            donations_db = os.path.join(args.data, "hotel_food_donation.db")
+        else:
+            print(f"generating {SMALL_DATASET[0]} users and {SMALL_DATASET[1]} donations (use --data for a real dataset)")
+            users_db, donations_db = generate_data.generate(directory, *SMALL_DATASET, seed=args.seed)
+        # Stored documents of the write cases go to a scratch directory
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            report = run(os.path.abspath(os.path.join(cwd, users_db)), os.path.abspath(os.path.join(cwd, donations_db)),
+                         args.seed, args.only)
+        finally:
+            os.chdir(cwd)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        found = regressions(report, baseline, args.threshold)
+        for name, old, new, ratio in found:
+            print(f"REGRESSION {name}: {old:.3f} ms -> {new:.3f} ms ({ratio:.2f}x)")
+        if found:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import time
+
+import bench_indexes
+import database
+import migrations
+import search
+
+# Compare the old six-way LIKE scan with the FTS5 search used by AdminPanel.
+# Usage: python bench_search.py [rows ...]   (default: 10000 100000 300000)
+
+DEFAULT_SIZES = [10_000, 100_000, 300_000]
+KEYWORDS = ["food17", "city42", "D12345", "9000000", "pend"]
+
+LIKE_DONATIONS = """
+    SELECT id, food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date, status
+    FROM food_donations
+    WHERE food_name LIKE ? OR quantity LIKE ? OR document_id LIKE ? OR orphanage_phone LIKE ? OR hotel_address LIKE ? OR status LIKE ?
+    LIMIT ?
+"""
+
+
+def time_ms(fn, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(sizes):
+    print(f"{'rows':>10} {'keyword':>10} {'LIKE ms':>9} {'FTS ms':>8} {'hits':>6}")
+    with tempfile.TemporaryDirectory() as directory:
+        # Search joins donations to users, so an (empty) users.db is attached
+        users_path = os.path.join(directory, "users.db")
+        users_conn = database.connect(users_path)
+        migrations.apply_migrations(users_conn, migrations.USERS_MIGRATIONS)
+        users_conn.close()
+        for rows in sizes:
+            conn = migrations.attach_users(database.connect(os.path.join(directory, f"donations_{rows}.db")), users_path)
+            migrations.apply_migrations(conn, migrations.DONATIONS_MIGRATIONS)
+            bench_indexes.fill_donations(conn, rows)
+            cursor = conn.cursor()
+            for keyword in KEYWORDS:
+                like = (f"%{keyword}%",) * 6 + (search.SEARCH_LIMIT,)
+                like_ms = time_ms(lambda: cursor.execute(LIKE_DONATIONS, like).fetchall())
+                fts_ms = time_ms(lambda: search.search_donations(cursor, keyword))
+                hits = len(search.search_donations(cursor, keyword))
+                print(f"{rows:>10} {keyword:>10} {like_ms:>9.2f} {fts_ms:>8.2f} {hits:>6}")
+            conn.close()
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# Load generator for service.py: starts the service on scratch databases (or
+# uses --url), registers a hotel and some orphanages, then keeps --clients
+# keep-alive connections busy for --seconds with a mix of reads and donation
+# submissions. Reports requests per second and latency percentiles per
+# operation.
+# Usage: python bench_service.py [--clients 32] [--seconds 10] [--write-ratio 0.1] [--url http://127.0.0.1:8765]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ORPHANAGES = 20
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def wait_until_up(url, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"service at {url} did not start")
+
+
+class Client:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def call(self, operation, *args):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps({"args": args}).encode()
+        self.writer.write((f"POST /api/{operation} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        payload = json.loads(await self.reader.readexactly(length))
+        return status, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def seed(client, run_id):
+    password = hashlib.sha256(b"bench").hexdigest()
+    hotel_phone = f"8{run_id % 10**9:09d}"
+    await client.call("register_user", "Bench Hotel", f"hotel-{run_id}@bench", hotel_phone, password, "Hotel", "bench road", "Bench Hotel")
+    phones = []
+    for i in range(ORPHANAGES):
+        phone = f"7{(run_id + i) % 10**9:09d}"
+        await client.call("register_user", f"Orphanage {i}", f"orphanage-{run_id}-{i}@bench", phone, password, "Orphanage",
+                          f"street {i}", f"Home {i}")
+        phones.append(phone)
+    return hotel_phone, phones
+
+
+async def worker(client, stop_at, write_ratio, document, hotel_phone, phones, run_id, worker_id, timings, errors):
+    rnd = random.Random(worker_id)
+    submitted = []
+    n = 0
+    today = time.strftime("%Y-%m-%d")
+    while time.perf_counter() < stop_at:
+        n += 1
+        if rnd.random() < write_ratio:
+            document_id = f"bench-{run_id}-{worker_id}-{n}"
+            operation, args = "submit_donation", ("Rice", "5 kg", document, document_id, rnd.choice(phones), "bench road",
+                                                  today, hotel_phone, "")
+            submitted.append(document_id)
+        else:
+            choice = rnd.random()
+            if choice < 0.5:
+                operation, args = "pending_snapshot", (rnd.choice(phones),)
+            elif choice < 0.8 and submitted:
+                operation, args = "donation_status", (rnd.choice(submitted),)
+            else:
+                operation, args = "search_donations", ("rice",)
+        start = time.perf_counter()
+        status, payload = await client.call(operation, *args)
+        timings.setdefault(operation, []).append((time.perf_counter() - start) * 1000)
+        if status != 200:
+            errors.append((operation, payload.get("error")))
+
+
+async def load(url, clients, seconds, write_ratio, document):
+    host, port = url.split("//")[1].split(":")
+    run_id = int(time.time())
+    seeder = Client(host, int(port))
+    hotel_phone, phones = await seed(seeder, run_id)
+    seeder.close()
+
+    connections = [Client(host, int(port)) for _ in range(clients)]
+    timings, errors = {}, []
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(c, start + seconds, write_ratio, document, hotel_phone, phones, run_id, i, timings, errors)
+                           for i, c in enumerate(connections)))
+    elapsed = time.perf_counter() - start
+    for c in connections:
+        c.close()
+    return timings, errors, elapsed
+
+
+def report(timings, errors, elapsed, clients):
+    everything = [ms for values in timings.values() for ms in values]
+    print(f"{clients} clients, {len(everything)} requests in {elapsed:.1f} s: {len(everything) / elapsed:.0f} req/s, "
+          f"{len(errors)} error(s)")
+    print(f"{'operation':>18} {'count':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for operation, values in sorted(timings.items()) + [("all", everything)]:
+        print(f"{operation:>18} {len(values):>7} {statistics.median(values):>8.2f} {percentile(values, 0.99):>8.2f} {max(values):>8.2f}")
+    for operation, error in errors[:5]:
+        print(f"  {operation}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the HTTP/JSON service")
+    parser.add_argument("--url", help="use a running service instead of starting one on scratch databases")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        document = os.path.join(directory, "bench-document.pdf")
+        with open(document, "wb") as f:
+            f.write(b"%PDF-1.4 bench document\n")
+        server = None
+        url = args.url
+        if url is None:
+            url = f"http://127.0.0.1:{args.port}"
+            server = subprocess.Popen([sys.executable, os.path.join(HERE, "service.py"), "--port", str(args.port)],
+                                      cwd=directory, stdout=subprocess.DEVNULL, env={**os.environ, "SMS_TRANSPORT": "loopback"})
+        try:
+            wait_until_up(url)
+            timings, errors, elapsed = asyncio.run(load(url, args.clients, args.seconds, args.write_ratio, document))
+            report(timings, errors, elapsed, args.clients)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
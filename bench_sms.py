@@ -0,0 +1,49 @@
+import argparse
+import os
+import tempfile
+import time
+
+import database
+import migrations
+import notifications
+
+# Offline throughput test for the SMS outbox: queue N messages in a scratch
+# database and drain them through LoopbackTransport, which simulates gateway
+# latency and failures.
+# Usage: python bench_sms.py [--messages 2000] [--latency-ms 20] [--failure-rate 0.05]
+
+
+def run(messages, latency_ms, failure_rate, concurrency_levels):
+    print(f"{'concurrency':>11} {'sent':>6} {'failed':>7} {'seconds':>8} {'msg/s':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for concurrency in concurrency_levels:
+            db_path = os.path.join(directory, f"outbox_{concurrency}.db")
+            conn = database.connect(db_path)
+            migrations.apply_migrations(conn, migrations.DONATIONS_MIGRATIONS)
+            with conn:
+                for i in range(messages):
+                    notifications.enqueue_sms(conn, f"9{i:09d}", f"message {i}", f"bench:{i}")
+                    notifications.enqueue_sms(conn, f"9{i:09d}", f"message {i}", f"bench:{i}")  # deduped
+            conn.close()
+
+            transport = notifications.LoopbackTransport(latency=latency_ms / 1000, failure_rate=failure_rate, seed=1)
+            dispatcher = notifications.SMSDispatcher(db_path, transport, concurrency=concurrency, max_attempts=1)
+            start = time.perf_counter()
+            sent, failed = dispatcher.drain()
+            elapsed = time.perf_counter() - start
+            print(f"{concurrency:>11} {sent:>6} {failed:>7} {elapsed:>8.2f} {sent / elapsed:>8.0f}")
+            assert len(transport.sent) == sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMS outbox throughput with a loopback transport")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    run(args.messages, args.latency_ms, args.failure_rate, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
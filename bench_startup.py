@@ -0,0 +1,110 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Cold-start benchmark for homepage.py.
+# Runs the home page in a fresh interpreter with -X importtime, stops it right
+# after the first frame has been drawn and reports:
+#   - time to first frame (process spawn -> first Tk update finished)
+#   - the slowest imports before the first frame
+#   - heavy modules that must stay off the startup path (twilio, PIL, ...)
+# Exits with status 1 when the median time exceeds the budget, so it can be
+# used as a regression check.
+#
+# Needs a display (Tk must be able to open a window).
+# Usage: python bench_startup.py [--runs 5] [--budget-ms 1500]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUDGET_MS = 1500
+LAZY_MODULES = ["twilio", "PIL", "hotel", "orphanage", "admin"]
+FIRST_FRAME_MARKER = "FIRST_FRAME"
+
+# Run homepage.py, replacing mainloop with "draw one frame, report, exit"
+DRIVER = f"""
+import runpy, sys, tkinter
+
+def first_frame(self, n=0):
+    self.update()
+    print("{FIRST_FRAME_MARKER}", flush=True)
+    print("MODULES", ",".join(sorted(sys.modules)), flush=True)
+    self.destroy()
+
+tkinter.Misc.mainloop = first_frame
+runpy.run_path("homepage.py", run_name="__main__")
+"""
+
+
+def run_once():
+    # -X importtime output is large; send it to a file so the pipe never blocks the child
+    with tempfile.TemporaryFile(mode="w+") as stderr_file:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-X", "importtime", "-c", DRIVER], cwd=HERE,
+                                stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+        first_frame_ms = None
+        modules = set()
+        for line in proc.stdout:
+            if line.strip() == FIRST_FRAME_MARKER:
+                first_frame_ms = (time.perf_counter() - start) * 1000
+            elif line.startswith("MODULES "):
+                modules = set(line.split(" ", 1)[1].strip().split(","))
+        proc.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+    if first_frame_ms is None:
+        raise RuntimeError(f"homepage.py did not draw a frame:\n{stderr[-2000:]}")
+    return first_frame_ms, parse_importtime(stderr), modules
+
+
+# Parse "import time: self [us] | cumulative | imported package" lines.
+# Nested imports keep their leading indentation in the name.
+def parse_importtime(stderr):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        imports.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure homepage.py cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports to show")
+    args = parser.parse_args()
+
+    timings = []
+    imports, modules = [], set()
+    for _ in range(args.runs):
+        first_frame_ms, imports, modules = run_once()
+        timings.append(first_frame_ms)
+
+    median = statistics.median(timings)
+    print(f"time to first frame: median {median:.0f} ms, min {min(timings):.0f} ms, max {max(timings):.0f} ms ({args.runs} runs)")
+
+    top_level = [entry for entry in imports if not entry[2].startswith(" ")]
+    print(f"total import time: {sum(entry[0] for entry in top_level) / 1000:.0f} ms")
+    print("slowest imports (cumulative):")
+    for cumulative_us, self_us, name in sorted(imports, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+
+    eager = [name for name in LAZY_MODULES if name in modules]
+    failed = False
+    if eager:
+        print(f"FAIL: imported before first frame: {', '.join(eager)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: median {median:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print(f"OK: within {args.budget_ms:.0f} ms budget")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import argparse
+import csv
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import data_access
+import document_store
+import migrations
+import notifications
+from db_worker import Connections
+
+# Bulk donation import from CSV or JSON.
+# The file is read as a stream and checked in chunks, without holding the
+# write lock: for each chunk the orphanage phones and existing document IDs are
+# resolved with one set-based query each, and the documents are copied into the
+# store. The valid rows are then inserted with executemany in transactions of
+# WRITE_BATCH rows; for large batches the full-text index and analytics rollups
+# are updated in one set-based pass instead of row by row by their triggers.
+# If an import stops halfway, running it again inserts the remaining rows (the
+# imported ones are reported as duplicate document IDs). Bad rows are reported
+# with their line number and skipped; they never abort the batch.
+#
+# CSV needs a header row with the form's field names; JSON may be an array of
+# objects or JSON Lines (one object per line, streamed). An optional
+# best_before field (YYYY-MM-DD HH:MM) overrides the default shelf life.
+# Usage: python bulk_import.py donations.csv [--hotel-phone 9000000000] [--dry-run]
+
+FIELDS = ["food_name", "quantity", "document_path", "document_id", "orphanage_phone", "hotel_address", "donation_date"]
+CHUNK_SIZE = 5000
+BULK_ROWS = 1000  # from this many rows on, derived tables are caught up in one pass
+WRITE_BATCH = 20000  # rows per write transaction
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.errors = []  # (line number, message)
+        self.write_seconds = 0.0  # longest time one write transaction held the lock
+
+    def error(self, line_no, message):
+        self.errors.append((line_no, message))
+
+    def summary(self, max_errors=10):
+        lines = [f"Imported {self.inserted} donation(s), {len(self.errors)} row(s) skipped."]
+        for line_no, message in self.errors[:max_errors]:
+            lines.append(f"  line {line_no}: {message}")
+        if len(self.errors) > max_errors:
+            lines.append(f"  ... and {len(self.errors) - max_errors} more")
+        return "\n".join(lines)
+
+
+def _object_or_error(row):
+    return row if isinstance(row, dict) else ValueError("not an object")
+
+
+# Yield (line number, row dict) from a CSV, JSON array or JSON Lines file. A
+# JSON row that is malformed or not an object comes as (line number, ValueError)
+# so the import reports it and carries on.
+def read_rows(path):
+    if os.path.splitext(path)[1].lower() == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        return
+
+    with open(path, encoding="utf-8") as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            # A JSON array has to be parsed whole; use JSON Lines for very large files
+            for index, row in enumerate(json.load(f), start=1):
+                yield index, _object_or_error(row)
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, _object_or_error(json.loads(line))
+                except json.JSONDecodeError as e:
+                    yield line_no, ValueError(f"invalid JSON: {e.msg} at column {e.colno}")
+
+
+def chunked(rows, size):
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Run a lookup that takes the candidate values as one JSON array parameter
+def existing_values(conn, sql, values):
+    return {row[0] for row in conn.execute(sql, (json.dumps(sorted(values)),))}
+
+
+# Lookup of document ids already used by live or archived donations
+TAKEN_DOCUMENT_IDS = """
+    SELECT document_id FROM food_donations
+    WHERE document_id IN (SELECT value FROM json_each(?))
+    UNION ALL
+    SELECT document_id FROM food_donations_archive
+    WHERE document_id IN (SELECT value FROM json_each(?1))
+"""
+
+
+# Drop the named triggers for the rest of the transaction; recreated on exit
+@contextmanager
+def suspended_triggers(conn, names):
+    saved = conn.execute(f"""
+        SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({", ".join("?" * len(names))})
+    """, names).fetchall()
+    for name, _ in saved:
+        conn.execute(f"DROP TRIGGER {name}")
+    try:
+        yield
+    finally:
+        for _, sql in saved:
+            conn.execute(sql)
+
+
+# Insert the rows; from BULK_ROWS rows on, the per-row insert triggers are
+# replaced by one set-based catch-up (see migrations.catch_up_inserts)
+def insert_rows(conn, rows):
+    if len(rows) < BULK_ROWS:
+        conn.executemany(data_access.DONATION_INSERT, rows)
+        return
+    after_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM food_donations").fetchone()[0]
+    with suspended_triggers(conn, migrations.INSERT_TRIGGERS):
+        conn.executemany(data_access.DONATION_INSERT, rows)
+        migrations.catch_up_inserts(conn, after_id)
+
+
+def import_file(db, path, hotel_phone=None, dry_run=False, chunk_size=CHUNK_SIZE):
+    report = ImportReport()
+    seen_document_ids = set()
+    known_orphanages = set()
+    digests = {}  # document path -> digest in document_store (None when the file is missing)
+    accepted = []  # (line number, values) of the rows to insert
+
+    # Pass 1, without the write lock: check the rows and copy their documents
+    for chunk in chunked(read_rows(path), chunk_size):
+        valid = []
+        for line_no, row in chunk:
+            if isinstance(row, ValueError):
+                report.error(line_no, str(row))
+                continue
+            values = [str(row.get(field) or "").strip() for field in FIELDS]
+            missing = [field for field, value in zip(FIELDS, values) if not value]
+            if missing:
+                report.error(line_no, f"missing {', '.join(missing)}")
+                continue
+            try:
+                best_before = str(row.get("best_before") or "").strip()
+                valid.append((line_no, data_access.donation_values(*values, hotel_phone, None, best_before)))
+            except ValueError as e:
+                report.error(line_no, str(e))
+
+        # Set-based lookups for the whole chunk
+        phones = {values[4] for _, values in valid} - known_orphanages
+        if phones:
+            known_orphanages |= existing_values(db.users, """
+                SELECT phone FROM users
+                WHERE role = 'Orphanage' AND phone IN (SELECT value FROM json_each(?))
+            """, phones)
+        taken = existing_values(db.donations, TAKEN_DOCUMENT_IDS, {values[3] for _, values in valid})
+
+        for line_no, values in valid:
+            document_id, orphanage_phone = values[3], values[4]
+            if orphanage_phone not in known_orphanages:
+                report.error(line_no, f"no orphanage with phone {orphanage_phone}")
+            elif document_id in taken or document_id in seen_document_ids:
+                report.error(line_no, f"duplicate document_id {document_id}")
+            else:
+                seen_document_ids.add(document_id)
+                # Copy documents that exist here into the store, once per file
+                document_path = values[2]
+                if document_path not in digests:
+                    digests[document_path] = (document_store.put(document_path)
+                                              if not dry_run and os.path.isfile(document_path) else None)
+                accepted.append((line_no, values[:11] + (digests[document_path],) + values[12:]))
+
+    # Pass 2: insert in transactions of WRITE_BATCH rows, so other writers
+    # wait about a second at most. Document ids taken since pass 1 are looked
+    # up again under the lock. The orphanages are texted with the last batch.
+    conn = db.donations
+    per_orphanage = {}  # orphanage phone -> donations imported
+    batches = list(chunked(accepted, WRITE_BATCH)) or [[]]
+    for number, batch in enumerate(batches, start=1):
+        conn.execute("BEGIN IMMEDIATE")
+        locked_at = time.perf_counter()
+        try:
+            taken = existing_values(conn, TAKEN_DOCUMENT_IDS, {values[3] for _, values in batch})
+            rows = []
+            for line_no, values in batch:
+                if values[3] in taken:
+                    report.error(line_no, f"duplicate document_id {values[3]}")
+                else:
+                    rows.append(values)
+                    per_orphanage[values[4]] = per_orphanage.get(values[4], 0) + 1
+            insert_rows(conn, rows)
+
+            if number == len(batches):
+                # One SMS per orphanage for the whole import
+                import_key = f"import:{os.path.basename(path)}:{time.time():.0f}"
+                for orphanage_phone, count in per_orphanage.items():
+                    notifications.enqueue_sms(conn, orphanage_phone,
+                                              f"{count} new food donation(s) have been listed for you.",
+                                              f"{import_key}:{orphanage_phone}")
+
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            report.write_seconds = max(report.write_seconds, time.perf_counter() - locked_at)
+        report.inserted += len(rows)
+    report.errors.sort()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import food donations from a CSV or JSON file")
+    parser.add_argument("path")
+    parser.add_argument("--hotel-phone", help="phone of the hotel the donations come from")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, insert nothing")
+    parser.add_argument("--max-errors", type=int, default=50)
+    args = parser.parse_args()
+
+    migrations.migrate()
+    db = Connections()
+    try:
+        start = time.perf_counter()
+        report = import_file(db, args.path, args.hotel_phone, args.dry_run)
+        print(report.summary(args.max_errors))
+        print(f"{'Validated' if args.dry_run else 'Done'} in {time.perf_counter() - start:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
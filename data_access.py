@@ -0,0 +1,455 @@
+import json
+import re
+
+import document_store
+import donation_fields
+import notifications
+import search
+
+# SQL used by the panels. Each function takes the worker's Connections object
+# (see db_worker.py) as its first argument and runs on the database thread.
+
+USER_SELECT = "SELECT id, name, email, phone, role, address, organization_name FROM users"
+# Donations are read joined to the orphanage (o) and hotel (h) users; users.db
+# is attached to the same connection (see db_worker.Connections)
+FOOD_SELECT = """
+    SELECT d.id, d.food_name, d.quantity, d.document_path, d.document_id, d.orphanage_phone,
+           COALESCE(o.organization_name, o.name), COALESCE(h.organization_name, h.name),
+           d.hotel_address, d.donation_date, d.status
+    FROM food_donations d
+    LEFT JOIN users o ON o.id = d.orphanage_id
+    LEFT JOIN users h ON h.id = d.hotel_id
+"""
+ORPHANAGE_DONATION_SELECT = """
+    SELECT d.id, d.food_name, d.quantity, d.document_id, d.document_path,
+           COALESCE(h.organization_name, h.name, d.hotel_address), d.status, d.donation_date,
+           COALESCE(d.document_digest, d.document_path),
+           strftime('%Y-%m-%d %H:%M', d.best_before_ts, 'unixepoch', 'localtime'), d.best_before_ts
+    FROM food_donations d
+    LEFT JOIN users h ON h.id = d.hotel_id
+"""
+# The same columns for donations moved to the archive (see archive.py)
+ARCHIVE_DONATION_SELECT = ORPHANAGE_DONATION_SELECT.replace("FROM food_donations d", "FROM food_donations_archive d")
+# Most urgent first; served by idx_donations_pending_orphanage
+PENDING_WHERE = "WHERE d.status='Pending' AND d.orphanage_phone=?"
+PENDING_ORDER = "ORDER BY d.best_before_ts, d.id"
+
+
+# Fetch one page of `select_sql` ordered by id, starting after/before `anchor_id`.
+# Rows always come back in ascending id order.
+def keyset_page(cursor, select_sql, anchor_id, limit, forward=True, key="id"):
+    if forward:
+        cursor.execute(f"{select_sql} WHERE {key} > ? ORDER BY {key} LIMIT ?", (anchor_id, limit))
+        return cursor.fetchall()
+    cursor.execute(f"{select_sql} WHERE {key} < ? ORDER BY {key} DESC LIMIT ?", (anchor_id, limit))
+    return cursor.fetchall()[::-1]
+
+
+# --- Users (homepage.py) ---
+
+def find_user(db, email, hashed_password):
+    cursor = db.users.cursor()
+    cursor.execute("SELECT id, name, role, phone FROM users WHERE email=? AND password=?", (email, hashed_password))
+    return cursor.fetchone()
+
+
+def register_user(db, name, email, phone, hashed_password, role, address, organization_name):
+    with db.users:
+        db.users.execute("INSERT INTO users (name, email, phone, password, role, address, organization_name) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (name, email, phone, hashed_password, role, address, organization_name))
+
+
+# --- Donations (hotel.py / ht1.py) ---
+
+def find_orphanage(db, phone):
+    cursor = db.users.cursor()
+    cursor.execute("""
+        SELECT name, address, organization_name FROM users
+        WHERE phone = ? AND role = 'Orphanage'
+    """, (phone,))
+    return cursor.fetchone()
+
+
+# SMS to the orphanage for a new donation; runs inside the insert's transaction
+def enqueue_donation_sms(conn, food_name, quantity, document_id, orphanage_phone, hotel_address, donation_date):
+    notifications.enqueue_sms(
+        conn, orphanage_phone,
+        f"New food donation: {food_name} ({quantity}) from {hotel_address} on {donation_date}. Document ID {document_id}.",
+        f"donation:{document_id}:submitted")
+
+
+# orphanage_id / hotel_id are resolved from the phones (parameters 5 and 8)
+DONATION_INSERT = '''
+    INSERT INTO food_donations (
+        food_name, quantity, document_path, document_id, orphanage_phone, hotel_address,
+        donation_date, hotel_phone, quantity_value, quantity_unit, donation_ts, document_digest,
+        best_before_ts, orphanage_id, hotel_id
+    ) VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, ?12, ?13,
+              (SELECT MIN(id) FROM users WHERE phone = ?5 AND role = 'Orphanage'),
+              (SELECT MIN(id) FROM users WHERE phone = ?8 AND role = 'Hotel'))
+'''
+
+
+# Row for DONATION_INSERT; the date is stored normalized (YYYY-MM-DD).
+# Raises ValueError when quantity, date or best-before cannot be parsed.
+def donation_values(food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date,
+                    hotel_phone=None, document_digest=None, best_before=None):
+    value, unit, iso_date, timestamp = donation_fields.parse_donation(quantity, donation_date)
+    best_before_ts = donation_fields.parse_best_before(best_before, iso_date)
+    return (food_name, quantity, document_path, document_id, orphanage_phone, hotel_address,
+            iso_date, hotel_phone, value, unit, timestamp, document_digest, best_before_ts)
+
+
+# hotel.submit_donation: validate the orphanage, copy the document into the
+# store, then insert, on the one connection. Returns the orphanage row, or
+# None when no orphanage has that phone number.
+def submit_donation(db, food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date,
+                    hotel_phone=None, best_before=None):
+    # fail before copying the document
+    donation_fields.parse_best_before(best_before, donation_fields.parse_donation(quantity, donation_date)[2])
+    with db.donations:
+        orphanage = find_orphanage(db, orphanage_phone)
+        if orphanage is None:
+            return None
+        digest = document_store.put(document_path)
+        values = donation_values(food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date,
+                                 hotel_phone, digest, best_before)
+        db.donations.execute(DONATION_INSERT, values)
+        enqueue_donation_sms(db.donations, food_name, quantity, document_id, orphanage_phone, hotel_address, values[6])
+    return orphanage
+
+
+# ht1.submit_data: donation plus its food_requests entry in one transaction
+def submit_food_request(db, food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date,
+                        best_before=None):
+    # fail before copying the document
+    donation_fields.parse_best_before(best_before, donation_fields.parse_donation(quantity, donation_date)[2])
+    digest = document_store.put(document_path)
+    values = donation_values(food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date,
+                             None, digest, best_before)
+    donation_date = values[6]  # normalized
+    with db.donations:
+        db.donations.execute(DONATION_INSERT, values)
+        db.donations.execute('''
+            INSERT INTO food_requests (hotel_name, hotel_address, food_name, document, reference_id, donation_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', ("Hotel", hotel_address, food_name, document_path, document_id, donation_date))
+        enqueue_donation_sms(db.donations, food_name, quantity, document_id, orphanage_phone, hotel_address, donation_date)
+
+
+def donation_status(db, document_id):
+    cursor = db.donations.cursor()
+    cursor.execute("SELECT status FROM food_donations WHERE document_id=?", (document_id,))
+    result = cursor.fetchone()
+    if result is None:
+        # Only old, completed donations are archived; look there last
+        cursor.execute("SELECT status FROM food_donations_archive WHERE document_id=? ORDER BY id DESC", (document_id,))
+        result = cursor.fetchone()
+    return result[0] if result else None
+
+
+def queue_sms(db, to_phone, body):
+    with db.donations:
+        notifications.enqueue_sms(db.donations, to_phone, body)
+
+
+# --- Orphanage panel (orphanage.py) ---
+
+# --- Live refresh of the pending view ---
+# The panel keeps a watermark (version, last donation id, last change id).
+# `version` is PRAGMA data_version (bumped by commits from other connections)
+# plus this connection's total_changes; while it is unchanged nothing is read.
+# Otherwise only donations newer than the id watermark and donations named in
+# donation_changes since the change watermark are fetched.
+
+def data_version(conn):
+    return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+
+def _watermark(conn):
+    last_id = conn.execute("SELECT MAX(id) FROM food_donations").fetchone()[0] or 0
+    last_change = conn.execute("SELECT MAX(id) FROM donation_changes").fetchone()[0] or 0
+    return data_version(conn), last_id, last_change
+
+
+# Full pending list plus the watermark it is current to
+def pending_snapshot(db, orphanage_phone):
+    conn = db.donations
+    conn.execute("BEGIN")
+    try:
+        rows = conn.execute(f"{ORPHANAGE_DONATION_SELECT} {PENDING_WHERE} {PENDING_ORDER}", (orphanage_phone,)).fetchall()
+        return rows, _watermark(conn)
+    finally:
+        conn.commit()
+
+
+# Changes since `watermark`: None when nothing changed, otherwise
+# (watermark, rows to add or update, ids to remove, reset). With reset=True
+# the change log no longer covers the watermark and `rows` is the full list.
+def pending_changes(db, orphanage_phone, watermark):
+    conn = db.donations
+    version, last_id, last_change = watermark
+    if data_version(conn) == version:
+        return None
+    conn.execute("BEGIN")
+    try:
+        oldest_change = conn.execute("SELECT MIN(id) FROM donation_changes").fetchone()[0]
+        if oldest_change is not None and oldest_change > last_change + 1:
+            rows = conn.execute(f"{ORPHANAGE_DONATION_SELECT} {PENDING_WHERE} {PENDING_ORDER}", (orphanage_phone,)).fetchall()
+            return _watermark(conn), rows, [], True
+
+        rows = conn.execute(f"{ORPHANAGE_DONATION_SELECT} {PENDING_WHERE} AND d.id > ? {PENDING_ORDER}",
+                            (orphanage_phone, last_id)).fetchall()
+        changed = [row[0] for row in conn.execute(
+            "SELECT DISTINCT donation_id FROM donation_changes WHERE orphanage_phone=? AND id > ?",
+            (orphanage_phone, last_change))]
+        removed = []
+        if changed:
+            still_pending = conn.execute(f"""
+                {ORPHANAGE_DONATION_SELECT}
+                WHERE d.id IN (SELECT value FROM json_each(?)) AND d.status='Pending' AND d.orphanage_phone=?
+            """, (json.dumps(changed), orphanage_phone)).fetchall()
+            pending_ids = {row[0] for row in still_pending}
+            rows += [row for row in still_pending if row[0] <= last_id]
+            removed = [donation_id for donation_id in changed if donation_id not in pending_ids]
+        return _watermark(conn), rows, removed, False
+    finally:
+        conn.commit()
+
+
+def past_donations(db, orphanage_phone):
+    cursor = db.donations.cursor()
+    cursor.execute(f"{ORPHANAGE_DONATION_SELECT} WHERE d.status IN ('Accepted', 'Rejected', 'Expired') AND d.orphanage_phone=?",
+                   (orphanage_phone,))
+    return cursor.fetchall()
+
+
+# Older history, read only when the past requests window asks for it
+def archived_donations(db, orphanage_phone):
+    cursor = db.donations.cursor()
+    cursor.execute(f"{ARCHIVE_DONATION_SELECT} WHERE d.orphanage_phone=? ORDER BY d.id", (orphanage_phone,))
+    return cursor.fetchall()
+
+
+# Returns False when the donation is no longer pending (e.g. it expired)
+def set_donation_status(db, donation_id, status):
+    with db.donations:
+        if db.donations.execute("UPDATE food_donations SET status=? WHERE id=? AND status='Pending'", (status, donation_id)).rowcount == 0:
+            return False
+        # Let the hotel know, when it submitted from a logged-in session
+        row = db.donations.execute("SELECT hotel_phone, food_name, document_id FROM food_donations WHERE id=?", (donation_id,)).fetchone()
+        if row and row[0]:
+            hotel_phone, food_name, document_id = row
+            notifications.enqueue_sms(
+                db.donations, hotel_phone,
+                f"Your donation of {food_name} (Document ID {document_id}) was {status.lower()}.",
+                f"donation:{document_id}:{status}")
+    return True
+
+
+# --- Reporting ---
+# Both use idx_donations_ts_unit; dates are inclusive YYYY-MM-DD bounds.
+
+def donations_between(db, date_from, date_to, limit=500):
+    cursor = db.donations.cursor()
+    cursor.execute(f"{FOOD_SELECT} WHERE d.donation_ts BETWEEN ? AND ? ORDER BY d.donation_ts LIMIT ?",
+                   (donation_fields.date_to_ts(date_from), donation_fields.date_to_ts(date_to), limit))
+    return cursor.fetchall()
+
+
+# [(unit, donations, total quantity)] for the date range
+def quantity_totals(db, date_from, date_to):
+    cursor = db.donations.cursor()
+    cursor.execute("""
+        SELECT quantity_unit, COUNT(*), SUM(quantity_value) FROM food_donations
+        WHERE donation_ts BETWEEN ? AND ?
+        GROUP BY quantity_unit ORDER BY quantity_unit
+    """, (donation_fields.date_to_ts(date_from), donation_fields.date_to_ts(date_to)))
+    return cursor.fetchall()
+
+
+# --- Analytics (admin.py) ---
+# Read only the trigger-maintained rollups (migrations.rollups), never
+# food_donations. `since` is an ISO date, or None for all history; the weekly
+# charts start with the week containing it.
+
+def analytics(db, since=None):
+    cursor = db.donations.cursor()
+    since = since or ""
+    week_since = "date(?, '-6 days', 'weekday 1')" if since else "?"
+    cursor.execute("""
+        SELECT status, SUM(donations) FROM donation_status_daily
+        WHERE day >= ? GROUP BY status ORDER BY status
+    """, (since,))
+    status_totals = cursor.fetchall()
+    cursor.execute(f"""
+        SELECT strftime('%Y-W%W', week), hotel, donations, accepted
+        FROM donation_hotel_weekly WHERE week >= {week_since}
+        ORDER BY week DESC, donations DESC LIMIT 500
+    """, (since,))
+    by_hotel_week = cursor.fetchall()
+    if since:
+        cursor.execute(f"""
+            SELECT orphanage_phone, SUM(donations), SUM(pending), SUM(accepted), SUM(rejected), SUM(expired)
+            FROM donation_orphanage_weekly WHERE week >= {week_since}
+            GROUP BY orphanage_phone ORDER BY 2 DESC LIMIT 500
+        """, (since,))
+    else:
+        cursor.execute("""
+            SELECT orphanage_phone, donations, pending, accepted, rejected, expired
+            FROM donation_orphanage_totals ORDER BY donations DESC LIMIT 500
+        """)
+    by_orphanage = cursor.fetchall()
+    return status_totals, by_hotel_week, by_orphanage
+
+
+# --- Admin panel (admin.py) ---
+
+UPDATE_USER = "UPDATE users SET name=?, email=?, phone=?, role=?, address=?, organization_name=? WHERE id=?"
+DONATION_STATUSES = ["Pending", "Accepted", "Rejected", "Expired"]
+
+
+# WHERE clause and parameters for the admin and export filters. Dates are
+# inclusive YYYY-MM-DD bounds; `keyword` is a full-text search as in search.py.
+def donation_filter(status=None, date_from=None, date_to=None, orphanage_phone=None, keyword=None):
+    where, params = [], []
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    if date_from:
+        where.append("donation_ts >= ?")
+        params.append(donation_fields.date_to_ts(date_from))
+    if date_to:
+        where.append("donation_ts <= ?")
+        params.append(donation_fields.date_to_ts(date_to))
+    if orphanage_phone:
+        where.append("orphanage_phone = ?")
+        params.append(orphanage_phone)
+    if keyword:
+        where.append("id IN (SELECT rowid FROM food_donations_fts WHERE food_donations_fts MATCH ?)")
+        params.append(search.match_expression(keyword) or '""')
+    return " AND ".join(where) or "1", params
+
+
+def user_filter(role=None, keyword=None):
+    where, params = [], []
+    if role:
+        where.append("role = ?")
+        params.append(role)
+    if keyword:
+        where.append("id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?)")
+        params.append(search.match_expression(keyword) or '""')
+    return " AND ".join(where) or "1", params
+
+
+# --- Bulk actions ---
+# Each runs as one set-based statement in one transaction, on the rows with
+# the given ids or on every row matching `filters` (keyword arguments of
+# user_filter / donation_filter). They return the affected ids, so the grid
+# removes or re-reads only those rows. Status changes made here do not text
+# the hotels; they are corrections, not orphanage decisions. They apply to
+# live donations only: archived rows are never changed.
+
+def _target(ids, filters, filter_fn):
+    if ids is not None:
+        return "id IN (SELECT value FROM json_each(?))", [json.dumps([int(i) for i in ids])]
+    return filter_fn(**filters)
+
+
+def count_users(db, filters):
+    where, params = user_filter(**filters)
+    return db.users.execute(f"SELECT COUNT(*) FROM users WHERE {where}", params).fetchone()[0]
+
+
+def count_donations(db, filters):
+    where, params = donation_filter(**filters)
+    return db.donations.execute(f"SELECT COUNT(*) FROM food_donations WHERE {where}", params).fetchone()[0]
+
+
+def delete_users(db, ids=None, filters=None):
+    where, params = _target(ids, filters, user_filter)
+    with db.users:
+        return [row[0] for row in db.users.execute(f"DELETE FROM users WHERE {where} RETURNING id", params).fetchall()]
+
+
+def delete_donations(db, ids=None, filters=None):
+    where, params = _target(ids, filters, donation_filter)
+    with db.donations:
+        return [row[0] for row in db.donations.execute(f"DELETE FROM food_donations WHERE {where} RETURNING id", params).fetchall()]
+
+
+def set_donations_status(db, status, ids=None, filters=None):
+    if status not in DONATION_STATUSES:
+        raise ValueError(f"Unknown status: {status}")
+    where, params = _target(ids, filters, donation_filter)
+    with db.donations:
+        return [row[0] for row in db.donations.execute(
+            f"UPDATE food_donations SET status=? WHERE {where} AND status != ? RETURNING id",
+            [status, *params, status]).fetchall()]
+
+
+def execute_users(db, query, params=()):
+    with db.users:
+        db.users.execute(query, params)
+
+
+def execute_food(db, query, params=()):
+    with db.donations:
+        db.donations.execute(query, params)
+
+
+def users_page(db, anchor_id, limit, forward=True):
+    return keyset_page(db.users.cursor(), USER_SELECT, anchor_id, limit, forward)
+
+
+def user_row(db, user_id):
+    cursor = db.users.cursor()
+    cursor.execute(f"{USER_SELECT} WHERE id=?", (user_id,))
+    return cursor.fetchone()
+
+
+def food_page(db, anchor_id, limit, forward=True):
+    return keyset_page(db.donations.cursor(), FOOD_SELECT, anchor_id, limit, forward, key="d.id")
+
+
+def food_row(db, food_id):
+    cursor = db.donations.cursor()
+    cursor.execute(f"{FOOD_SELECT} WHERE d.id=?", (food_id,))
+    return cursor.fetchone()
+
+
+def food_rows(db, food_ids):
+    cursor = db.donations.cursor()
+    cursor.execute(f"{FOOD_SELECT} WHERE d.id IN (SELECT value FROM json_each(?))", (json.dumps([int(i) for i in food_ids]),))
+    return cursor.fetchall()
+
+
+def search_users(db, keyword):
+    return search.search_users(db.users.cursor(), keyword)
+
+
+# With include_archive, archived matches follow the live ones (status marked "(archived)")
+def search_donations(db, keyword, include_archive=False):
+    rows = search.search_donations(db.donations.cursor(), keyword)
+    if include_archive and len(rows) < search.SEARCH_LIMIT:
+        rows += search.search_donations(db.donations.cursor(), keyword, search.SEARCH_LIMIT - len(rows), archive=True)
+    return rows
+
+
+# Query plan of one traced statement for the Diagnostics tab: [(id, parent, detail)].
+# EXPLAIN QUERY PLAN only prepares the statement, so writes are not run.
+# Statements traced without a sample (executemany) still have their "?"
+# placeholders; NULL is bound to each.
+def explain_query_plan(db, sql):
+    if sql.split(None, 1)[0].upper() not in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE"):
+        raise ValueError(f"No query plan for: {sql[:60]}")
+    params = (None,) * parameter_count(sql)
+    return [(row[0], row[1], row[3]) for row in db.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+# Number of parameters of `sql`: "?" takes the number after the highest so far, "?N" number N
+def parameter_count(sql):
+    count = 0
+    for number in re.findall(r"\?(\d*)", sql):
+        count = max(count, int(number)) if number else count + 1
+    return count
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import threading
+
+import diagnostics
+
+# Shared SQLite connection setup.
+# Every connection is opened through connect(), which switches the database to
+# WAL (readers no longer block the writer and the writer no longer blocks
+# readers), uses synchronous=NORMAL (safe with WAL, one fsync per checkpoint
+# instead of per commit), waits up to BUSY_TIMEOUT_MS for a lock instead of
+# failing with "database is locked", and sizes the page cache and mmap window.
+# thread_connection() hands out one long-lived connection per thread and
+# database, so repeated work reuses the connection and its prepared-statement
+# cache instead of reconnecting.
+# While tracing is on (see diagnostics.py) new connections time their statements.
+#
+# In WAL mode a transaction that writes to several ATTACHed files is atomic per
+# file, not across files. No code path writes to both databases in one
+# transaction.
+
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 16 * 1024  # page cache per database file
+MMAP_SIZE = 64 * 1024 * 1024
+STATEMENT_CACHE = 256  # prepared statements kept per connection
+
+_local = threading.local()
+
+
+# Per-file settings; `schema` is "main" or the name of an attached database
+def configure(conn, schema="main"):
+    conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+    conn.execute(f"PRAGMA {schema}.synchronous=NORMAL")
+    conn.execute(f"PRAGMA {schema}.cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA {schema}.mmap_size={MMAP_SIZE}")
+    return conn
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE,
+                           factory=diagnostics.connection_factory())
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return configure(conn)
+
+
+def is_attached(conn, schema):
+    return any(row[1] == schema for row in conn.execute("PRAGMA database_list"))
+
+
+def attach(conn, schema, path):
+    if not is_attached(conn, schema):
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        configure(conn, schema)
+    return conn
+
+
+# The calling thread's connection to `path` with `attached` ({schema: path})
+# attached, opened on first use
+def thread_connection(path, attached=None):
+    attached = attached or {}
+    key = (os.path.abspath(path), tuple(sorted((schema, os.path.abspath(other)) for schema, other in attached.items())))
+    connections = _local.__dict__.setdefault("connections", {})
+    conn = connections.get(key)
+    if conn is None:
+        conn = connect(path)
+        for schema, other in attached.items():
+            attach(conn, schema, other)
+        connections[key] = conn
+    return conn
+
+
+# Close every connection opened by the calling thread
+def close_thread_connections():
+    for conn in _local.__dict__.pop("connections", {}).values():
+        conn.close()
@@ -0,0 +1,174 @@
+import queue
+import threading
+import time
+from tkinter import messagebox
+
+import database
+import diagnostics
+import migrations
+import service_client
+
+# Background database worker.
+# All SQLite work runs on one dedicated thread that owns its connections, so a
+# lock wait on the shared database files never freezes the Tk event loop.
+# Results are handed back to the Tk thread through a queue polled with
+# root.after; while work is pending the window shows a busy cursor.
+# With HFD_SERVICE_URL set, the data_access operations that service.py
+# provides are sent to the service instead (see service_client.py).
+# While tracing is on (see diagnostics.py) each job is timed, and a job counts
+# toward the @timed UI handler that submitted it.
+
+POLL_MS = 20
+
+
+# Connection for the calling thread (see database.thread_connection): the
+# donations database with users.db attached, so users and donations can be
+# joined on one connection; `users` and `donations` are the same connection.
+class Connections:
+    def __init__(self, users_db=migrations.USERS_DB, donations_db=migrations.DONATIONS_DB):
+        self.users_db = users_db
+        self.donations_db = donations_db
+
+    @property
+    def conn(self):
+        return database.thread_connection(self.donations_db, {migrations.USERS_SCHEMA: self.users_db})
+
+    @property
+    def users(self):
+        return self.conn
+
+    @property
+    def donations(self):
+        return self.conn
+
+    # Closes every connection of the calling thread
+    def close(self):
+        database.close_thread_connections()
+
+
+def show_db_error(error):
+    messagebox.showerror("Database Error", str(error))
+
+
+class DBWorker:
+    def __init__(self, root, connections=None, client=None):
+        self.root = root
+        self.connections = connections or Connections()
+        self.client = client or service_client.from_environment()
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = 0
+        self.busy = 0  # pending jobs that show the busy cursor
+        self.polling = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self.thread.start()
+
+    # Run fn(connections, *args) on the worker thread. on_done(result) or
+    # on_error(exception) is then called on the Tk thread. quiet=True is for
+    # background polling: no busy cursor while it runs.
+    def submit(self, fn, *args, on_done=None, on_error=show_db_error, quiet=False):
+        if self.stopped:
+            return
+        self.pending += 1
+        if not quiet:
+            self.busy += 1
+            self._set_busy(True)
+        span = diagnostics.current_span()
+        if span is not None:
+            span.pending += 1
+        self.requests.put((fn, args, on_done, on_error, quiet, span))
+        if not self.polling:
+            self.polling = True
+            self.root.after(POLL_MS, self._poll)
+
+    # Submit proxy for one view: its callbacks are skipped once `widget` is destroyed
+    def scoped(self, widget):
+        return ScopedWorker(self, widget)
+
+    # Finish queued work and close the worker's connections
+    def stop(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        self.requests.put(None)
+        self.thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            fn, args, on_done, on_error, quiet, span = request
+            start = time.perf_counter()
+            try:
+                if self.client is not None and self.client.handles(fn):
+                    result = self.client.call(fn.__name__, *args)
+                else:
+                    result = fn(self.connections, *args)
+            except Exception as e:
+                self.results.put((on_error, e, quiet, span))
+            else:
+                self.results.put((on_done, result, quiet, span))
+            if diagnostics.enabled:
+                diagnostics.record_job(f"{getattr(fn, '__module__', '')}.{getattr(fn, '__qualname__', 'job')}",
+                                       time.perf_counter() - start)
+        self.connections.close()
+        if self.client is not None:
+            self.client.close()
+
+    def _poll(self):
+        try:
+            while not self.stopped:
+                try:
+                    callback, value, quiet, span = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                self.pending -= 1
+                if not quiet:
+                    self.busy -= 1
+                    if self.busy == 0:
+                        self._set_busy(False)
+                if span is not None:
+                    span.delivered()
+                    try:
+                        diagnostics.run_in_span(span, callback, value)
+                    finally:
+                        span.job_done()
+                elif callback is not None:
+                    callback(value)
+        finally:
+            # Keep polling even if a callback raised
+            if self.stopped:
+                self.polling = False
+            elif self.pending > 0:
+                self.root.after(POLL_MS, self._poll)
+            else:
+                self.polling = False
+
+    def _set_busy(self, busy):
+        try:
+            self.root.configure(cursor="watch" if busy else "")
+        except Exception:
+            pass  # window already destroyed
+
+
+class ScopedWorker:
+    def __init__(self, worker, widget):
+        self.worker = worker
+        self.widget = widget
+
+    def submit(self, fn, *args, on_done=None, on_error=show_db_error, quiet=False):
+        self.worker.submit(fn, *args, on_done=self._guard(on_done), on_error=self._guard(on_error), quiet=quiet)
+
+    def scoped(self, widget):
+        return ScopedWorker(self.worker, widget)
+
+    def _guard(self, callback):
+        if callback is None:
+            return None
+
+        def guarded(value):
+            if self.widget.winfo_exists():
+                callback(value)
+        return guarded
@@ -0,0 +1,332 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+import sqlite3
+
+# Optional latency instrumentation.
+# With tracing on (HFD_TRACE=1, or enable() from the admin Diagnostics tab):
+#   - connections opened by database.connect() time every statement from
+#     execute() until its cursor is exhausted or dropped; the trace callback
+#     (set_trace_callback) captures the statement with its bound values, which
+#     the Diagnostics tab uses for EXPLAIN QUERY PLAN
+#   - UI handlers wrapped with @timed(name) are timed from the click until the
+#     last database job they started has handed its result to the Tk thread
+#     (the callback's own time is left out: it may sit in a message box)
+#   - every database worker job is timed
+# Latencies go into log2 histograms. HFD_TRACE_FILE=path also appends every
+# measurement to a JSON-lines file for offline analysis.
+# With tracing off, connections are plain sqlite3 connections and @timed
+# costs one flag check.
+
+TRACE_ENV = "HFD_TRACE"
+TRACE_FILE_ENV = "HFD_TRACE_FILE"
+BUCKETS = 32  # bucket i counts latencies below 2**i microseconds
+MAX_STATEMENTS = 1000  # distinct statements kept
+UNTRACKED_STATEMENTS = ("PRAGMA", "ATTACH", "DETACH")  # connection setup, not queries
+
+enabled = os.environ.get(TRACE_ENV) == "1"
+
+_lock = threading.Lock()
+_local = threading.local()
+_statements = {}  # SQL text -> [Histogram, slowest seconds, slowest SQL with values]
+_handlers = {}  # handler name -> Histogram
+_jobs = {}  # database job name -> Histogram
+_events = None  # JSON-lines file
+_finalized = deque()  # (sql, seconds, sample) of cursors dropped unfinished, recorded under the lock later
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        micros = int(seconds * 1e6)
+        self.buckets[min(BUCKETS - 1, micros.bit_length())] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    # Upper bound of the bucket holding the given fraction of samples, in seconds
+    def percentile(self, fraction):
+        target = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(2 ** i / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {"calls": self.count, "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+                "p50_ms": self.percentile(0.5) * 1000, "p95_ms": self.percentile(0.95) * 1000,
+                "p99_ms": self.percentile(0.99) * 1000, "max_ms": self.max * 1000, "total_ms": self.total * 1000}
+
+
+def enable(trace_file=None):
+    global enabled, _events
+    trace_file = trace_file or os.environ.get(TRACE_FILE_ENV)
+    with _lock:
+        if trace_file and _events is None:
+            _events = open(trace_file, "a", encoding="utf-8")
+        enabled = True
+
+
+def disable():
+    global enabled, _events
+    with _lock:
+        enabled = False
+        if _events is not None:
+            _events.close()
+            _events = None
+
+
+def reset():
+    with _lock:
+        _finalized.clear()
+        _statements.clear()
+        _handlers.clear()
+        _jobs.clear()
+
+
+def _event(kind, name, seconds):
+    if _events is not None:
+        _events.write(json.dumps({"ts": time.time(), "kind": kind, "name": name, "ms": seconds * 1000}) + "\n")
+
+
+def _add_statement(sql, seconds, sample):
+    key = " ".join(sql.split())
+    if not key or key.split(None, 1)[0].upper() in UNTRACKED_STATEMENTS:
+        return
+    entry = _statements.get(key)
+    if entry is None:
+        if len(_statements) >= MAX_STATEMENTS:
+            return
+        entry = _statements[key] = [Histogram(), 0.0, None]
+    entry[0].add(seconds)
+    if seconds >= entry[1]:
+        entry[1], entry[2] = seconds, sample or sql
+    _event("statement", key, seconds)
+
+
+# Record statements of cursors finalized since the last call; needs _lock
+def _drain_finalized():
+    while _finalized:
+        _add_statement(*_finalized.popleft())
+
+
+def record_statement(sql, seconds, sample=None):
+    with _lock:
+        _drain_finalized()
+        _add_statement(sql, seconds, sample)
+
+
+def _record(table, kind, name, seconds):
+    with _lock:
+        table.setdefault(name, Histogram()).add(seconds)
+        _event(kind, name, seconds)
+
+
+def record_job(name, seconds):
+    _record(_jobs, "job", name, seconds)
+
+
+# --- Statement timing ---
+
+def _on_trace(sql):
+    # Keep the traced text of the statement being executed; triggers and
+    # virtual tables (full-text search) trace statements of their own
+    expected = getattr(_local, "expected", None)
+    if expected is not None and sql.lstrip().startswith(expected):
+        _local.sample = sql
+        _local.expected = None
+
+
+class TracedCursor(sqlite3.Cursor):
+    _sql = None
+    _elapsed = 0.0
+    _sample = None
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._elapsed += time.perf_counter() - start
+
+    def _finish(self):
+        if self._sql is not None:
+            record_statement(self._sql, self._elapsed, self._sample)
+            self._sql = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._sql, self._elapsed = sql, 0.0
+        _local.expected, _local.sample = sql.lstrip()[:20].split("?")[0], None
+        try:
+            return self._timed(super().execute, sql, parameters)
+        finally:
+            _local.expected = None
+            self._sample = _local.sample
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self._sql, self._elapsed, self._sample = sql, 0.0, None
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    # Garbage collection may run this while the thread holds _lock (the lock
+    # is not reentrant), so only queue the statement here
+    def __del__(self):
+        if self._sql is not None:
+            _finalized.append((self._sql, self._elapsed, self._sample))
+            self._sql = None
+
+
+# Connection class used by database.connect() while tracing is on
+class TracedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_on_trace)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute() would bypass cursor(); route it through a traced cursor
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connection_factory():
+    return TracedConnection if enabled else sqlite3.Connection
+
+
+# --- UI handler timing ---
+# A span starts when a @timed handler runs. It is recorded once the handler
+# has returned and every database job started from it (or from the callbacks
+# of those jobs) has finished, and lasts until the latest of those results
+# reached the Tk thread.
+
+class Span:
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = self.start
+        self.pending = 0
+        self.running = True
+
+    # A job's result reached the Tk thread; its callback runs next
+    def delivered(self):
+        self.end = time.perf_counter()
+
+    def job_done(self):
+        self.pending -= 1
+        self._maybe_finish()
+
+    def _maybe_finish(self):
+        if not self.running and self.pending == 0:
+            _record(_handlers, "handler", self.name, self.end - self.start)
+
+
+# Span of the handler (or callback) running on this thread, or None
+def current_span():
+    return getattr(_local, "span", None) if enabled else None
+
+
+# Run `fn` with `span` current, so database jobs it starts count toward the span
+def run_in_span(span, fn, *args, **kwargs):
+    previous = getattr(_local, "span", None)
+    _local.span = span
+    try:
+        if fn is not None:
+            return fn(*args, **kwargs)
+    finally:
+        _local.span = previous
+
+
+def timed(name):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            span = Span(name)
+            try:
+                return run_in_span(span, fn, *args, **kwargs)
+            finally:
+                span.running = False
+                if span.pending == 0:
+                    span.delivered()
+                span._maybe_finish()
+        return wrapper
+    return decorate
+
+
+# --- Reports ---
+
+# Slowest statements first (by p95): [(sql, summary, slowest sample with values)]
+def slowest_statements(limit=50):
+    with _lock:
+        _drain_finalized()
+        rows = [(sql, entry[0].summary(), entry[2]) for sql, entry in _statements.items()]
+    rows.sort(key=lambda row: (row[1]["p95_ms"], row[1]["max_ms"]), reverse=True)
+    return rows[:limit]
+
+
+# [(kind, name, summary)] for handlers and database jobs, slowest first
+def handler_summaries():
+    with _lock:
+        rows = [("handler", name, h.summary()) for name, h in _handlers.items()]
+        rows += [("job", name, h.summary()) for name, h in _jobs.items()]
+    rows.sort(key=lambda row: row[2]["p95_ms"], reverse=True)
+    return rows
+
+
+# Write every histogram summary as one JSON line; returns the number of lines
+def dump(path):
+    lines = [{"kind": "statement", "name": sql, "sample": sample, **summary}
+             for sql, summary, sample in slowest_statements(MAX_STATEMENTS)]
+    lines += [{"kind": kind, "name": name, **summary} for kind, name, summary in handler_summaries()]
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+    return len(lines)
+
+
+if enabled:
+    enable()
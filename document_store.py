@@ -0,0 +1,193 @@
+import argparse
+import glob
+import hashlib
+import mmap
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+import migrations
+from db_worker import Connections
+
+# Content-addressed store for food testing documents.
+# A document is copied into STORE_DIR under its SHA-256 digest:
+#   documents/ab/ab12...ef.pdf
+# The digest is computed while copying, in CHUNK_SIZE pieces, into a
+# temporary file that is moved into place atomically. The same file uploaded
+# for many donations is stored once. Donations reference the digest
+# (food_donations.document_digest), so any machine that shares the store can
+# open them. Thumbnails / first-page previews are rendered on first request
+# and cached under STORE_DIR/thumbs.
+# Usage: python document_store.py import-existing   (store files of old donations)
+#        python document_store.py verify
+
+STORE_DIR = "documents"
+CHUNK_SIZE = 1024 * 1024
+THUMB_SIZE = (240, 320)
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+
+
+def _shard(digest, store_dir):
+    return os.path.join(store_dir, digest[:2])
+
+
+def is_digest(reference):
+    return isinstance(reference, str) and len(reference) == 64 and all(c in "0123456789abcdef" for c in reference)
+
+
+# Copy `source` into the store; returns its hex digest
+def put(source, store_dir=STORE_DIR):
+    extension = os.path.splitext(source)[1].lower()
+    os.makedirs(store_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=store_dir, suffix=".tmp")
+    try:
+        with open(source, "rb") as src, os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                tmp.write(chunk)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        hex_digest = digest.hexdigest()
+        if path_for(hex_digest, store_dir) is not None:
+            os.unlink(tmp_path)  # already stored
+        else:
+            os.makedirs(_shard(hex_digest, store_dir), exist_ok=True)
+            os.replace(tmp_path, os.path.join(_shard(hex_digest, store_dir), hex_digest + extension))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return hex_digest
+
+
+# Stored file for `digest`, or None
+def path_for(digest, store_dir=STORE_DIR):
+    matches = glob.glob(os.path.join(_shard(digest, store_dir), digest + "*"))
+    return matches[0] if matches else None
+
+
+# File to open for a donation's document reference: a digest, or a plain path
+# for donations from before the store existed
+def resolve(reference, store_dir=STORE_DIR):
+    if is_digest(reference):
+        return path_for(reference, store_dir)
+    return reference if reference and os.path.exists(reference) else None
+
+
+# Read-only memory map of a stored document
+@contextmanager
+def open_mapped(digest, store_dir=STORE_DIR):
+    path = path_for(digest, store_dir)
+    if path is None:
+        raise FileNotFoundError(f"document {digest} is not in the store")
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def verify(digest, store_dir=STORE_DIR):
+    with open_mapped(digest, store_dir) as mapped:
+        return hashlib.sha256(mapped).hexdigest() == digest
+
+
+# PNG preview of a stored document, rendered on first use; None when the
+# type cannot be previewed (PIL for images, pdftoppm for PDFs)
+def thumbnail(digest, size=THUMB_SIZE, store_dir=STORE_DIR):
+    thumb_dir = os.path.join(store_dir, "thumbs")
+    thumb_path = os.path.join(thumb_dir, f"{digest}-{size[0]}x{size[1]}.png")
+    if os.path.exists(thumb_path):
+        return thumb_path
+    path = path_for(digest, store_dir)
+    if path is None:
+        return None
+    os.makedirs(thumb_dir, exist_ok=True)
+    with open_mapped(digest, store_dir) as mapped:
+        is_pdf = mapped[:5] == b"%PDF-"
+    fd, tmp_path = tempfile.mkstemp(dir=thumb_dir, suffix=".png.tmp")
+    os.close(fd)
+    try:
+        if is_pdf:
+            if not _render_pdf_page(path, tmp_path, size):
+                os.unlink(tmp_path)
+                return None
+        elif os.path.splitext(path)[1] in IMAGE_EXTENSIONS:
+            from PIL import Image  # only needed when a preview is rendered
+            with Image.open(path) as image:
+                image.thumbnail(size)
+                image.save(tmp_path, format="PNG")
+        else:
+            os.unlink(tmp_path)
+            return None
+        os.replace(tmp_path, thumb_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return thumb_path
+
+
+def _render_pdf_page(pdf_path, png_path, size):
+    if shutil.which("pdftoppm") is None:
+        return False
+    prefix = png_path[:-len(".png.tmp")]
+    result = subprocess.run(["pdftoppm", "-png", "-singlefile", "-f", "1", "-l", "1",
+                             "-scale-to", str(max(size)), pdf_path, prefix], capture_output=True)
+    if result.returncode != 0 or not os.path.exists(prefix + ".png"):
+        return False
+    os.replace(prefix + ".png", png_path)
+    return True
+
+
+# Store the files of donations that still reference a local path
+def import_existing(db):
+    conn = db.donations
+    rows = conn.execute("SELECT id, document_path FROM food_donations WHERE document_digest IS NULL").fetchall()
+    stored = missing = 0
+    digests = {}
+    for donation_id, document_path in rows:
+        if not document_path or not os.path.exists(document_path):
+            missing += 1
+            continue
+        if document_path not in digests:
+            digests[document_path] = put(document_path)
+        with conn:
+            conn.execute("UPDATE food_donations SET document_digest=? WHERE id=?", (digests[document_path], donation_id))
+        stored += 1
+    return stored, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Food testing document store")
+    parser.add_argument("command", choices=["import-existing", "verify"])
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        bad = 0
+        for path in glob.glob(os.path.join(STORE_DIR, "??", "*")):
+            digest = os.path.splitext(os.path.basename(path))[0]
+            if not verify(digest):
+                print(f"corrupt: {path}")
+                bad += 1
+        print(f"{bad} corrupt document(s)")
+        return
+
+    migrations.migrate()
+    db = Connections()
+    try:
+        stored, missing = import_existing(db)
+        print(f"stored {stored} document(s), {missing} file(s) not found")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
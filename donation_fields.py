@@ -0,0 +1,94 @@
+import calendar
+import re
+from datetime import datetime, timedelta
+
+# Parsing of the free-form quantity and date fields of a donation.
+# The text is kept as typed for display; the parsed values are stored next to
+# it (quantity_value, quantity_unit, donation_ts) so range filters and totals
+# can use indexes instead of parsing every row in Python.
+
+# Unit aliases -> (canonical unit, factor to the canonical unit)
+UNITS = {
+    "kg": ("kg", 1), "kgs": ("kg", 1), "kilo": ("kg", 1), "kilos": ("kg", 1),
+    "kilogram": ("kg", 1), "kilograms": ("kg", 1),
+    "g": ("kg", 0.001), "gm": ("kg", 0.001), "gms": ("kg", 0.001), "gram": ("kg", 0.001), "grams": ("kg", 0.001),
+    "l": ("l", 1), "ltr": ("l", 1), "litre": ("l", 1), "litres": ("l", 1), "liter": ("l", 1), "liters": ("l", 1),
+    "ml": ("l", 0.001),
+    "pc": ("pcs", 1), "pcs": ("pcs", 1), "piece": ("pcs", 1), "pieces": ("pcs", 1),
+    "plate": ("plates", 1), "plates": ("plates", 1),
+    "packet": ("packets", 1), "packets": ("packets", 1), "pack": ("packets", 1), "packs": ("packets", 1),
+    "box": ("boxes", 1), "boxes": ("boxes", 1),
+    "serving": ("servings", 1), "servings": ("servings", 1),
+}
+DEFAULT_UNIT = "pcs"  # a bare number counts items
+
+DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y"]
+BEST_BEFORE_FORMATS = ["%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M", "%d-%m-%Y %H:%M", "%d/%m/%Y %H:%M"]
+DEFAULT_SHELF_LIFE_HOURS = 48  # from the start of the donation day, when no best-before is given
+
+QUANTITY_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([A-Za-z]*)\.?\s*$")
+
+
+# "2.5 kg" -> (2.5, "kg"), "500g" -> (0.5, "kg"), "20" -> (20.0, "pcs").
+# Unknown unit words are kept as they are (lower-cased). Raises ValueError.
+def parse_quantity(text):
+    match = QUANTITY_PATTERN.match(text or "")
+    if not match:
+        raise ValueError(f"Quantity must be a number and a unit, e.g. 5 kg (got {text!r})")
+    value, unit = float(match.group(1)), match.group(2).lower()
+    if value <= 0:
+        raise ValueError("Quantity must be greater than zero")
+    if not unit:
+        return value, DEFAULT_UNIT
+    canonical, factor = UNITS.get(unit, (unit, 1))
+    return round(value * factor, 6), canonical
+
+
+# "2025-03-01", "01/03/2025", ... -> ("2025-03-01", epoch seconds at UTC midnight).
+# Raises ValueError.
+def parse_date(text):
+    text = (text or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            day = datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+        return day.isoformat(), calendar.timegm(day.timetuple())
+    raise ValueError(f"Date must be YYYY-MM-DD (got {text!r})")
+
+
+# Typed columns for a donation: (quantity_value, quantity_unit, iso date, donation_ts)
+def parse_donation(quantity, donation_date):
+    value, unit = parse_quantity(quantity)
+    iso_date, timestamp = parse_date(donation_date)
+    return value, unit, iso_date, timestamp
+
+
+def date_to_ts(text):
+    return parse_date(text)[1]
+
+
+# Best-before text -> epoch seconds, compared with time.time() by expiry.py.
+# Unlike donation_ts (a day key at UTC midnight) this is a real instant: the
+# hotel's times are local. A date and time is taken as typed; a date alone
+# means the end of that day; empty means DEFAULT_SHELF_LIFE_HOURS after the
+# start of the donation day. Raises ValueError.
+def parse_best_before(text, donation_date):
+    start = datetime.strptime(parse_date(donation_date)[0], "%Y-%m-%d")  # local midnight
+    text = (text or "").strip()
+    if not text:
+        return int((start + timedelta(hours=DEFAULT_SHELF_LIFE_HOURS)).timestamp())
+    for fmt in BEST_BEFORE_FORMATS:
+        try:
+            deadline = datetime.strptime(text, fmt)
+            break
+        except ValueError:
+            continue
+    else:
+        try:
+            deadline = datetime.strptime(parse_date(text)[0], "%Y-%m-%d") + timedelta(days=1)
+        except ValueError:
+            raise ValueError(f"Best before must be YYYY-MM-DD HH:MM (got {text!r})") from None
+    if deadline <= start:
+        raise ValueError("Best before must be later than the donation date")
+    return int(deadline.timestamp())
@@ -0,0 +1,134 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+import database
+import migrations
+import notifications
+
+# Expiry of pending donations past their best-before deadline.
+# The pending set is a priority queue kept by SQLite: idx_donations_pending_deadline
+# indexes best_before_ts for status='Pending' rows only, so the earliest
+# deadline is one index lookup and due rows come out in deadline order.
+# ExpiryScheduler sleeps until the earliest deadline (at most MAX_SLEEP, since
+# other processes add donations), then marks due rows 'Expired' in batches of
+# BATCH_SIZE, one short transaction each, and tells their hotels by SMS.
+# Usage: python expiry.py [--once]
+
+BATCH_SIZE = 500
+MAX_SLEEP = 60.0  # seconds
+
+
+# Earliest best-before among pending donations, or None
+def next_deadline(conn):
+    return conn.execute("SELECT MIN(best_before_ts) FROM food_donations WHERE status='Pending'").fetchone()[0]
+
+
+# Expire one batch of due donations; returns how many were expired
+def expire_batch(conn, now, batch_size=BATCH_SIZE):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute("""
+            SELECT id, hotel_phone, food_name, document_id FROM food_donations
+            WHERE status='Pending' AND best_before_ts <= ?
+            ORDER BY best_before_ts LIMIT ?
+        """, (now, batch_size)).fetchall()
+        if rows:
+            conn.execute("UPDATE food_donations SET status='Expired' WHERE id IN (SELECT value FROM json_each(?))",
+                         (json.dumps([row[0] for row in rows]),))
+            for _, hotel_phone, food_name, document_id in rows:
+                if hotel_phone:
+                    notifications.enqueue_sms(
+                        conn, hotel_phone,
+                        f"Your donation of {food_name} (Document ID {document_id}) expired before it was accepted.",
+                        f"donation:{document_id}:Expired")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+# Expire everything due at `now`, batch by batch
+def expire_due(conn, now=None, batch_size=BATCH_SIZE):
+    now = time.time() if now is None else now
+    expired = 0
+    while True:
+        count = expire_batch(conn, now, batch_size)
+        expired += count
+        if count < batch_size:
+            return expired
+
+
+class ExpiryScheduler:
+    # on_expired(count) is called on the scheduler thread after each sweep that expired rows
+    def __init__(self, db_path=migrations.DONATIONS_DB, batch_size=BATCH_SIZE, max_sleep=MAX_SLEEP, on_expired=None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep
+        self.on_expired = on_expired
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="expiry-scheduler", daemon=True)
+            self._thread.start()
+
+    # Re-read the earliest deadline now (e.g. after a donation was submitted)
+    def notify(self):
+        self._wake.set()
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        conn = database.connect(self.db_path)
+        try:
+            while not self._stopping.is_set():
+                deadline = None
+                try:
+                    expired = expire_due(conn, time.time(), self.batch_size)
+                    if expired and self.on_expired is not None:
+                        self.on_expired(expired)
+                    deadline = next_deadline(conn)
+                except sqlite3.Error as e:
+                    print(f"Expiry scheduler error: {e}")
+                delay = self.max_sleep if deadline is None else min(self.max_sleep, max(0.0, deadline - time.time()))
+                self._wake.wait(delay)
+                self._wake.clear()
+        finally:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expire pending donations past their best-before time")
+    parser.add_argument("--db", default=migrations.DONATIONS_DB)
+    parser.add_argument("--once", action="store_true", help="expire what is due and exit")
+    args = parser.parse_args()
+
+    migrations.migrate(donations_db=args.db)
+    if args.once:
+        conn = database.connect(args.db)
+        try:
+            print(f"expired {expire_due(conn)} donation(s)")
+        finally:
+            conn.close()
+        return
+    scheduler = ExpiryScheduler(args.db, on_expired=lambda count: print(f"expired {count} donation(s)"))
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
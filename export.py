@@ -0,0 +1,133 @@
+import argparse
+import csv
+import gzip
+import json
+import os
+import tempfile
+import time
+
+import data_access
+import migrations
+from db_worker import Connections
+
+# Streaming export of donations and users for reporting.
+# Rows are read with fetchmany() in batches and written straight to the output
+# file, so memory use stays constant however large the table is. Output is CSV
+# or JSON Lines, gzip-compressed when the file name ends in ".gz". The file is
+# written to a temporary name and moved into place when complete.
+# Donation exports include the archive (see archive.py) unless --live-only.
+# Usage: python export.py donations report.csv.gz [--status Pending] [--from 2025-01-01] [--to 2025-01-31]
+#        python export.py users users.jsonl [--role Orphanage]
+
+FORMATS = ["csv", "jsonl"]
+BATCH_SIZE = 1000
+
+DONATION_COLUMNS = ["id", "food_name", "quantity", "document_path", "document_id", "orphanage_phone",
+                    "hotel_address", "donation_date", "status", "hotel_phone", "quantity_value", "quantity_unit",
+                    "orphanage_id", "hotel_id", "best_before_ts"]
+USER_COLUMNS = ["id", "name", "email", "phone", "role", "address", "organization_name"]  # never the password
+
+
+# SELECT for donations matching the filters; the dates are inclusive YYYY-MM-DD bounds.
+# Archived donations keep their ids, so both tables merge in id order.
+def donations_query(status=None, date_from=None, date_to=None, orphanage_phone=None, include_archive=True):
+    where, params = data_access.donation_filter(status, date_from, date_to, orphanage_phone)
+    sql = f"SELECT {', '.join(DONATION_COLUMNS)} FROM food_donations WHERE {where}"
+    if include_archive:
+        sql += f" UNION ALL SELECT {', '.join(DONATION_COLUMNS)} FROM food_donations_archive WHERE {where}"
+        params = params * 2
+    return sql + " ORDER BY id", params
+
+
+def users_query(role=None):
+    where, params = data_access.user_filter(role)
+    return f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE {where} ORDER BY id", params
+
+
+# Stream the rows of `cursor` into the text file `out`; returns the row count
+def write_rows(cursor, out, fmt, batch_size=BATCH_SIZE):
+    columns = [column[0] for column in cursor.description]
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        write_batch = writer.writerows
+    else:
+        def write_batch(rows):
+            out.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+
+    count = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return count
+        write_batch(rows)
+        count += len(rows)
+
+
+# Format from the file name: report.csv, report.jsonl, report.csv.gz, ...
+def format_for(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    ext = os.path.splitext(name)[1].lower().lstrip(".")
+    return "jsonl" if ext in ("jsonl", "json") else "csv"
+
+
+def export_query(conn, sql, params, path, fmt=None, batch_size=BATCH_SIZE):
+    fmt = fmt or format_for(path)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        if path.endswith(".gz"):
+            out = gzip.open(tmp_path, "wt", encoding="utf-8", newline="")
+        else:
+            out = open(tmp_path, "w", encoding="utf-8", newline="")
+        with out:
+            count = write_rows(conn.execute(sql, params), out, fmt, batch_size)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return count
+
+
+# Entry points for the database worker (db is a db_worker.Connections)
+def export_donations(db, path, fmt=None, status=None, date_from=None, date_to=None, orphanage_phone=None,
+                     include_archive=True):
+    sql, params = donations_query(status, date_from, date_to, orphanage_phone, include_archive)
+    return export_query(db.donations, sql, params, path, fmt)
+
+
+def export_users(db, path, fmt=None, role=None):
+    sql, params = users_query(role)
+    return export_query(db.users, sql, params, path, fmt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export donations or users to CSV / JSON Lines")
+    parser.add_argument("table", choices=["donations", "users"])
+    parser.add_argument("path", help="output file; add .gz to compress")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--status", help="donations: Pending, Accepted, Rejected, Expired")
+    parser.add_argument("--from", dest="date_from", help="donations: first date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="donations: last date, YYYY-MM-DD")
+    parser.add_argument("--orphanage", help="donations: orphanage phone")
+    parser.add_argument("--live-only", action="store_true", help="donations: leave out archived donations")
+    parser.add_argument("--role", help="users: Hotel, Orphanage or Admin")
+    args = parser.parse_args()
+
+    migrations.migrate()
+    db = Connections()
+    try:
+        start = time.perf_counter()
+        if args.table == "donations":
+            count = export_donations(db, args.path, args.format, args.status, args.date_from, args.date_to,
+                                     args.orphanage, not args.live_only)
+        else:
+            count = export_users(db, args.path, args.format, args.role)
+        print(f"Exported {count} row(s) to {args.path} in {time.perf_counter() - start:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
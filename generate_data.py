@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import os
+import random
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import database
+import migrations
+
+# Deterministic synthetic data for benchmarks: fills a users database and a
+# donations database to the requested sizes. The same --seed and --end-date
+# always produce the same rows.
+#   - users: one admin, then 30% orphanages and 70% hotels spread over
+#     CITY_COUNT cities (each city is also a row in `places`, so matching works)
+#   - donations: spread over --days days up to --end-date; busy hotels and
+#     orphanages get more of them. Older donations are Accepted / Rejected /
+#     Expired; those from the last PENDING_DAYS days are mostly Pending.
+# Rows are inserted with the table's indexes and triggers dropped, then the
+# indexes, full-text tables and analytics rollups are rebuilt once.
+# User i logs in as user<i>@example.com with password "password<i>".
+# Usage: python generate_data.py [--users 100000] [--donations 5000000] [--out bench_data] [--seed 1]
+
+CITY_COUNT = 500
+CHUNK = 50_000
+PENDING_DAYS = 2
+OLD_STATUSES = (["Accepted"] * 75) + (["Rejected"] * 12) + (["Expired"] * 13)
+RECENT_STATUSES = (["Pending"] * 70) + (["Accepted"] * 25) + (["Rejected"] * 5)
+FOODS = ["Rice", "Dal", "Chapati", "Biryani", "Paneer Curry", "Mixed Veg", "Idli", "Dosa", "Sambar", "Poha",
+         "Upma", "Khichdi", "Pulao", "Bread", "Milk", "Curd", "Fruit Salad", "Sweets", "Samosa", "Vada Pav",
+         "Pav Bhaji", "Chole", "Rajma", "Aloo Sabzi", "Halwa", "Kheer", "Sandwiches", "Noodles", "Soup", "Juice"]
+QUANTITIES = [("kg", (1, 40)), ("plates", (5, 200)), ("packets", (5, 100)), ("l", (1, 30)), ("pcs", (10, 300))]
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Sai", "Arjun", "Ananya", "Diya", "Ishita", "Kavya", "Meera",
+               "Rohan", "Sneha", "Pooja", "Rahul", "Neha", "Amit", "Priya", "Kiran", "Sakshi", "Mayuri"]
+STREETS = ["MG Road", "Station Road", "Market Yard", "Bus Stand Road", "College Road", "Temple Street", "Main Road"]
+DOCUMENT_DIGESTS = 1000  # many donations share the same testing document
+
+
+def phone_for(i):
+    return f"9{i:09d}"
+
+
+def city_name(c):
+    return f"city{c}"
+
+
+def hashed_password(i):
+    return hashlib.sha256(f"password{i}".encode()).hexdigest()
+
+
+def role_for(i):
+    if i == 0:
+        return "admin"
+    return "Orphanage" if i % 10 < 3 else "Hotel"
+
+
+# Drop the table's indexes and triggers for a bulk insert and recreate them after
+@contextmanager
+def bulk_load(conn, table):
+    saved = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """, (table,)).fetchall()
+    for kind, name, _ in saved:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    yield
+    for _, _, sql in saved:
+        conn.execute(sql)
+
+
+def open_for_load(path):
+    conn = database.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")  # a fresh file; nothing to recover
+    conn.execute("PRAGMA synchronous=OFF")
+    return conn
+
+
+def finish(conn):
+    conn.commit()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def chunks(rows, size=CHUNK):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_users(path, count, seed):
+    rnd = random.Random(seed)
+    cities = [(city_name(c), rnd.uniform(8.0, 35.0), rnd.uniform(68.0, 97.0)) for c in range(CITY_COUNT)]
+    conn = open_for_load(path)
+    migrations.apply_migrations(conn, migrations.USERS_MIGRATIONS)
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO places (name, latitude, longitude) VALUES (?, ?, ?)", cities)
+
+    def rows():
+        for i in range(count):
+            name, latitude, longitude = cities[rnd.randrange(CITY_COUNT)]
+            role = role_for(i)
+            organization = f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {'Home' if role == 'Orphanage' else 'Hotel'} {i}"
+            yield (i + 1, f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {i}", f"user{i}@example.com", phone_for(i), hashed_password(i),
+                   role, f"{rnd.randrange(1, 200)} {rnd.choice(STREETS)}, {name}", organization,
+                   latitude + rnd.uniform(-0.05, 0.05), longitude + rnd.uniform(-0.05, 0.05))
+
+    with bulk_load(conn, "users"):
+        for chunk in chunks(rows()):
+            conn.executemany("""
+                INSERT INTO users (id, name, email, phone, password, role, address, organization_name, latitude, longitude)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, chunk)
+    conn.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+    users = conn.execute("SELECT id, phone, role, address FROM users ORDER BY id").fetchall()
+    finish(conn)
+    return users
+
+
+def generate_donations(path, users_path, count, days, end_date, seed, users):
+    rnd = random.Random(seed + 1)
+    orphanages = [user for user in users if user[2] == "Orphanage"]
+    hotels = [user for user in users if user[2] == "Hotel"]
+    if not orphanages or not hotels:
+        raise ValueError("need at least one hotel and one orphanage (use --users 10 or more)")
+    digests = [hashlib.sha256(f"document{d}".encode()).hexdigest() for d in range(DOCUMENT_DIGESTS)]
+    start_day = end_date - timedelta(days=days - 1)
+
+    conn = open_for_load(path)
+    migrations.attach_users(conn, users_path)
+    migrations.apply_migrations(conn, migrations.DONATIONS_MIGRATIONS)
+    conn.execute("BEGIN")
+
+    def rows():
+        for i in range(count):
+            # Squaring the uniform draw skews the load toward the first hotels/orphanages
+            orphanage = orphanages[int(len(orphanages) * rnd.random() ** 2)]
+            hotel = hotels[int(len(hotels) * rnd.random() ** 2)]
+            day = start_day + timedelta(days=rnd.randrange(days))
+            day_start = datetime(day.year, day.month, day.day)
+            recent = (end_date - day).days < PENDING_DAYS
+            status = rnd.choice(RECENT_STATUSES if recent else OLD_STATUSES)
+            unit, (low, high) = rnd.choice(QUANTITIES)
+            value = rnd.randint(low, high)
+            digest = digests[rnd.randrange(DOCUMENT_DIGESTS)]
+            yield (rnd.choice(FOODS), f"{value} {unit}", f"documents/{digest[:2]}/{digest}.pdf", f"GEN{i:09d}",
+                   orphanage[1], hotel[3], day.isoformat(), status, hotel[1], float(value), unit,
+                   int((day_start - datetime(1970, 1, 1)).total_seconds()), orphanage[0], hotel[0], digest,
+                   int((day_start + timedelta(hours=rnd.randint(24 * PENDING_DAYS + 24, 24 * PENDING_DAYS + 96))).timestamp()))
+
+    with bulk_load(conn, "food_donations"):
+        for chunk in chunks(rows()):
+            conn.executemany("""
+                INSERT INTO food_donations (food_name, quantity, document_path, document_id, orphanage_phone, hotel_address,
+                    donation_date, status, hotel_phone, quantity_value, quantity_unit, donation_ts, orphanage_id, hotel_id,
+                    document_digest, best_before_ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, chunk)
+    conn.execute("INSERT INTO food_donations_fts (food_donations_fts) VALUES ('rebuild')")
+    migrations.rebuild_rollups(conn)
+    finish(conn)
+
+
+# Write users.db and hotel_food_donation.db into `out_dir`; returns their paths
+def generate(out_dir, users, donations, seed=1, days=730, end_date=None, force=False):
+    end_date = end_date or date.today()
+    users_path = os.path.join(out_dir, migrations.USERS_DB)
+    donations_path = os.path.join(out_dir, migrations.DONATIONS_DB)
+    os.makedirs(out_dir, exist_ok=True)
+    for path in (users_path, donations_path):
+        if os.path.exists(path):
+            if not force:
+                raise FileExistsError(f"{path} already exists (use --force to replace it)")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    user_rows = generate_users(users_path, users, seed)
+    generate_donations(donations_path, users_path, donations, days, end_date, seed, user_rows)
+    return users_path, donations_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deterministic benchmark databases")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--donations", type=int, default=5_000_000)
+    parser.add_argument("--out", default="bench_data", help="directory for users.db and hotel_food_donation.db")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--days", type=int, default=730, help="donations are spread over this many days")
+    parser.add_argument("--end-date", type=date.fromisoformat, help="YYYY-MM-DD of the newest donations (default: today)")
+    parser.add_argument("--force", action="store_true", help="replace existing databases in --out")
+    args = parser.parse_args()
+
+    start = datetime.now()
+    users_path, donations_path = generate(args.out, args.users, args.donations, args.seed, args.days, args.end_date, args.force)
+    print(f"wrote {args.users} users to {users_path} and {args.donations} donations to {donations_path} "
+          f"in {(datetime.now() - start).total_seconds():.0f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,15 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import sqlite3
 import hashlib
-import subprocess  # To run external Python files
-from twilio.rest import Client  # Twilio client for sending SMS
-from PIL import Image, ImageTk
+import migrations
+import data_access
+import diagnostics
+import assets
+import notifications
+import expiry
+from db_worker import DBWorker
+# Heavy or rarely needed modules (the role panels) are imported
+# where they are first used to keep time-to-first-frame low; see bench_startup.py
 
 # Colors and Fonts
 BG_COLOR = "#e3f2fd"
@@ -16,54 +22,28 @@ BTN_TEXT_COLOR = "#ffffff"
 HEADER_FONT = ("Arial", 18, "bold")
 TEXT_FONT = ("Arial", 12)
 
+# Home page image sizes; the largest that fits a third of the screen width is used
+HOME_IMAGE = "fooddonation.webp"
+HOME_IMAGE_SIZES = [(400, 300), (600, 450), (800, 600)]
+
 # Global variable for logged-in user
 logged_in_user = None
 
-# Twilio Credentials (Use your own credentials here)
-TWILIO_ACCOUNT_SID = 'your_twilio_account_sid'
-TWILIO_AUTH_TOKEN = 'your_twilio_auth_token'
-TWILIO_PHONE_NUMBER = 'your_twilio_phone_number'  # This is the phone number you use to send SMS
-
-# Database Connection Function
-def connect_db():
-    return sqlite3.connect("users.db")
+# Role panel currently shown in the content frame (HotelPanel, OrphanagePanel or AdminPanel)
+current_panel = None
 
 # Hash function for secure passwords
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
-# Initialize database
-try:
-    with connect_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                phone TEXT NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL,
-                address TEXT,
-                organization_name TEXT
-            )
-        """)
-        conn.commit()
-except sqlite3.Error as e:
-    print(f"Database Error: {e}")
-
-# Twilio function to send SMS
+# Queue an SMS; the background dispatcher sends it (Twilio settings live in notifications.py)
 def send_sms(to_phone_number, message):
-    client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-    try:
-        client.messages.create(
-            body=message,
-            from_=TWILIO_PHONE_NUMBER,
-            to=to_phone_number
-        )
-        messagebox.showinfo("Success", "Message sent successfully!")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to send message: {e}")
+    def on_queued(_):
+        sms_dispatcher.notify()
+        messagebox.showinfo("Success", "Message queued for sending!")
+
+    db.submit(data_access.queue_sms, to_phone_number, message, on_done=on_queued,
+              on_error=lambda e: messagebox.showerror("Error", f"Failed to queue message: {e}"))
 
 # Main Window
 root = tk.Tk()
@@ -72,6 +52,18 @@ root.geometry("800x600")
 root.configure(bg=BG_COLOR)
 root.state("zoomed")  # Maximized window
 
+# Background database worker; all queries below go through it.
+# Schema setup is its first job so it runs while the window is being drawn.
+db = DBWorker(root)
+db.submit(lambda _: migrations.migrate(), on_error=lambda e: print(f"Database Error: {e}"))
+
+# SMS outbox dispatcher and donation expiry, started once the schema is in place.
+# A thin client of service.py leaves both to the service.
+sms_dispatcher = notifications.SMSDispatcher()
+expiry_scheduler = expiry.ExpiryScheduler(on_expired=lambda _: sms_dispatcher.notify())
+if db.client is None:
+    db.submit(lambda _: None, on_done=lambda _: (sms_dispatcher.start(), expiry_scheduler.start()))
+
 # Title
 tk.Label(root, text="Hotel Food Donation Management System", font=HEADER_FONT, bg=BG_COLOR, fg=TEXT_COLOR).pack(pady=10)
 
@@ -87,12 +79,53 @@ btn_frame.pack(expand=True)
 content_frame = tk.Frame(root, bg=BG_COLOR)
 content_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
 
-# Function to Switch Pages
+# Build the panel for the logged-in user's role inside the content frame
+def open_panel():
+    role = logged_in_user["role"].lower()
+    if role == "hotel":
+        from hotel import HotelPanel
+        return HotelPanel(content_frame, db, logged_in_user)
+    if role == "orphanage":
+        from orphanage import OrphanagePanel
+        return OrphanagePanel(content_frame, db, logged_in_user["phone"], logged_in_user)
+    if role == "admin":
+        from admin import AdminPanel
+        return AdminPanel(content_frame, db, logged_in_user)
+    messagebox.showerror("Error", f"Unknown role: {logged_in_user['role']}")
+    return None
+
+# Fill the Home page image label once the image is ready. The pre-scaled copy
+# is rendered on the database worker (a cold asset cache means a PIL decode),
+# so the first frame never waits for it; the label stays empty until then.
+def load_home_image(label):
+    size = assets.fit_size(HOME_IMAGE_SIZES, root.winfo_screenwidth())
+
+    def failed(_error):
+        label.configure(text="Error loading image!", font=TEXT_FONT, fg="red")
+
+    def show(_path):
+        try:
+            food_image = assets.photo(HOME_IMAGE, size, master=root)  # cache is warm: no PIL
+        except Exception as e:
+            failed(e)
+            return
+        label.configure(image=food_image)
+        label.image = food_image  # Keep reference to avoid garbage collection
+
+    db.scoped(label).submit(lambda _: assets.rendered_path(HOME_IMAGE, size), on_done=show, on_error=failed, quiet=True)
+
+# Function to Switch Pages (router for the whole application)
 def show_page(page):
+    global current_panel
+    if current_panel is not None:
+        current_panel.close()
+        current_panel = None
     for widget in content_frame.winfo_children():
         widget.destroy()
 
-    if page == "Home":
+    if page == "Dashboard" and logged_in_user:
+        current_panel = open_panel()
+    elif page == "Home":
         tk.Label(content_frame, text="Welcome to the Hotel Food Donation Management System!", 
                  font=HEADER_FONT, fg=TEXT_COLOR, bg=BG_COLOR, anchor="center").pack(pady=10)
         
@@ -104,17 +137,10 @@ can list available food donations, and orphanages or NGOs can access the details
 requests to collect the food.                                                                                                 """
         tk.Label(content_frame, text=home_text, font=TEXT_FONT, fg=TEXT_COLOR, bg=BG_COLOR, 
                  wraplength=700, justify="center", anchor="center").pack(pady=5)
-        try:
-            food_image = Image.open("fooddonation.webp")  # Replace with your image file name
-            food_image = food_image.resize((400, 300))  # Resize the image
-            food_image = ImageTk.PhotoImage(food_image)
-
-        # Display image in the Home tab
-            image_label = tk.Label(content_frame, image=food_image, bg=BG_COLOR)
-            image_label.image = food_image  # Keep reference to avoid garbage collection
-            image_label.pack(pady=10)
-        except Exception as e:
-            tk.Label(content_frame, text="Error loading image!", font=TEXT_FONT, fg="red", bg=BG_COLOR).pack(pady=5)
+        # Display image in the Home tab (decoded and resized once, then served from the asset cache)
+        image_label = tk.Label(content_frame, bg=BG_COLOR)
+        image_label.pack(pady=10)
+        load_home_image(image_label)
 
         system_text = """
 This project automates and streamlines the donation process by ensuring that leftover food 
@@ -151,6 +177,7 @@ def update_nav_buttons():
     ]
 
     if logged_in_user:
+        nav_buttons.append(("Dashboard", lambda: show_page("Dashboard")))
         nav_buttons.append(("Logout", logout))
     else:
         nav_buttons.append(("Register", open_register))
@@ -182,6 +209,7 @@ def open_register():
     role_dropdown = ttk.Combobox(register_window, textvariable=role_var, values=["Hotel","Orphanage"])
     role_dropdown.pack(pady=5)
 
+    @diagnostics.timed("homepage.register")
     def submit_form():
         name, email, phone, password, address, organization_name, role = (
             entries["Name"].get(), entries["Email"].get(), entries["Phone"].get(), entries["Password"].get(),
@@ -194,16 +222,18 @@ def open_register():
 
         hashed_password = hash_password(password)
 
-        try:
-            with connect_db() as conn:
-                cursor = conn.cursor()
-                cursor.execute("INSERT INTO users (name, email, phone, password, role, address, organization_name) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                               (name, email, phone, hashed_password, role, address, organization_name))
-                conn.commit()
+        def on_registered(_):
             messagebox.showinfo("Success", "Registration Successful!")
             register_window.destroy()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Email already exists!")
+
+        def on_error(e):
+            if isinstance(e, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "Email already exists!")
+            else:
+                messagebox.showerror("Database Error", str(e))
+
+        db.submit(data_access.register_user, name, email, phone, hashed_password, role, address, organization_name,
+                  on_done=on_registered, on_error=on_error)
 
     tk.Button(register_window, text="Submit", command=submit_form, bg=BTN_COLOR, fg=BTN_TEXT_COLOR, font=("Arial", 12, "bold"), width=15).pack(pady=15)
 
@@ -223,25 +253,32 @@ def open_login():
     tk.Label(login_window, text="Password:", fg=TEXT_COLOR, bg=BG_COLOR, font=TEXT_FONT).pack()
     password_entry = tk.Entry(login_window, show="*", bg=ENTRY_BG)
     password_entry.pack()
+    @diagnostics.timed("homepage.check_login")
     def check_login():
-        global logged_in_user
         email, password = email_entry.get(), password_entry.get()
         hashed_password = hash_password(password)
+        db.submit(data_access.find_user, email, hashed_password, on_done=finish_login)
 
-        with connect_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name, role FROM users WHERE email=? AND password=?", (email, hashed_password))
-            user = cursor.fetchone()
-
+    def finish_login(user):
+        global logged_in_user
         if user:
-            logged_in_user = {"id": user[0], "name": user[1], "role": user[2]}
-            root.destroy()
-            subprocess.run(["python", f"{logged_in_user['role'].lower()}.py"])
+            logged_in_user = {"id": user[0], "name": user[1], "role": user[2], "phone": user[3]}
+            login_window.destroy()
+            update_nav_buttons()
+            show_page("Dashboard")
         else:
             messagebox.showerror("Error", "Invalid email or password!")
 
     tk.Button(login_window, text="Login", command=check_login, bg=BTN_COLOR, fg=BTN_TEXT_COLOR, font=("Arial", 12, "bold"), width=15).pack(pady=15)
 
+def on_closing():
+    expiry_scheduler.stop()
+    sms_dispatcher.stop()
+    db.stop()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_closing)
+
 update_nav_buttons()
 show_page("Home")
 root.mainloop()
\ No newline at end of file
@@ -1,168 +1,279 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import sqlite3
-import subprocess
+import migrations
+import data_access
+import diagnostics
+import donation_fields
+import bulk_import
+import matching
+import orphanage_directory
+from autocomplete import Autocomplete
+from db_worker import DBWorker
 
 from datetime import datetime
 
-# --- Database connections ---
-donation_conn = sqlite3.connect("hotel_food_donation.db")
-donation_cursor = donation_conn.cursor()
-
-users_conn = sqlite3.connect("users.db")
-users_cursor = users_conn.cursor()
-
-# Create necessary tables if they don't exist
-donation_cursor.execute("""
-    CREATE TABLE IF NOT EXISTS food_donations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        food_name TEXT,
-        quantity TEXT,
-        document_path TEXT,
-        document_id TEXT UNIQUE,
-        orphanage_phone TEXT,
-        hotel_address TEXT,
-        donation_date TEXT,
-        status TEXT DEFAULT 'Pending'
-    )
-""")
-donation_conn.commit()
-
-# --- GUI setup ---
-root = tk.Tk()
-root.title("Hotel - Food Donation Panel")
-root.geometry("650x600")
-root.configure(bg="#f8f9fa")
-
-frame = tk.Frame(root, padx=20, pady=20, bg="white", relief="ridge", bd=2)
-frame.pack(pady=20)
-
-tk.Label(frame, text="Food Donation Form", font=("Arial", 16, "bold"), fg="#333", bg="white").grid(row=0, column=0, columnspan=3, pady=10)
-
-# --- Input Fields ---
-labels = [
-    "Name of Food:",
-    "Quantity:",
-    "Food Testing Document:",
-    "Document ID (Unique):",
-    "Orphanage Phone No:",
-    "Hotel Address:",
-    "Date of Donation (YYYY-MM-DD):"
-]
-
-entries = []
-
-for i, label_text in enumerate(labels):
-    tk.Label(frame, text=label_text, font=("Arial", 12), bg="white").grid(row=i+1, column=0, sticky="w", padx=10, pady=5)
-    if label_text == "Food Testing Document:":
-        entry_document_path = tk.Entry(frame, width=30, font=("Arial", 10))
-        entry_document_path.grid(row=i+1, column=1, pady=5, padx=5)
-        tk.Button(frame, text="Browse", command=lambda: select_file(entry_document_path), font=("Arial", 10), bg="#007bff", fg="white").grid(row=i+1, column=2, padx=5)
-    else:
-        entry = tk.Entry(frame, width=35, font=("Arial", 10))
-        entry.grid(row=i+1, column=1, pady=5, padx=5)
-        entries.append(entry)
-
-# Unpack entries for use
-entry_food_name, entry_quantity, entry_document_id, entry_orphanage_phone, entry_hotel_address, entry_date = entries
-
-# --- Functions ---
-
-def select_file(entry_field):
-    file_path = filedialog.askopenfilename(title="Select Food Testing Document", filetypes=[("PDF Files", ".pdf"), ("All Files", ".*")])
-    entry_field.delete(0, tk.END)
-    entry_field.insert(0, file_path)
-
-def clear_fields():
-    entry_food_name.delete(0, tk.END)
-    entry_quantity.delete(0, tk.END)
-    entry_document_path.delete(0, tk.END)
-    entry_document_id.delete(0, tk.END)
-    entry_orphanage_phone.delete(0, tk.END)
-    entry_hotel_address.delete(0, tk.END)
-    entry_date.delete(0, tk.END)
-
-def submit_donation():
-    food_name = entry_food_name.get()
-    quantity = entry_quantity.get()
-    document_path = entry_document_path.get()
-    document_id = entry_document_id.get()
-    orphanage_phone = entry_orphanage_phone.get()
-    hotel_address = entry_hotel_address.get()
-    donation_date = entry_date.get()
-
-    # Validation
-    if not all([food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date]):
-        messagebox.showerror("Error", "All fields are required!")
-        return
-
-    # Check orphanage existence
-    users_cursor.execute("""
-        SELECT name, address, organization_name FROM users
-        WHERE phone = ? AND role = 'Orphanage'
-    """, (orphanage_phone,))
-    orphanage_data = users_cursor.fetchone()
-
-    if not orphanage_data:
-        messagebox.showerror("Error", "No orphanage found with that phone number!")
-        return
 
-    orphanage_name, orphanage_address, orphanage_org = orphanage_data
+class HotelPanel:
+    def __init__(self, parent, db, user=None):
+        self.parent = parent
+        self.user = user
+        self.orphanage_grid = None  # matching.GridIndex, rebuilt by "Nearby" when users.db changed
+        self.orphanage_grid_version = None
+
+        self.frame = tk.Frame(parent, padx=20, pady=20, bg="white", relief="ridge", bd=2)
+        self.frame.pack(pady=20)
+        # Callbacks for this panel are dropped once it is closed
+        self.db = db.scoped(self.frame)
+
+        tk.Label(self.frame, text="Food Donation Form", font=("Arial", 16, "bold"), fg="#333", bg="white").grid(row=0, column=0, columnspan=3, pady=10)
+
+        # --- Input Fields ---
+        labels = [
+            "Name of Food:",
+            "Quantity (e.g. 5 kg):",
+            "Food Testing Document:",
+            "Document ID (Unique):",
+            "Orphanage Phone No:",
+            "Hotel Address:",
+            "Date of Donation (YYYY-MM-DD):",
+            "Best Before (optional):"
+        ]
+
+        entries = []
+
+        for i, label_text in enumerate(labels):
+            tk.Label(self.frame, text=label_text, font=("Arial", 12), bg="white").grid(row=i+1, column=0, sticky="w", padx=10, pady=5)
+            if label_text == "Food Testing Document:":
+                self.entry_document_path = tk.Entry(self.frame, width=30, font=("Arial", 10))
+                self.entry_document_path.grid(row=i+1, column=1, pady=5, padx=5)
+                tk.Button(self.frame, text="Browse", command=lambda: self.select_file(self.entry_document_path), font=("Arial", 10), bg="#007bff", fg="white").grid(row=i+1, column=2, padx=5)
+            else:
+                entry = tk.Entry(self.frame, width=35, font=("Arial", 10))
+                entry.grid(row=i+1, column=1, pady=5, padx=5)
+                entries.append(entry)
+
+        # Unpack entries for use
+        (self.entry_food_name, self.entry_quantity, self.entry_document_id, self.entry_orphanage_phone,
+         self.entry_hotel_address, self.entry_date, self.entry_best_before) = entries
+        # YYYY-MM-DD HH:MM; left empty, the default shelf life applies
+        tk.Label(self.frame, text="YYYY-MM-DD HH:MM", font=("Arial", 9), fg="#666", bg="white").grid(row=labels.index("Best Before (optional):") + 1, column=2, sticky="w")
+
+        # Orphanage suggestions while typing and submit-time checks come from an
+        # in-memory directory, re-checked against users.db when the field is entered
+        self.directory = orphanage_directory.DirectoryCache(self.db)
+        self.directory.refresh()
+        Autocomplete(self.entry_orphanage_phone, self.directory.complete)
+        self.entry_orphanage_phone.bind("<FocusIn>", lambda _: self.directory.refresh(), add="+")
+
+        # Suggest the orphanages nearest to the hotel address
+        tk.Button(self.frame, text="Nearby", command=self.find_nearby_orphanages, font=("Arial", 10), bg="#007bff", fg="white").grid(row=labels.index("Orphanage Phone No:") + 1, column=2, padx=5)
+
+        # --- Buttons ---
+        self.submit_button = tk.Button(self.frame, text="Submit Donation", command=self.submit_donation, font=("Arial", 12, "bold"), bg="#28a745", fg="white", width=18)
+        self.submit_button.grid(row=9, column=0, pady=20)
+        tk.Button(self.frame, text="Check Status", command=self.open_status_checker, font=("Arial", 12, "bold"), bg="#ffc107", fg="black", width=18).grid(row=9, column=1, pady=20)
+        self.import_button = tk.Button(self.frame, text="Import File", command=self.import_donations, font=("Arial", 12, "bold"), bg="#17a2b8", fg="white", width=12)
+        self.import_button.grid(row=9, column=2, pady=20)
+
+    # --- Functions ---
+
+    def select_file(self, entry_field):
+        file_path = filedialog.askopenfilename(title="Select Food Testing Document", filetypes=[("PDF Files", ".pdf"), ("All Files", ".*")])
+        entry_field.delete(0, tk.END)
+        entry_field.insert(0, file_path)
 
-    try:
-        donation_cursor.execute('''
-            INSERT INTO food_donations (
-                food_name, quantity, document_path, document_id,
-                orphanage_phone, hotel_address, donation_date
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (food_name, quantity, document_path, document_id,
-              orphanage_phone, hotel_address, donation_date))
-        donation_conn.commit()
+    @diagnostics.timed("HotelPanel.find_nearby_orphanages")
+    def find_nearby_orphanages(self):
+        hotel_address = self.entry_hotel_address.get().strip()
+        if not hotel_address:
+            messagebox.showerror("Error", "Enter the hotel address first.")
+            return
+
+        def on_index(result):
+            if result is not None:
+                self.orphanage_grid_version, self.orphanage_grid = result
+            self.db.submit(matching.nearest_orphanages, hotel_address, 5, self.orphanage_grid,
+                           on_done=self.show_nearby_orphanages)
+        self.db.submit(matching.orphanage_index, self.orphanage_grid_version, on_done=on_index)
+
+    def show_nearby_orphanages(self, matches):
+        if matches is None:
+            messagebox.showerror("Not Found", "The hotel address could not be located.")
+            return
+        if not matches:
+            messagebox.showinfo("Nearby Orphanages", "No orphanage locations are known yet.")
+            return
+        win = tk.Toplevel(self.frame)
+        win.title("Nearby Orphanages")
+        listbox = tk.Listbox(win, width=60, height=len(matches), font=("Arial", 11))
+        for distance, (_, name, organization, phone, address) in matches:
+            listbox.insert(tk.END, f"{distance:.1f} km - {organization or name} ({phone}), {address}")
+        listbox.pack(padx=10, pady=10)
+
+        def use_selected(_event=None):
+            selection = listbox.curselection()
+            if not selection:
+                return
+            self.entry_orphanage_phone.delete(0, tk.END)
+            self.entry_orphanage_phone.insert(0, matches[selection[0]][1][3])
+            win.destroy()
 
+        listbox.bind("<Double-Button-1>", use_selected)
+        tk.Button(win, text="Use Orphanage", command=use_selected, font=("Arial", 11), bg="#28a745", fg="white").pack(pady=5)
+
+    def clear_fields(self):
+        self.entry_food_name.delete(0, tk.END)
+        self.entry_quantity.delete(0, tk.END)
+        self.entry_document_path.delete(0, tk.END)
+        self.entry_document_id.delete(0, tk.END)
+        self.entry_orphanage_phone.delete(0, tk.END)
+        self.entry_hotel_address.delete(0, tk.END)
+        self.entry_date.delete(0, tk.END)
+        self.entry_best_before.delete(0, tk.END)
+
+    @diagnostics.timed("HotelPanel.submit_donation")
+    def submit_donation(self):
+        food_name = self.entry_food_name.get()
+        quantity = self.entry_quantity.get()
+        document_path = self.entry_document_path.get()
+        document_id = self.entry_document_id.get()
+        orphanage_phone = self.entry_orphanage_phone.get().strip()  # validated and stored as the directory has it
+        hotel_address = self.entry_hotel_address.get()
+        donation_date = self.entry_date.get()
+        best_before = self.entry_best_before.get()
+
+        # Validation
+        if not all([food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date]):
+            messagebox.showerror("Error", "All fields are required!")
+            return
+
+        try:
+            donation_fields.parse_best_before(best_before, donation_fields.parse_donation(quantity, donation_date)[2])
+        except ValueError as e:
+            messagebox.showerror("Invalid Input", str(e))
+            return
+
+        # Check the orphanage in the directory, then insert on the database worker
+        self.submit_button.config(state="disabled")
+        hotel_phone = self.user["phone"] if self.user else None
+
+        def send():
+            self.db.submit(data_access.submit_donation, food_name, quantity, document_path, document_id,
+                           orphanage_phone, hotel_address, donation_date, hotel_phone, best_before,
+                           on_done=self.on_donation_submitted, on_error=self.on_donation_failed)
+        self.directory.validate(orphanage_phone, send, self.on_unknown_orphanage)
+
+    # The phone is not in the orphanage directory (or, from submit_donation, no longer in users.db)
+    def on_unknown_orphanage(self):
+        self.submit_button.config(state="normal")
+        messagebox.showerror("Error", "No orphanage found with that phone number!")
+
+    def on_donation_submitted(self, orphanage_data):
+        if not orphanage_data:
+            self.on_unknown_orphanage()
+            return
+
+        self.submit_button.config(state="normal")
+        orphanage_name, orphanage_address, orphanage_org = orphanage_data
         messagebox.showinfo("Success", f"Donation submitted to {orphanage_org or orphanage_name} successfully!")
-        clear_fields()
-    except sqlite3.IntegrityError:
-        messagebox.showerror("Error", "Document ID already exists. Use a unique one.")
-
-def open_status_checker():
-    win = tk.Toplevel(root)
-    win.title("Check Donation Status")
-    win.geometry("400x250")
-    win.configure(bg="#f8f9fa")
-
-    tk.Label(win, text="Enter Document ID", font=("Arial", 12), bg="#f8f9fa").pack(pady=15)
-    doc_entry = tk.Entry(win, font=("Arial", 12), width=30)
-    doc_entry.pack(pady=5)
-
-    status_label = tk.Label(win, text="", font=("Arial", 12, "bold"), bg="#f8f9fa", fg="blue")
-    status_label.pack(pady=10)
-
-    def check_status():
-        doc_id = doc_entry.get().strip()
-        if not doc_id:
-            messagebox.showerror("Error", "Please enter a Document ID.")
+        self.clear_fields()
+
+    def on_donation_failed(self, e):
+        self.submit_button.config(state="normal")
+        if isinstance(e, sqlite3.IntegrityError):
+            messagebox.showerror("Error", "Document ID already exists. Use a unique one.")
+        elif isinstance(e, OSError):
+            messagebox.showerror("Document Error", f"Could not store the food testing document: {e}")
+        else:
+            messagebox.showerror("Database Error", str(e))
+
+    # Bulk import from CSV/JSON on a worker of its own, so the form's other
+    # database jobs don't queue behind it; the worker stops when it is done
+    def import_donations(self):
+        path = filedialog.askopenfilename(title="Select Donations File", filetypes=[("CSV Files", ".csv"), ("JSON Files", ".json .jsonl"), ("All Files", ".*")])
+        if not path:
             return
+        self.import_button.config(state="disabled")
+        hotel_phone = self.user["phone"] if self.user else None
+        worker = DBWorker(self.frame.winfo_toplevel())
 
-        donation_cursor.execute("SELECT status FROM food_donations WHERE document_id=?", (doc_id,))
-        result = donation_cursor.fetchone()
+        def finish(callback):
+            def finished(value):
+                worker.stop()
+                if self.frame.winfo_exists():
+                    callback(value)
+            return finished
+        worker.submit(bulk_import.import_file, path, hotel_phone, quiet=True,
+                      on_done=finish(self.on_import_done), on_error=finish(self.on_import_failed))
 
-        if result:
-            status_label.config(text=f"Status: {result[0]}")
+    def on_import_done(self, report):
+        self.import_button.config(state="normal")
+        if report.errors:
+            messagebox.showwarning("Import Finished", report.summary())
         else:
-            messagebox.showerror("Not Found", "No record found for the given Document ID.")
+            messagebox.showinfo("Import Finished", report.summary())
+
+    def on_import_failed(self, e):
+        self.import_button.config(state="normal")
+        messagebox.showerror("Import Failed", str(e))
+
+    def open_status_checker(self):
+        win = tk.Toplevel(self.frame)
+        win.title("Check Donation Status")
+        win.geometry("400x250")
+        win.configure(bg="#f8f9fa")
+
+        tk.Label(win, text="Enter Document ID", font=("Arial", 12), bg="#f8f9fa").pack(pady=15)
+        doc_entry = tk.Entry(win, font=("Arial", 12), width=30)
+        doc_entry.pack(pady=5)
+
+        status_label = tk.Label(win, text="", font=("Arial", 12, "bold"), bg="#f8f9fa", fg="blue")
+        status_label.pack(pady=10)
+
+        @diagnostics.timed("HotelPanel.check_status")
+        def check_status():
+            doc_id = doc_entry.get().strip()
+            if not doc_id:
+                messagebox.showerror("Error", "Please enter a Document ID.")
+                return
+
+            self.db.submit(data_access.donation_status, doc_id, on_done=show_status)
+
+        def show_status(status):
+            if not status_label.winfo_exists():
+                return
+            if status:
+                status_label.config(text=f"Status: {status}")
+            else:
+                messagebox.showerror("Not Found", "No record found for the given Document ID.")
+
+        tk.Button(win, text="Check", font=("Arial", 12), bg="#007bff", fg="white", command=check_status).pack(pady=10)
+
+    # Called by the application shell before the view is replaced
+    def close(self):
+        self.frame.destroy()
+
+
+# Standalone window (the application shell in homepage.py embeds HotelPanel instead)
+def main():
+    migrations.migrate()
+
+    root = tk.Tk()
+    root.title("Hotel - Food Donation Panel")
+    root.geometry("650x600")
+    root.configure(bg="#f8f9fa")
+
+    db = DBWorker(root)
+    HotelPanel(root, db)
 
-    tk.Button(win, text="Check", font=("Arial", 12), bg="#007bff", fg="white", command=check_status).pack(pady=10)
+    def on_closing():
+        db.stop()
+        root.destroy()
 
-# --- Buttons ---
-tk.Button(frame, text="Submit Donation", command=submit_donation, font=("Arial", 12, "bold"), bg="#28a745", fg="white", width=18).grid(row=9, column=0, pady=20)
-tk.Button(frame, text="Check Status", command=open_status_checker, font=("Arial", 12, "bold"), bg="#ffc107", fg="black", width=18).grid(row=9, column=1, pady=20)
-def on_closing():
-    root.destroy()
-    try:
-        subprocess.Popen(["python", "homepage.py"])
-    except Exception as e:
-        print(f"Error launching homepage.py: {e}")
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop()
 
-root.protocol("WM_DELETE_WINDOW", on_closing)
 
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
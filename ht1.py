@@ -1,42 +1,17 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import sqlite3
-import os
+import migrations
+import data_access
+import diagnostics
+import donation_fields
+import orphanage_directory
+from autocomplete import Autocomplete
+from db_worker import DBWorker
 from datetime import datetime
 
-# Database Connection
-conn = sqlite3.connect("hotel_food_donation.db")
-cursor = conn.cursor()
-
-# Drop and recreate tables to apply changes (optional if schema changes)
-cursor.execute("DROP TABLE IF EXISTS food_requests")
-cursor.execute("""
-    CREATE TABLE IF NOT EXISTS food_requests (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        hotel_name TEXT,
-        hotel_address TEXT,
-        food_name TEXT,
-        document TEXT,
-        reference_id TEXT UNIQUE,
-        donation_date TEXT,
-        status TEXT DEFAULT 'Pending'
-    )
-""")
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS food_donations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        food_name TEXT,
-        quantity TEXT,
-        document_path TEXT,
-        document_id TEXT UNIQUE,
-        orphanage_phone TEXT,
-        hotel_address TEXT,
-        donation_date TEXT,
-        status TEXT DEFAULT 'Pending'
-    )
-''')
-conn.commit()
+# Database
+migrations.migrate()
 
 # Function to select food testing document
 def select_file():
@@ -45,36 +20,52 @@ def select_file():
     entry_document_path.insert(0, file_path)
 
 # Function to submit donation request
+@diagnostics.timed("ht1.submit_data")
 def submit_data():
     food_name = entry_food_name.get()
     quantity = entry_quantity.get()
     document_path = entry_document_path.get()
     document_id = entry_document_id.get()
-    orphanage_phone = entry_orphanage_phone.get()
+    orphanage_phone = entry_orphanage_phone.get().strip()  # validated and stored as the directory has it
     hotel_address = entry_hotel_address.get()
     donation_date = entry_date.get()
+    best_before = entry_best_before.get()
     
     if not (food_name and quantity and document_path and document_id and orphanage_phone and hotel_address and donation_date):
         messagebox.showerror("Error", "All fields are required!")
         return
-    
+
     try:
-        cursor.execute('''
-            INSERT INTO food_donations (food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (food_name, quantity, document_path, document_id, orphanage_phone, hotel_address, donation_date))
-        conn.commit()
-
-        cursor.execute('''
-            INSERT INTO food_requests (hotel_name, hotel_address, food_name, document, reference_id, donation_date)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', ("Hotel", hotel_address, food_name, document_path, document_id, donation_date))
-        conn.commit()
-
-        messagebox.showinfo("Success", "Food donation details submitted successfully!")
-        clear_fields()
-    except sqlite3.IntegrityError:
+        donation_fields.parse_best_before(best_before, donation_fields.parse_donation(quantity, donation_date)[2])
+    except ValueError as e:
+        messagebox.showerror("Invalid Input", str(e))
+        return
+    
+    submit_button.config(state="disabled")
+
+    def send():
+        db.submit(data_access.submit_food_request, food_name, quantity, document_path, document_id,
+                  orphanage_phone, hotel_address, donation_date, best_before,
+                  on_done=on_submitted, on_error=on_submit_failed)
+
+    def unknown_orphanage():
+        submit_button.config(state="normal")
+        messagebox.showerror("Error", "No orphanage found with that phone number!")
+    directory.validate(orphanage_phone, send, unknown_orphanage)
+
+def on_submitted(_):
+    submit_button.config(state="normal")
+    messagebox.showinfo("Success", "Food donation details submitted successfully!")
+    clear_fields()
+
+def on_submit_failed(e):
+    submit_button.config(state="normal")
+    if isinstance(e, sqlite3.IntegrityError):
         messagebox.showerror("Error", "Duplicate document ID detected. Please use a unique document ID.")
+    elif isinstance(e, OSError):
+        messagebox.showerror("Document Error", f"Could not store the food testing document: {e}")
+    else:
+        messagebox.showerror("Database Error", str(e))
 
 # Function to check donation status in a new window
 def open_status_page():
@@ -90,17 +81,18 @@ def open_status_page():
     lbl_status = tk.Label(status_window, text="", font=("Arial", 12, "bold"), fg="blue")
     lbl_status.pack(pady=10)
 
+    @diagnostics.timed("ht1.check_status")
     def check_status():
         document_id = entry_status_id.get()
         if not document_id:
             messagebox.showerror("Error", "Enter the Document ID!")
             return
         
-        cursor.execute("SELECT status FROM food_donations WHERE document_id=?", (document_id,))
-        result = cursor.fetchone()
-        
-        if result:
-            lbl_status.config(text=f"Status: {result[0]}")
+        db.submit(data_access.donation_status, document_id, on_done=show_status)
+
+    def show_status(status):
+        if status:
+            lbl_status.config(text=f"Status: {status}")
         else:
             messagebox.showerror("Error", "No record found for the provided Document ID.")
 
@@ -115,11 +107,12 @@ def clear_fields():
     entry_orphanage_phone.delete(0, tk.END)
     entry_hotel_address.delete(0, tk.END)
     entry_date.delete(0, tk.END)
+    entry_best_before.delete(0, tk.END)
 
-# Function to open homepage.py when window is closed
+# Stop the database worker and close the window (the application shell is homepage.py)
 def on_close():
+    db.stop()
     root.destroy()
-    os.system("python homepage.py")
 
 # GUI Layout for Food Donation
 root = tk.Tk()
@@ -128,12 +121,14 @@ root.geometry("600x600")
 root.configure(bg="#f8f9fa")
 root.protocol("WM_DELETE_WINDOW", on_close)
 
+db = DBWorker(root)
+
 frame = tk.Frame(root, padx=20, pady=20, bg="white", relief="ridge", bd=2)
 frame.pack(pady=20)
 
 tk.Label(frame, text="Food Donation Form", font=("Arial", 16, "bold"), fg="#333", bg="white").grid(row=0, column=0, columnspan=3, pady=10)
 
-labels = ["Name of Food:", "Quantity:", "Food Testing Document:", "ID of Document:", "Orphanage Phone No:", "Hotel Address:", "Date of Donation (YYYY-MM-DD):"]
+labels = ["Name of Food:", "Quantity (e.g. 5 kg):", "Food Testing Document:", "ID of Document:", "Orphanage Phone No:", "Hotel Address:", "Date of Donation (YYYY-MM-DD):", "Best Before (optional):"]
 entries = []
 
 for i, label in enumerate(labels):
@@ -147,9 +142,18 @@ for i, label in enumerate(labels):
         entry.grid(row=i+1, column=1, pady=5, padx=5)
         entries.append(entry)
 
-entry_food_name, entry_quantity, entry_document_id, entry_orphanage_phone, entry_hotel_address, entry_date = entries
+entry_food_name, entry_quantity, entry_document_id, entry_orphanage_phone, entry_hotel_address, entry_date, entry_best_before = entries
+# YYYY-MM-DD HH:MM; left empty, the default shelf life applies
+tk.Label(frame, text="YYYY-MM-DD HH:MM", font=("Arial", 9), fg="#666", bg="white").grid(row=len(labels), column=2, sticky="w")
+
+# Orphanage suggestions and submit-time checks (see orphanage_directory.py)
+directory = orphanage_directory.DirectoryCache(db)
+directory.refresh()
+Autocomplete(entry_orphanage_phone, directory.complete)
+entry_orphanage_phone.bind("<FocusIn>", lambda _: directory.refresh(), add="+")
 
-tk.Button(frame, text="Submit", command=submit_data, font=("Arial", 12, "bold"), bg="#28a745", fg="white", width=15).grid(row=9, column=0, pady=15)
+submit_button = tk.Button(frame, text="Submit", command=submit_data, font=("Arial", 12, "bold"), bg="#28a745", fg="white", width=15)
+submit_button.grid(row=9, column=0, pady=15)
 tk.Button(frame, text="Check Status", command=open_status_page, font=("Arial", 12, "bold"), bg="#ffc107", fg="black", width=15).grid(row=9, column=1, pady=15)
 
 root.mainloop()
\ No newline at end of file
@@ -0,0 +1,203 @@
+import argparse
+import csv
+import heapq
+import json
+import math
+import re
+import time
+
+import migrations
+import orphanage_directory
+from db_worker import Connections
+
+# Nearest-orphanage matching.
+# Addresses are geocoded with the local `places` table (place name ->
+# coordinates): the longest place name found among the words of the address
+# wins. Each user's coordinates are stored on the users row the first time,
+# so an address is geocoded once; an address that is not found is remembered
+# in geocode_failed and only tried again once it or the places table changes.
+# Orphanages with coordinates go into a grid
+# index of GRID_CELL_DEGREES cells; a query visits rings of cells around the
+# donation until the k best distances can no longer improve.
+# Usage: python matching.py load-places places.csv     (CSV: name,latitude,longitude)
+#        python matching.py nearest "hotel address" [-k 5]
+
+GRID_CELL_DEGREES = 0.1  # about 11 km north-south
+EARTH_RADIUS_KM = 6371.0
+MAX_PLACE_WORDS = 3
+
+
+def normalize(text):
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+
+# Every run of 1..MAX_PLACE_WORDS words of the address, as place-name keys
+def place_candidates(address):
+    words = normalize(address).split()
+    return {" ".join(words[i:i + n]) for n in range(1, MAX_PLACE_WORDS + 1) for i in range(len(words) - n + 1)}
+
+
+# (latitude, longitude) for an address, or None when no place name matches
+def geocode(conn, address):
+    candidates = place_candidates(address)
+    if not candidates:
+        return None
+    rows = conn.execute("""
+        SELECT name, latitude, longitude FROM places
+        WHERE name IN (SELECT value FROM json_each(?))
+    """, (json.dumps(sorted(candidates)),)).fetchall()
+    if not rows:
+        return None
+    name, latitude, longitude = max(rows, key=lambda row: (len(row[0].split()), len(row[0])))
+    return latitude, longitude
+
+
+# Store coordinates for users whose address has not been geocoded or tried
+# yet; returns how many were located
+def geocode_users(db, role="Orphanage"):
+    conn = db.users
+    pending = conn.execute("""
+        SELECT id, address FROM users
+        WHERE role = ? AND latitude IS NULL AND address IS NOT geocode_failed
+    """, (role,)).fetchall()
+    located, failed = [], []
+    for user_id, address in pending:
+        point = geocode(conn, address)
+        if point is None:
+            failed.append((address, user_id))
+        else:
+            located.append((point[0], point[1], user_id))
+    with conn:
+        conn.executemany("UPDATE users SET latitude = ?, longitude = ?, geocode_failed = NULL WHERE id = ?", located)
+        conn.executemany("UPDATE users SET geocode_failed = ? WHERE id = ?", failed)
+    return len(located)
+
+
+def load_places(db, path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = [(normalize(row["name"]), float(row["latitude"]), float(row["longitude"])) for row in csv.DictReader(f)]
+    with db.users:
+        db.users.executemany("INSERT OR REPLACE INTO places (name, latitude, longitude) VALUES (?, ?, ?)", rows)
+        # New place names may locate addresses that failed before
+        db.users.execute("UPDATE users SET geocode_failed = NULL WHERE geocode_failed IS NOT NULL")
+    return len(rows)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    # points: iterable of (latitude, longitude, item)
+    def __init__(self, points, cell_degrees=GRID_CELL_DEGREES):
+        self.cell = cell_degrees
+        self.cells = {}
+        self.size = 0
+        for latitude, longitude, item in points:
+            self.cells.setdefault(self._key(latitude, longitude), []).append((latitude, longitude, item))
+            self.size += 1
+        if self.cells:
+            rows = [key[0] for key in self.cells]
+            cols = [key[1] for key in self.cells]
+            self.bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def _key(self, latitude, longitude):
+        return int(math.floor(latitude / self.cell)), int(math.floor(longitude / self.cell))
+
+    # [(distance km, item)] for the k nearest points, nearest first
+    def nearest(self, latitude, longitude, k=5):
+        if not self.cells or k <= 0:
+            return []
+        row, col = self._key(latitude, longitude)
+        min_row, max_row, min_col, max_col = self.bounds
+        max_ring = max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+        # Lower bound on the distance to any cell outside ring r: r whole cells
+        # north-south, and east-west at the widest latitude the ring can reach
+        km_per_cell = math.radians(self.cell) * EARTH_RADIUS_KM
+        best = []  # max-heap of (-distance, tiebreak, item)
+        for ring in range(max_ring + 1):
+            for cell in self._ring(row, col, ring):
+                for lat, lon, item in self.cells.get(cell, ()):
+                    distance = haversine_km(latitude, longitude, lat, lon)
+                    entry = (-distance, id(item), item)
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, entry)
+            if len(best) == k:
+                widest = min(89.9, abs(latitude) + (ring + 1) * self.cell)
+                bound = ring * km_per_cell * min(1.0, math.cos(math.radians(widest)))
+                if bound >= -best[0][0]:
+                    break
+        return [(-distance, item) for distance, _, item in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _ring(row, col, ring):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
+
+
+# Orphanage row used as the grid item: (id, name, organization, phone, address).
+# Returns None when users.db is unchanged since `version`, else
+# (version, GridIndex); see orphanage_directory.users_version.
+def orphanage_index(db, version=None):
+    geocode_users(db)
+    current = orphanage_directory.users_version(db)
+    if current == version:
+        return None
+    rows = db.users.execute("""
+        SELECT id, name, organization_name, phone, address, latitude, longitude FROM users
+        WHERE role = 'Orphanage' AND latitude IS NOT NULL
+    """).fetchall()
+    return current, GridIndex((row[5], row[6], row[:5]) for row in rows)
+
+
+# Top-k orphanages for a donation's hotel address: [(distance km, orphanage row)].
+# Returns None when the address cannot be geocoded.
+def nearest_orphanages(db, hotel_address, k=5, index=None):
+    point = geocode(db.users, hotel_address)
+    if point is None:
+        return None
+    index = index or orphanage_index(db)[1]
+    return index.nearest(point[0], point[1], k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest-orphanage matching")
+    sub = parser.add_subparsers(dest="command", required=True)
+    load = sub.add_parser("load-places", help="import a name,latitude,longitude CSV into the places table")
+    load.add_argument("path")
+    near = sub.add_parser("nearest", help="list the orphanages nearest to an address")
+    near.add_argument("address")
+    near.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    migrations.migrate()
+    db = Connections()
+    try:
+        if args.command == "load-places":
+            print(f"loaded {load_places(db, args.path)} place(s), geocoded {geocode_users(db)} orphanage(s)")
+            return
+        start = time.perf_counter()
+        matches = nearest_orphanages(db, args.address, args.k)
+        if matches is None:
+            print("address not found in the places table")
+            return
+        for distance, (_, name, organization, phone, address) in matches:
+            print(f"{distance:8.2f} km  {organization or name}  {phone}  {address}")
+        print(f"({(time.perf_counter() - start) * 1000:.2f} ms)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,698 @@
+from contextlib import closing
+
+import database
+import donation_fields
+
+USERS_DB = "users.db"
+DONATIONS_DB = "hotel_food_donation.db"
+USERS_SCHEMA = "accounts"  # users.db as attached to a donations connection
+
+BACKFILL_CHUNK = 5000
+# Error raised (as sqlite3.IntegrityError) for a document id already archived
+ARCHIVED_DOCUMENT_ID = "UNIQUE constraint failed: food_donations_archive.document_id"
+
+
+# (day, hotel, orphanage_phone, status) of a food_donations row for
+# donation_daily_stats. A hotel is identified by its phone when the donation
+# was submitted from a logged-in session, otherwise by its address.
+def stats_key(row):
+    return (f"COALESCE(date({row}.donation_ts, 'unixepoch'), ''), "
+            f"COALESCE({row}.hotel_phone, {row}.hotel_address, ''), "
+            f"COALESCE({row}.orphanage_phone, ''), COALESCE({row}.status, '')")
+
+
+# Trigger statement adding `delta` to the count for the `row` (new/old) key
+def stats_delta(row, delta):
+    return f"""
+            INSERT INTO donation_daily_stats (day, hotel, orphanage_phone, status, donations)
+            VALUES ({stats_key(row)}, {delta})
+            ON CONFLICT (day, hotel, orphanage_phone, status) DO UPDATE SET donations = donations + excluded.donations;"""
+
+
+# Trigger statement dropping the `row` key's entry once its count reaches zero
+def stats_cleanup(row):
+    return f"""
+            DELETE FROM donation_daily_stats
+            WHERE (day, hotel, orphanage_phone, status) = ({stats_key(row)}) AND donations = 0;"""
+
+
+# Rollups read by the admin Analytics tab (data_access.analytics), one per
+# chart and only as fine as the chart: (table, {key column: expression},
+# {counter column: expression}) for a `row` (new/old, or a SELECT alias).
+# Weeks are keyed by their Monday.
+def rollups(row):
+    day = f"COALESCE(date({row}.donation_ts, 'unixepoch'), '')"
+    week = f"COALESCE(date({row}.donation_ts, 'unixepoch', '-6 days', 'weekday 1'), '')"
+    hotel = f"COALESCE({row}.hotel_phone, {row}.hotel_address, '')"
+    orphanage = f"COALESCE({row}.orphanage_phone, '')"
+    by_status = {status.lower(): f"({row}.status IS '{status}')"
+                 for status in ("Pending", "Accepted", "Rejected", "Expired")}
+    return [
+        ("donation_status_daily", {"day": day, "status": f"COALESCE({row}.status, '')"}, {"donations": "1"}),
+        ("donation_hotel_weekly", {"week": week, "hotel": hotel},
+         {"donations": "1", "accepted": by_status["accepted"]}),
+        ("donation_orphanage_weekly", {"week": week, "orphanage_phone": orphanage}, {"donations": "1", **by_status}),
+        ("donation_orphanage_totals", {"orphanage_phone": orphanage}, {"donations": "1", **by_status}),
+    ]
+
+
+# Trigger statements adding the `row` (new/old) donation to every rollup with
+# `sign` 1 or -1
+def rollup_delta(row, sign):
+    statements = []
+    for table, keys, counters in rollups(row):
+        values = ", ".join([*keys.values(), *(f"{sign} * {expr}" for expr in counters.values())])
+        updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in counters)
+        statements.append(f"""
+            INSERT INTO {table} ({", ".join([*keys, *counters])}) VALUES ({values})
+            ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {updates};""")
+    return "".join(statements)
+
+
+# Trigger statements dropping the `row` donation's rollup entries once empty
+def rollup_cleanup(row):
+    return "".join(f"""
+            DELETE FROM {table} WHERE ({", ".join(keys)}) = ({", ".join(keys.values())}) AND donations = 0;"""
+                   for table, keys, _ in rollups(row))
+
+
+# SELECT computing `table` from scratch over live and archived donations
+def rollup_query(table):
+    _, keys, counters = next(rollup for rollup in rollups("d") if rollup[0] == table)
+    columns = "donation_ts, hotel_phone, hotel_address, orphanage_phone, status"
+    return f"""
+        SELECT {", ".join(keys.values())}, {", ".join(f"SUM({expr})" for expr in counters.values())}
+        FROM (SELECT {columns} FROM food_donations UNION ALL SELECT {columns} FROM food_donations_archive) AS d
+        GROUP BY {", ".join(str(i + 1) for i in range(len(keys)))}"""
+
+
+# Recompute every rollup (after the version 12 migration, or a bulk load that
+# bypassed the triggers)
+def rebuild_rollups(conn):
+    for table, keys, counters in rollups("d"):
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"INSERT INTO {table} ({', '.join([*keys, *counters])}) {rollup_query(table)}")
+
+
+# Per-row insert triggers of food_donations. A bulk insert may drop them
+# inside its transaction, insert, call catch_up_inserts() and recreate them;
+# the archived document id check (version 13) is then the caller's job.
+INSERT_TRIGGERS = ("food_donations_fts_insert", "donation_rollups_insert", "food_donations_archived_document_id")
+
+
+# Do the work of the insert triggers for every donation with id > `after_id`,
+# one set-based statement per derived table
+def catch_up_inserts(conn, after_id):
+    conn.execute("""
+        INSERT INTO food_donations_fts (rowid, food_name, quantity, document_id, orphanage_phone, hotel_address, status)
+        SELECT id, food_name, quantity, document_id, orphanage_phone, hotel_address, status
+        FROM food_donations WHERE id > ?
+    """, (after_id,))
+    for table, keys, counters in rollups("d"):
+        conn.execute(f"""
+            INSERT INTO {table} ({", ".join([*keys, *counters])})
+            SELECT {", ".join(keys.values())}, {", ".join(f"SUM({expr})" for expr in counters.values())}
+            FROM food_donations AS d WHERE d.id > ?
+            GROUP BY {", ".join(str(i + 1) for i in range(len(keys)))}
+            ON CONFLICT ({", ".join(keys)}) DO UPDATE SET
+                {", ".join(f"{column} = {column} + excluded.{column}" for column in counters)}
+        """, (after_id,))
+
+
+CHANGE_LOG_KEEP = 10000
+CHANGE_LOG_TRIM = f"DELETE FROM donation_changes WHERE id <= (SELECT MAX(id) FROM donation_changes) - {CHANGE_LOG_KEEP};"
+
+
+# --- Schema migrations ---
+# Each database keeps its schema version in PRAGMA user_version. A migration is
+# (version, steps) where a step is either an SQL string or a callable taking the
+# connection. Never edit a released migration; append a new version instead.
+
+USERS_MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            phone TEXT NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL,
+            address TEXT,
+            organization_name TEXT
+        )
+        """,
+    ]),
+    (2, [
+        # hotel.submit_donation: WHERE phone = ? AND role = 'Orphanage'
+        "CREATE INDEX IF NOT EXISTS idx_users_phone_role ON users (phone, role)",
+    ]),
+    (3, [
+        # Full-text index for AdminPanel.search_user, kept in sync by triggers
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            name, email, phone, role, address, organization_name,
+            content='users', content_rowid='id', prefix='2 3 4'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts (rowid, name, email, phone, role, address, organization_name)
+            VALUES (new.id, new.name, new.email, new.phone, new.role, new.address, new.organization_name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, email, phone, role, address, organization_name)
+            VALUES ('delete', old.id, old.name, old.email, old.phone, old.role, old.address, old.organization_name);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, email, phone, role, address, organization_name)
+            VALUES ('delete', old.id, old.name, old.email, old.phone, old.role, old.address, old.organization_name);
+            INSERT INTO users_fts (rowid, name, email, phone, role, address, organization_name)
+            VALUES (new.id, new.name, new.email, new.phone, new.role, new.address, new.organization_name);
+        END
+        """,
+        "INSERT INTO users_fts (users_fts) VALUES ('rebuild')",
+    ]),
+    (4, [
+        # Local geocoding table (place name -> coordinates) and the cached
+        # coordinates of each user's address, used by matching.py
+        """
+        CREATE TABLE IF NOT EXISTS places (
+            name TEXT PRIMARY KEY,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "ALTER TABLE users ADD COLUMN latitude REAL",
+        "ALTER TABLE users ADD COLUMN longitude REAL",
+        # Storing coordinates must not rewrite the full-text entry
+        "DROP TRIGGER IF EXISTS users_fts_update",
+        """
+        CREATE TRIGGER users_fts_update
+        AFTER UPDATE OF name, email, phone, role, address, organization_name ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, email, phone, role, address, organization_name)
+            VALUES ('delete', old.id, old.name, old.email, old.phone, old.role, old.address, old.organization_name);
+            INSERT INTO users_fts (rowid, name, email, phone, role, address, organization_name)
+            VALUES (new.id, new.name, new.email, new.phone, new.role, new.address, new.organization_name);
+        END
+        """,
+        # A changed address is geocoded again
+        """
+        CREATE TRIGGER IF NOT EXISTS users_address_moved
+        AFTER UPDATE OF address ON users WHEN new.address IS NOT old.address BEGIN
+            UPDATE users SET latitude = NULL, longitude = NULL WHERE id = new.id;
+        END
+        """,
+    ]),
+    (5, [
+        # The address matching.geocode_users could not locate; it is tried
+        # again only once the address (or the places table) changes
+        "ALTER TABLE users ADD COLUMN geocode_failed TEXT",
+    ]),
+]
+
+DONATIONS_MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS food_donations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            food_name TEXT,
+            quantity TEXT,
+            document_path TEXT,
+            document_id TEXT UNIQUE,
+            orphanage_phone TEXT,
+            hotel_address TEXT,
+            donation_date TEXT,
+            status TEXT DEFAULT 'Pending'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS food_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hotel_name TEXT,
+            hotel_address TEXT,
+            food_name TEXT,
+            document TEXT,
+            reference_id TEXT UNIQUE,
+            donation_date TEXT,
+            status TEXT DEFAULT 'Pending'
+        )
+        """,
+    ]),
+    (2, [
+        # orphanage.load_donations: WHERE status = 'Pending' AND orphanage_phone = ?
+        "CREATE INDEX IF NOT EXISTS idx_donations_orphanage_status ON food_donations (orphanage_phone, status)",
+        "CREATE INDEX IF NOT EXISTS idx_donations_date ON food_donations (donation_date)",
+    ]),
+    (3, [
+        # Full-text index for AdminPanel.search_food, kept in sync by triggers
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS food_donations_fts USING fts5(
+            food_name, quantity, document_id, orphanage_phone, hotel_address, status,
+            content='food_donations', content_rowid='id', prefix='2 3 4'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS food_donations_fts_insert AFTER INSERT ON food_donations BEGIN
+            INSERT INTO food_donations_fts (rowid, food_name, quantity, document_id, orphanage_phone, hotel_address, status)
+            VALUES (new.id, new.food_name, new.quantity, new.document_id, new.orphanage_phone, new.hotel_address, new.status);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS food_donations_fts_delete AFTER DELETE ON food_donations BEGIN
+            INSERT INTO food_donations_fts (food_donations_fts, rowid, food_name, quantity, document_id, orphanage_phone, hotel_address, status)
+            VALUES ('delete', old.id, old.food_name, old.quantity, old.document_id, old.orphanage_phone, old.hotel_address, old.status);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS food_donations_fts_update AFTER UPDATE ON food_donations BEGIN
+            INSERT INTO food_donations_fts (food_donations_fts, rowid, food_name, quantity, document_id, orphanage_phone, hotel_address, status)
+            VALUES ('delete', old.id, old.food_name, old.quantity, old.document_id, old.orphanage_phone, old.hotel_address, old.status);
+            INSERT INTO food_donations_fts (rowid, food_name, quantity, document_id, orphanage_phone, hotel_address, status)
+            VALUES (new.id, new.food_name, new.quantity, new.document_id, new.orphanage_phone, new.hotel_address, new.status);
+        END
+        """,
+        "INSERT INTO food_donations_fts (food_donations_fts) VALUES ('rebuild')",
+    ]),
+    (4, [
+        # SMS outbox drained by notifications.SMSDispatcher
+        "ALTER TABLE food_donations ADD COLUMN hotel_phone TEXT",
+        """
+        CREATE TABLE IF NOT EXISTS sms_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_phone TEXT NOT NULL,
+            body TEXT NOT NULL,
+            dedupe_key TEXT UNIQUE,
+            status TEXT NOT NULL DEFAULT 'Queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sms_outbox_due ON sms_outbox (status, next_attempt_at)",
+    ]),
+    (5, [
+        # Only re-index full text when an indexed column changes, not on every
+        # update (the backfill below and the typed columns would otherwise
+        # rewrite the FTS entry of every row)
+        "DROP TRIGGER IF EXISTS food_donations_fts_update",
+        """
+        CREATE TRIGGER food_donations_fts_update
+        AFTER UPDATE OF food_name, quantity, document_id, orphanage_phone, hotel_address, status ON food_donations BEGIN
+            INSERT INTO food_donations_fts (food_donations_fts, rowid, food_name, quantity, document_id, orphanage_phone, hotel_address, status)
+            VALUES ('delete', old.id, old.food_name, old.quantity, old.document_id, old.orphanage_phone, old.hotel_address, old.status);
+            INSERT INTO food_donations_fts (rowid, food_name, quantity, document_id, orphanage_phone, hotel_address, status)
+            VALUES (new.id, new.food_name, new.quantity, new.document_id, new.orphanage_phone, new.hotel_address, new.status);
+        END
+        """,
+        # Typed quantity and date (see donation_fields.py)
+        "ALTER TABLE food_donations ADD COLUMN quantity_value REAL",
+        "ALTER TABLE food_donations ADD COLUMN quantity_unit TEXT",
+        "ALTER TABLE food_donations ADD COLUMN donation_ts INTEGER",
+        lambda conn: backfill_typed_columns(conn),
+        # Date ranges and per-unit totals are answered from this index alone
+        "CREATE INDEX IF NOT EXISTS idx_donations_ts_unit ON food_donations (donation_ts, quantity_unit, quantity_value)",
+    ]),
+    (6, [
+        # Daily donation counts by hotel, orphanage and status for the admin
+        # Analytics tab, kept up to date by the triggers below
+        """
+        CREATE TABLE IF NOT EXISTS donation_daily_stats (
+            day TEXT NOT NULL,
+            hotel TEXT NOT NULL,
+            orphanage_phone TEXT NOT NULL,
+            status TEXT NOT NULL,
+            donations INTEGER NOT NULL,
+            PRIMARY KEY (day, hotel, orphanage_phone, status)
+        ) WITHOUT ROWID
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_daily_stats_insert AFTER INSERT ON food_donations BEGIN
+            {stats_delta("new", 1)}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_daily_stats_delete AFTER DELETE ON food_donations BEGIN
+            {stats_delta("old", -1)}
+            {stats_cleanup("old")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_daily_stats_update
+        AFTER UPDATE OF status, donation_ts, hotel_phone, hotel_address, orphanage_phone ON food_donations BEGIN
+            {stats_delta("old", -1)}
+            {stats_delta("new", 1)}
+            {stats_cleanup("old")}
+        END
+        """,
+        f"""
+        INSERT INTO donation_daily_stats (day, hotel, orphanage_phone, status, donations)
+        SELECT {stats_key("food_donations")}, COUNT(*) FROM food_donations GROUP BY 1, 2, 3, 4
+        """,
+    ]),
+    (7, [
+        # Change log read by the orphanage panel's live refresh: one entry per
+        # status change, reassignment or delete, for each affected orphanage.
+        # Only the newest CHANGE_LOG_KEEP entries are kept.
+        """
+        CREATE TABLE IF NOT EXISTS donation_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            donation_id INTEGER NOT NULL,
+            orphanage_phone TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_donation_changes_orphanage ON donation_changes (orphanage_phone, id)",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_changes_update
+        AFTER UPDATE OF status, orphanage_phone ON food_donations BEGIN
+            INSERT INTO donation_changes (donation_id, orphanage_phone) VALUES (old.id, old.orphanage_phone);
+            INSERT INTO donation_changes (donation_id, orphanage_phone)
+            SELECT new.id, new.orphanage_phone WHERE new.orphanage_phone IS NOT old.orphanage_phone;
+            {CHANGE_LOG_TRIM}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_changes_delete AFTER DELETE ON food_donations BEGIN
+            INSERT INTO donation_changes (donation_id, orphanage_phone) VALUES (old.id, old.orphanage_phone);
+            {CHANGE_LOG_TRIM}
+        END
+        """,
+    ]),
+    (8, [
+        # Donations reference the orphanage and hotel users by id. users.db is
+        # attached, so SQLite cannot enforce these as foreign keys; the insert
+        # resolves them from the phones (data_access.DONATION_INSERT).
+        "ALTER TABLE food_donations ADD COLUMN orphanage_id INTEGER",
+        "ALTER TABLE food_donations ADD COLUMN hotel_id INTEGER",
+        lambda conn: link_donation_users(conn),
+    ]),
+    (9, [
+        # SHA-256 of the document in document_store; older rows keep only document_path
+        "ALTER TABLE food_donations ADD COLUMN document_digest TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_donations_document_digest ON food_donations (document_digest)",
+    ]),
+    (10, [
+        # Best-before deadline (epoch seconds, see donation_fields.parse_best_before).
+        # Existing rows get the default shelf life from the local start of their
+        # donation day ('utc' reads the date as local time), or from now when
+        # the date could not be parsed.
+        "ALTER TABLE food_donations ADD COLUMN best_before_ts INTEGER",
+        f"""
+        UPDATE food_donations SET best_before_ts =
+            COALESCE(CAST(strftime('%s', date(donation_ts, 'unixepoch'), 'utc') AS INTEGER),
+                     CAST(strftime('%s', 'now') AS INTEGER)) + {donation_fields.DEFAULT_SHELF_LIFE_HOURS * 3600}
+        """,
+        # Only pending donations are scheduled, so the deadline indexes cover
+        # just the pending set: the orphanage view reads it in deadline order
+        # and expiry.py takes the earliest deadlines first
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_pending_orphanage
+        ON food_donations (orphanage_phone, best_before_ts) WHERE status = 'Pending'
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_pending_deadline
+        ON food_donations (best_before_ts) WHERE status = 'Pending'
+        """,
+    ]),
+    (11, [
+        # Completed donations older than archive.ARCHIVE_AFTER_DAYS are moved
+        # here by archive.py, keeping their ids (food_donations uses
+        # AUTOINCREMENT, so ids are never reused). Only history views read it.
+        """
+        CREATE TABLE IF NOT EXISTS food_donations_archive (
+            id INTEGER PRIMARY KEY,
+            food_name TEXT,
+            quantity TEXT,
+            document_path TEXT,
+            document_id TEXT,
+            orphanage_phone TEXT,
+            hotel_address TEXT,
+            donation_date TEXT,
+            status TEXT,
+            hotel_phone TEXT,
+            quantity_value REAL,
+            quantity_unit TEXT,
+            donation_ts INTEGER,
+            orphanage_id INTEGER,
+            hotel_id INTEGER,
+            document_digest TEXT,
+            best_before_ts INTEGER,
+            archived_at INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_archive_orphanage ON food_donations_archive (orphanage_phone, id)",
+        "CREATE INDEX IF NOT EXISTS idx_archive_document_id ON food_donations_archive (document_id)",
+        # Same full-text columns as food_donations_fts; archived rows are never updated
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS food_donations_archive_fts USING fts5(
+            food_name, quantity, document_id, orphanage_phone, hotel_address, status,
+            content='food_donations_archive', content_rowid='id', prefix='2 3 4'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS food_donations_archive_fts_insert AFTER INSERT ON food_donations_archive BEGIN
+            INSERT INTO food_donations_archive_fts (rowid, food_name, quantity, document_id, orphanage_phone, hotel_address, status)
+            VALUES (new.id, new.food_name, new.quantity, new.document_id, new.orphanage_phone, new.hotel_address, new.status);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS food_donations_archive_fts_delete AFTER DELETE ON food_donations_archive BEGIN
+            INSERT INTO food_donations_archive_fts (food_donations_archive_fts, rowid, food_name, quantity, document_id,
+                orphanage_phone, hotel_address, status)
+            VALUES ('delete', old.id, old.food_name, old.quantity, old.document_id, old.orphanage_phone, old.hotel_address, old.status);
+        END
+        """,
+        # donation_daily_stats keeps counting archived donations: the move
+        # subtracts them through the food_donations delete trigger and adds
+        # them back here
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_daily_stats_archive_insert AFTER INSERT ON food_donations_archive BEGIN
+            {stats_delta("new", 1)}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_daily_stats_archive_delete AFTER DELETE ON food_donations_archive BEGIN
+            {stats_delta("old", -1)}
+            {stats_cleanup("old")}
+        END
+        """,
+    ]),
+    (12, [
+        # donation_daily_stats was keyed so finely (day, hotel, orphanage and
+        # status) that it held about one row per donation; replaced by one
+        # coarse rollup per Analytics chart (see rollups() above)
+        "DROP TRIGGER IF EXISTS donation_daily_stats_insert",
+        "DROP TRIGGER IF EXISTS donation_daily_stats_delete",
+        "DROP TRIGGER IF EXISTS donation_daily_stats_update",
+        "DROP TRIGGER IF EXISTS donation_daily_stats_archive_insert",
+        "DROP TRIGGER IF EXISTS donation_daily_stats_archive_delete",
+        "DROP TABLE IF EXISTS donation_daily_stats",
+        """
+        CREATE TABLE IF NOT EXISTS donation_status_daily (
+            day TEXT NOT NULL,
+            status TEXT NOT NULL,
+            donations INTEGER NOT NULL,
+            PRIMARY KEY (day, status)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS donation_hotel_weekly (
+            week TEXT NOT NULL,
+            hotel TEXT NOT NULL,
+            donations INTEGER NOT NULL,
+            accepted INTEGER NOT NULL,
+            PRIMARY KEY (week, hotel)
+        ) WITHOUT ROWID
+        """,
+        # Busiest hotels of the latest weeks first
+        "CREATE INDEX IF NOT EXISTS idx_hotel_weekly_donations ON donation_hotel_weekly (week, donations)",
+        """
+        CREATE TABLE IF NOT EXISTS donation_orphanage_weekly (
+            week TEXT NOT NULL,
+            orphanage_phone TEXT NOT NULL,
+            donations INTEGER NOT NULL,
+            pending INTEGER NOT NULL,
+            accepted INTEGER NOT NULL,
+            rejected INTEGER NOT NULL,
+            expired INTEGER NOT NULL,
+            PRIMARY KEY (week, orphanage_phone)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS donation_orphanage_totals (
+            orphanage_phone TEXT PRIMARY KEY,
+            donations INTEGER NOT NULL,
+            pending INTEGER NOT NULL,
+            accepted INTEGER NOT NULL,
+            rejected INTEGER NOT NULL,
+            expired INTEGER NOT NULL
+        ) WITHOUT ROWID
+        """,
+        # Orphanages with the most donations first
+        "CREATE INDEX IF NOT EXISTS idx_orphanage_totals_donations ON donation_orphanage_totals (donations)",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_rollups_insert AFTER INSERT ON food_donations BEGIN
+            {rollup_delta("new", 1)}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_rollups_delete AFTER DELETE ON food_donations BEGIN
+            {rollup_delta("old", -1)}
+            {rollup_cleanup("old")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_rollups_update
+        AFTER UPDATE OF status, donation_ts, hotel_phone, hotel_address, orphanage_phone ON food_donations BEGIN
+            {rollup_delta("old", -1)}
+            {rollup_delta("new", 1)}
+            {rollup_cleanup("old")}
+        END
+        """,
+        # Archived donations keep counting: the move subtracts them through the
+        # food_donations delete trigger and adds them back here
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_rollups_archive_insert AFTER INSERT ON food_donations_archive BEGIN
+            {rollup_delta("new", 1)}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS donation_rollups_archive_delete AFTER DELETE ON food_donations_archive BEGIN
+            {rollup_delta("old", -1)}
+            {rollup_cleanup("old")}
+        END
+        """,
+        lambda conn: rebuild_rollups(conn),
+    ]),
+    (13, [
+        # Document ids stay unique across live and archived donations
+        # (donation_status and the SMS dedupe keys look them up by id); the
+        # UNIQUE constraint on food_donations only covers live rows
+        f"""
+        CREATE TRIGGER IF NOT EXISTS food_donations_archived_document_id BEFORE INSERT ON food_donations
+        WHEN EXISTS (SELECT 1 FROM food_donations_archive WHERE document_id = new.document_id) BEGIN
+            SELECT RAISE(ABORT, '{ARCHIVED_DOCUMENT_ID}');
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS food_donations_archived_document_id_update
+        BEFORE UPDATE OF document_id ON food_donations
+        WHEN EXISTS (SELECT 1 FROM food_donations_archive WHERE document_id = new.document_id) BEGIN
+            SELECT RAISE(ABORT, '{ARCHIVED_DOCUMENT_ID}');
+        END
+        """,
+    ]),
+    (14, [
+        # Which dispatcher claimed a 'Sending' message and when, so recovery
+        # only requeues claims old enough to belong to a dispatcher that died
+        # (see notifications.CLAIM_TIMEOUT)
+        "ALTER TABLE sms_outbox ADD COLUMN claimed_by TEXT",
+        "ALTER TABLE sms_outbox ADD COLUMN claimed_at REAL",
+    ]),
+]
+
+
+# Parse quantity/date of existing rows in id-ordered chunks. Runs inside the
+# migration transaction; rows that cannot be parsed keep NULL typed columns.
+def backfill_typed_columns(conn, chunk_size=BACKFILL_CHUNK):
+    last_id = 0
+    while True:
+        rows = conn.execute("""
+            SELECT id, quantity, donation_date FROM food_donations
+            WHERE id > ? ORDER BY id LIMIT ?
+        """, (last_id, chunk_size)).fetchall()
+        if not rows:
+            return
+        updates = []
+        for donation_id, quantity, donation_date in rows:
+            try:
+                value, unit = donation_fields.parse_quantity(quantity)
+            except ValueError:
+                value, unit = None, None
+            try:
+                donation_date, timestamp = donation_fields.parse_date(donation_date)
+            except ValueError:
+                timestamp = None
+            updates.append((value, unit, donation_date, timestamp, donation_id))
+        conn.executemany("""
+            UPDATE food_donations SET quantity_value=?, quantity_unit=?, donation_date=?, donation_ts=?
+            WHERE id=?
+        """, updates)
+        last_id = rows[-1][0]
+
+
+# Fill orphanage_id / hotel_id from the copied phone numbers. Needs users.db
+# attached; scratch databases without it keep NULL ids.
+def link_donation_users(conn):
+    if not database.is_attached(conn, USERS_SCHEMA):
+        return
+    conn.execute(f"""
+        UPDATE food_donations SET
+            orphanage_id = (SELECT MIN(id) FROM {USERS_SCHEMA}.users
+                            WHERE phone = food_donations.orphanage_phone AND role = 'Orphanage'),
+            hotel_id = (SELECT MIN(id) FROM {USERS_SCHEMA}.users
+                        WHERE phone = food_donations.hotel_phone AND role = 'Hotel')
+    """)
+
+
+# Attach users.db to a donations connection so users and donations can be
+# joined on one connection
+def attach_users(conn, users_db=USERS_DB):
+    return database.attach(conn, USERS_SCHEMA, users_db)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# Apply every migration newer than the database's user_version in one transaction
+def apply_migrations(conn, migrations):
+    current = schema_version(conn)
+    pending = [(version, steps) for version, steps in migrations if version > current]
+    if not pending:
+        return current
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have migrated while we waited for the write lock
+        current = schema_version(conn)
+        for version, steps in pending:
+            if version <= current:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            current = version
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    # Refresh planner statistics so the new indexes are picked up
+    conn.execute("ANALYZE")
+    conn.commit()
+    return current
+
+
+# Bring both databases up to date; every entry point calls this once at startup
+def migrate(users_db=USERS_DB, donations_db=DONATIONS_DB):
+    with closing(database.connect(users_db)) as conn:
+        apply_migrations(conn, USERS_MIGRATIONS)
+    with closing(attach_users(database.connect(donations_db), users_db)) as conn:
+        apply_migrations(conn, DONATIONS_MIGRATIONS)
+
+
+if __name__ == "__main__":
+    migrate()
+    for path in (USERS_DB, DONATIONS_DB):
+        with closing(database.connect(path)) as conn:
+            print(f"{path}: schema version {schema_version(conn)}")
@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import migrations
+
+# SMS notifications through a persistent outbox.
+# Donation events insert a row into sms_outbox in the same transaction as the
+# donation change (enqueue_sms). SMSDispatcher drains the outbox on a
+# background thread: it claims due messages in batches, sends them through a
+# pluggable transport with bounded concurrency, and retries failures with
+# exponential backoff. A dedupe key makes enqueueing the same event twice a
+# no-op. Every process runs a dispatcher on the same outbox: a claim records
+# the dispatcher and the time, and only claims older than CLAIM_TIMEOUT (the
+# dispatcher died mid-batch) are put back in the queue.
+
+# Twilio Credentials (Use your own credentials here)
+TWILIO_ACCOUNT_SID = 'your_twilio_account_sid'
+TWILIO_AUTH_TOKEN = 'your_twilio_auth_token'
+TWILIO_PHONE_NUMBER = 'your_twilio_phone_number'  # This is the phone number you use to send SMS
+
+SMS_LOG = "sms_outbox.log"  # used by FileTransport
+
+BATCH_SIZE = 50
+CONCURRENCY = 4
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2.0  # seconds; retry n waits BACKOFF_BASE * 2**(n-1), plus jitter
+BACKOFF_MAX = 300.0
+POLL_INTERVAL = 2.0
+CLAIM_TIMEOUT = 300.0  # seconds; far longer than sending one batch takes
+
+
+# Queue a message; `conn` may be inside the caller's transaction.
+# Returns False when a message with the same dedupe_key already exists.
+def enqueue_sms(conn, to_phone, body, dedupe_key=None):
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO sms_outbox (to_phone, body, dedupe_key, created_at) VALUES (?, ?, ?, ?)",
+        (to_phone, body, dedupe_key, time.time()))
+    return cursor.rowcount == 1
+
+
+# --- Transports ---
+
+class TwilioTransport:
+    def __init__(self, account_sid=TWILIO_ACCOUNT_SID, auth_token=TWILIO_AUTH_TOKEN, from_phone=TWILIO_PHONE_NUMBER):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_phone = from_phone
+        self._client = None
+        self._lock = threading.Lock()
+
+    # One client for the life of the dispatcher
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from twilio.rest import Client  # Twilio client for sending SMS
+                self._client = Client(self.account_sid, self.auth_token)
+            return self._client
+
+    def send(self, to_phone, body):
+        self.client().messages.create(body=body, from_=self.from_phone, to=to_phone)
+
+
+# Appends every message to a JSON-lines file instead of sending it
+class FileTransport:
+    def __init__(self, path=SMS_LOG):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, to_phone, body):
+        line = json.dumps({"to": to_phone, "body": body, "sent_at": time.time()})
+        with self._lock, open(self.path, "a", encoding="utf-8") as log:
+            log.write(line + "\n")
+
+
+# Keeps messages in memory; latency and failure_rate simulate a real gateway
+class LoopbackTransport:
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.sent = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, to_phone, body):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                raise ConnectionError("loopback: simulated failure")
+            self.sent.append((to_phone, body))
+
+
+# Twilio when real credentials are configured, otherwise the local file stub.
+# SMS_TRANSPORT=twilio|file|loopback overrides the choice.
+def default_transport():
+    name = os.environ.get("SMS_TRANSPORT")
+    if name is None:
+        name = "file" if TWILIO_ACCOUNT_SID.startswith("your_") else "twilio"
+    if name == "twilio":
+        return TwilioTransport()
+    if name == "loopback":
+        return LoopbackTransport()
+    return FileTransport()
+
+
+# --- Dispatcher ---
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class SMSDispatcher:
+    def __init__(self, db_path=migrations.DONATIONS_DB, transport=None, concurrency=CONCURRENCY,
+                 batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL, max_attempts=MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.transport = transport or default_transport()
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.claim_id = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sms-dispatcher", daemon=True)
+            self._thread.start()
+
+    # Check the outbox now instead of at the next poll
+    def notify(self):
+        self._wake.set()
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # Send everything that is due; returns (sent, failed) counts
+    def drain(self):
+        conn = database.connect(self.db_path)
+        try:
+            self._recover(conn)
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                return self._drain(conn, pool)
+        finally:
+            conn.close()
+
+    def _run(self):
+        conn = database.connect(self.db_path)
+        try:
+            recovered_at = 0.0
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="sms-send") as pool:
+                while not self._stopping.is_set():
+                    try:
+                        if time.time() - recovered_at >= CLAIM_TIMEOUT:
+                            self._recover(conn)
+                            recovered_at = time.time()
+                        self._drain(conn, pool)
+                    except sqlite3.Error as e:
+                        print(f"SMS dispatcher error: {e}")
+                    self._wake.wait(self.poll_interval)
+                    self._wake.clear()
+        finally:
+            conn.close()
+
+    # Messages left in 'Sending' by a dispatcher that died go back to the
+    # queue; claims younger than CLAIM_TIMEOUT may still be in flight elsewhere
+    def _recover(self, conn):
+        with conn:
+            conn.execute("""
+                UPDATE sms_outbox SET status='Queued', claimed_by=NULL, claimed_at=NULL
+                WHERE status='Sending' AND (claimed_at IS NULL OR claimed_at < ?)
+            """, (time.time() - CLAIM_TIMEOUT,))
+
+    def _drain(self, conn, pool):
+        sent = failed = 0
+        while not self._stopping.is_set():
+            batch = self._claim(conn)
+            if not batch:
+                break
+            results = list(pool.map(self._send_one, batch))
+            self._record(conn, results)
+            sent += sum(1 for _, error in results if error is None)
+            failed += sum(1 for _, error in results if error is not None)
+        return sent, failed
+
+    # Atomically move one batch of due messages from Queued to Sending
+    def _claim(self, conn):
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("""
+                SELECT id, to_phone, body, attempts FROM sms_outbox
+                WHERE status='Queued' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id
+                LIMIT ?
+            """, (now, self.batch_size)).fetchall()
+            conn.executemany("UPDATE sms_outbox SET status='Sending', claimed_by=?, claimed_at=? WHERE id=?",
+                             [(self.claim_id, now, row[0]) for row in rows])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return rows
+
+    def _send_one(self, row):
+        try:
+            self.transport.send(row[1], row[2])
+            return row, None
+        except Exception as e:
+            return row, e
+
+    def _record(self, conn, results):
+        now = time.time()
+        done, retry, dead = [], [], []
+        for (message_id, _, _, attempts), error in results:
+            attempts += 1
+            if error is None:
+                done.append((attempts, now, message_id))
+            elif attempts >= self.max_attempts:
+                dead.append((attempts, str(error), message_id))
+            else:
+                retry.append((attempts, now + backoff_delay(attempts), str(error), message_id))
+        with conn:
+            conn.executemany("UPDATE sms_outbox SET status='Sent', attempts=?, sent_at=?, last_error=NULL WHERE id=?", done)
+            conn.executemany("UPDATE sms_outbox SET status='Queued', attempts=?, next_attempt_at=?, last_error=? WHERE id=?", retry)
+            conn.executemany("UPDATE sms_outbox SET status='Failed', attempts=?, last_error=? WHERE id=?", dead)
+
+
+# Run the dispatcher headless: python notifications.py [--once] [--transport file]
+def main():
+    parser = argparse.ArgumentParser(description="Send queued SMS notifications")
+    parser.add_argument("--db", default=migrations.DONATIONS_DB)
+    parser.add_argument("--transport", choices=["twilio", "file", "loopback"])
+    parser.add_argument("--once", action="store_true", help="send what is due and exit")
+    args = parser.parse_args()
+
+    if args.transport:
+        os.environ["SMS_TRANSPORT"] = args.transport
+    migrations.migrate(donations_db=args.db)
+    dispatcher = SMSDispatcher(args.db)
+    if args.once:
+        sent, failed = dispatcher.drain()
+        print(f"sent {sent}, failed {failed}")
+        return
+    dispatcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        dispatcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import sqlite3
 import os
 import subprocess
 import sys
+import time
+from bisect import bisect_left
+import migrations
+import data_access
+import diagnostics
+import document_store
+import expiry
+from db_worker import DBWorker
 
-# Get orphanage phone number
-if len(sys.argv) >= 2:
-    orphanage_phone = sys.argv[1]
-else:
-    # Prompt user for orphanage phone
-    root_prompt = tk.Tk()
-    root_prompt.withdraw()  # Hide the root window
-    orphanage_phone = simpledialog.askstring("Orphanage Login", "Enter your phone number:")
-    if not orphanage_phone:
-        messagebox.showerror("Error", "Phone number is required!")
-        sys.exit(1)
-
-# DB Connection
-conn = sqlite3.connect("hotel_food_donation.db")
-cursor = conn.cursor()
-
-# GUI setup
-root = tk.Tk()
-root.title(f"Orphanage Panel - {orphanage_phone}")
-root.geometry("900x400")
-
-tk.Label(root, text="Available Food Donations Requests", font=("Arial", 14, "bold")).pack(pady=10)
-frame = tk.Frame(root, bd=2, relief="solid")
-frame.pack(pady=10, padx=10, fill="both", expand=True)
-
-tree = ttk.Treeview(frame, columns=("ID", "Food", "Quantity", "Document ID", "Document Path", "Hotel", "Status", "Date"), show="headings")
-for col in tree["columns"]:
-    tree.heading(col, text=col)
-
-scrollbar = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
-tree.configure(yscrollcommand=scrollbar.set)
-scrollbar.pack(side="right", fill="y")
-tree.pack(pady=2, padx=2, fill="both", expand=True)
-
-# Load pending donations
-def load_donations():
-    tree.delete(*tree.get_children())
-    cursor.execute("""
-        SELECT id, food_name, quantity, document_id, document_path, hotel_address, status, donation_date
-        FROM food_donations
-        WHERE status='Pending' AND orphanage_phone=?
-    """, (orphanage_phone,))
-    for row in cursor.fetchall():
-        tree.insert("", "end", values=row)
-
-# Update donation status
-def update_status(accepted=True):
-    selected_item = tree.selection()
-    if not selected_item:
-        messagebox.showerror("Error", "Select a donation to update!")
-        return
-    donation_id = tree.item(selected_item[0], "values")[0]
-    new_status = "Accepted" if accepted else "Rejected"
-    cursor.execute("UPDATE food_donations SET status=? WHERE id=?", (new_status, donation_id))
-    conn.commit()
-    messagebox.showinfo("Success", f"Donation {new_status} successfully!")
-    load_donations()
-
-# Open document
-def open_document():
-    selected_item = tree.selection()
-    if not selected_item:
-        messagebox.showerror("Error", "Select a donation to open the document!")
-        return
-    document_path = tree.item(selected_item[0], "values")[4]
-    if not os.path.exists(document_path):
+REFRESH_MS = 2000  # live refresh of the pending list
+URGENT_SECONDS = 6 * 3600  # highlight donations this close to their best-before
+
+
+# Open a food testing document with the system viewer. `reference` is the
+# document's digest in document_store, or a plain path for older donations.
+def open_document_path(reference):
+    document_path = document_store.resolve(reference)
+    if document_path is None:
         messagebox.showerror("Error", "Document file not found!")
         return
     try:
@@ -81,67 +31,251 @@ def open_document():
     except Exception as e:
         messagebox.showerror("Error", f"Failed to open document: {e}")
 
-# View past donation history
-def view_past_requests():
-    past_window = tk.Toplevel(root)
-    past_window.title("Past Donation Requests")
-    past_window.geometry("900x400")
-    tk.Label(past_window, text="Past Donation Requests", font=("Arial", 14, "bold")).pack(pady=10)
-    frame_past = tk.Frame(past_window, bd=2, relief="solid")
-    frame_past.pack(pady=10, padx=10, fill="both", expand=True)
-
-    tree_past = ttk.Treeview(frame_past, columns=tree["columns"], show="headings")
-    for col in tree["columns"]:
-        tree_past.heading(col, text=col)
-
-    scrollbar_past = ttk.Scrollbar(frame_past, orient="vertical", command=tree_past.yview)
-    tree_past.configure(yscrollcommand=scrollbar_past.set)
-    scrollbar_past.pack(side="right", fill="y")
-    tree_past.pack(pady=2, padx=2, fill="both", expand=True)
-
-    cursor.execute("""
-        SELECT id, food_name, quantity, document_id, document_path, hotel_address, status, donation_date
-        FROM food_donations
-        WHERE status IN ('Accepted', 'Rejected') AND orphanage_phone=?
-    """, (orphanage_phone,))
-    for row in cursor.fetchall():
-        tree_past.insert("", "end", values=row)
-
-    def open_past_document():
-        selected_item = tree_past.selection()
+
+class OrphanagePanel:
+    def __init__(self, parent, db, orphanage_phone, user=None):
+        self.parent = parent
+        self.user = user
+        self.orphanage_phone = orphanage_phone
+        self.watermark = None
+        self.refresh_job = None
+        self.order = []  # sorted (best_before_ts, id) of the rows shown, most urgent first
+
+        self.container = tk.Frame(parent)
+        self.container.pack(fill="both", expand=True)
+        # Callbacks for this panel are dropped once it is closed
+        self.db = db.scoped(self.container)
+
+        tk.Label(self.container, text="Available Food Donations Requests", font=("Arial", 14, "bold")).pack(pady=10)
+        frame = tk.Frame(self.container, bd=2, relief="solid")
+        frame.pack(pady=10, padx=10, fill="both", expand=True)
+
+        # "Document" (the document reference) and "Deadline" (best-before epoch
+        # seconds, used for ordering) are not displayed
+        self.tree = ttk.Treeview(frame, columns=("ID", "Food", "Quantity", "Document ID", "Document Path", "Hotel", "Status", "Date",
+                                                 "Document", "Best Before", "Deadline"), show="headings")
+        self.tree["displaycolumns"] = self.tree["columns"][:8] + ("Best Before",)
+        for col in self.tree["columns"]:
+            self.tree.heading(col, text=col)
+        self.tree.tag_configure("urgent", background="#f8d7da")
+
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.pack(pady=2, padx=2, fill="both", expand=True)
+
+        # Buttons
+        tk.Button(self.container, text="Accept", command=lambda: self.update_status(True), font=("Arial", 12), bg="green", fg="white").pack(pady=5, side="left", padx=20)
+        tk.Button(self.container, text="Reject", command=lambda: self.update_status(False), font=("Arial", 12), bg="red", fg="white").pack(pady=5, side="left", padx=20)
+        tk.Button(self.container, text="View Document", command=self.open_document, font=("Arial", 12), bg="blue", fg="white").pack(pady=5, side="left", padx=20)
+        tk.Button(self.container, text="Preview", command=self.preview_document, font=("Arial", 12), bg="#6c757d", fg="white").pack(pady=5, side="left", padx=20)
+        tk.Button(self.container, text="View All Requests", command=self.view_past_requests, font=("Arial", 12), bg="#17a2b8", fg="white").pack(pady=5, side="right", padx=20)
+
+        # Load data, then keep it live
+        self.load_donations()
+
+    # Load pending donations
+    @diagnostics.timed("OrphanagePanel.load_donations")
+    def load_donations(self):
+        self.db.submit(data_access.pending_snapshot, self.orphanage_phone, on_done=self.show_donations)
+
+    def show_donations(self, snapshot):
+        rows, self.watermark = snapshot
+        self.tree.delete(*self.tree.get_children())
+        self.order = []
+        for row in rows:
+            self.place_row(row)
+        self.mark_urgent()
+        self.schedule_refresh()
+
+    # Insert or move a row to its place in deadline order
+    def place_row(self, row):
+        iid = str(row[0])
+        if self.tree.exists(iid):
+            self.remove_row(iid)
+        key = (row[10] if row[10] is not None else float("inf"), row[0])
+        index = bisect_left(self.order, key)
+        self.order.insert(index, key)
+        self.tree.insert("", index, iid=iid, values=row)
+
+    def remove_row(self, iid):
+        values = self.tree.item(iid, "values")
+        deadline = float(values[10]) if values[10] not in ("", "None") else float("inf")
+        index = bisect_left(self.order, (deadline, int(values[0])))
+        if index < len(self.order) and self.order[index][1] == int(values[0]):
+            del self.order[index]
+        self.tree.delete(iid)
+
+    # Only the front of the deadline order can be urgent
+    def mark_urgent(self):
+        cutoff = time.time() + URGENT_SECONDS
+        for deadline, donation_id in self.order:
+            if deadline > cutoff:
+                break
+            self.tree.item(str(donation_id), tags=("urgent",))
+
+    # Poll for new and changed donations; only the differences touch the Treeview
+    def schedule_refresh(self):
+        if self.refresh_job is None:
+            self.refresh_job = self.container.after(REFRESH_MS, self.refresh)
+
+    @diagnostics.timed("OrphanagePanel.refresh")
+    def refresh(self):
+        self.refresh_job = None
+        self.db.submit(data_access.pending_changes, self.orphanage_phone, self.watermark,
+                       on_done=self.apply_changes, on_error=lambda _: self.schedule_refresh(), quiet=True)
+
+    def apply_changes(self, changes):
+        if changes is not None:
+            self.watermark, rows, removed_ids, reset = changes
+            if reset:
+                self.tree.delete(*self.tree.get_children())
+                self.order = []
+            for donation_id in removed_ids:
+                if self.tree.exists(str(donation_id)):
+                    self.remove_row(str(donation_id))
+            for row in rows:
+                self.place_row(row)
+        self.mark_urgent()
+        self.schedule_refresh()
+
+    # Update donation status
+    @diagnostics.timed("OrphanagePanel.update_status")
+    def update_status(self, accepted=True):
+        selected_item = self.tree.selection()
+        if not selected_item:
+            messagebox.showerror("Error", "Select a donation to update!")
+            return
+        donation_id = self.tree.item(selected_item[0], "values")[0]
+        new_status = "Accepted" if accepted else "Rejected"
+
+        def on_updated(updated):
+            if self.tree.exists(str(donation_id)):
+                self.remove_row(str(donation_id))
+            if updated:
+                messagebox.showinfo("Success", f"Donation {new_status} successfully!")
+            else:
+                messagebox.showerror("Error", "This donation is no longer pending (it may have expired).")
+
+        self.db.submit(data_access.set_donation_status, donation_id, new_status, on_done=on_updated)
+
+    # Open document
+    def open_document(self):
+        selected_item = self.tree.selection()
         if not selected_item:
             messagebox.showerror("Error", "Select a donation to open the document!")
             return
-        document_path = tree_past.item(selected_item[0], "values")[4]
-        if not os.path.exists(document_path):
-            messagebox.showerror("Error", "Document file not found!")
+        open_document_path(self.tree.item(selected_item[0], "values")[8])
+
+    # Thumbnail / first-page preview, rendered once on the database worker and cached
+    def preview_document(self):
+        selected_item = self.tree.selection()
+        if not selected_item:
+            messagebox.showerror("Error", "Select a donation to preview the document!")
+            return
+        reference = self.tree.item(selected_item[0], "values")[8]
+        if not document_store.is_digest(reference):
+            messagebox.showinfo("Preview", "No preview for documents outside the document store.")
             return
-        try:
-            if os.name == 'nt':
-                os.startfile(document_path)
-            else:
-                subprocess.run(["xdg-open", document_path])
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to open document: {e}")
+        self.db.submit(lambda _, digest: document_store.thumbnail(digest), reference, on_done=self.show_preview)
 
-    tk.Button(past_window, text="View Document", command=open_past_document, font=("Arial", 12), bg="blue", fg="white").pack(pady=5)
+    def show_preview(self, thumb_path):
+        if thumb_path is None:
+            messagebox.showinfo("Preview", "No preview available for this document.")
+            return
+        window = tk.Toplevel(self.container)
+        window.title("Document Preview")
+        image = tk.PhotoImage(master=window, file=thumb_path)
+        label = tk.Label(window, image=image)
+        label.image = image  # keep a reference
+        label.pack(padx=10, pady=10)
 
-# Buttons
-tk.Button(root, text="Accept", command=lambda: update_status(True), font=("Arial", 12), bg="green", fg="white").pack(pady=5, side="left", padx=20)
-tk.Button(root, text="Reject", command=lambda: update_status(False), font=("Arial", 12), bg="red", fg="white").pack(pady=5, side="left", padx=20)
-tk.Button(root, text="View Document", command=open_document, font=("Arial", 12), bg="blue", fg="white").pack(pady=5, side="left", padx=20)
-tk.Button(root, text="View All Requests", command=view_past_requests, font=("Arial", 12), bg="#17a2b8", fg="white").pack(pady=5, side="right", padx=20)
+    # View past donation history
+    @diagnostics.timed("OrphanagePanel.view_past_requests")
+    def view_past_requests(self):
+        past_window = tk.Toplevel(self.container)
+        past_window.title("Past Donation Requests")
+        past_window.geometry("900x400")
+        tk.Label(past_window, text="Past Donation Requests", font=("Arial", 14, "bold")).pack(pady=10)
+        frame_past = tk.Frame(past_window, bd=2, relief="solid")
+        frame_past.pack(pady=10, padx=10, fill="both", expand=True)
 
-# Handle close event and navigate to homepage.py
-def on_closing():
-    root.destroy()
-    try:
-        subprocess.Popen(["python", "homepage.py"])
-    except Exception as e:
-        print(f"Error launching homepage.py: {e}")
+        tree_past = ttk.Treeview(frame_past, columns=self.tree["columns"], show="headings")
+        tree_past["displaycolumns"] = self.tree["displaycolumns"]
+        for col in self.tree["columns"]:
+            tree_past.heading(col, text=col)
+
+        scrollbar_past = ttk.Scrollbar(frame_past, orient="vertical", command=tree_past.yview)
+        tree_past.configure(yscrollcommand=scrollbar_past.set)
+        scrollbar_past.pack(side="right", fill="y")
+        tree_past.pack(pady=2, padx=2, fill="both", expand=True)
+
+        def show_past(rows):
+            if not tree_past.winfo_exists():
+                return
+            for row in rows:
+                tree_past.insert("", "end", values=row)
+
+        # Recent history first; archived donations (see archive.py) are read afterwards
+        def show_recent(rows):
+            show_past(rows)
+            self.db.submit(data_access.archived_donations, self.orphanage_phone, on_done=show_past, quiet=True)
+
+        self.db.submit(data_access.past_donations, self.orphanage_phone, on_done=show_recent)
+
+        def open_past_document():
+            selected_item = tree_past.selection()
+            if not selected_item:
+                messagebox.showerror("Error", "Select a donation to open the document!")
+                return
+            open_document_path(tree_past.item(selected_item[0], "values")[8])
+
+        tk.Button(past_window, text="View Document", command=open_past_document, font=("Arial", 12), bg="blue", fg="white").pack(pady=5)
+
+    # Called by the application shell before the view is replaced
+    def close(self):
+        if self.refresh_job is not None:
+            self.container.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        self.container.destroy()
+
+
+# Standalone window (the application shell in homepage.py embeds OrphanagePanel instead)
+def main():
+    # Get orphanage phone number
+    if len(sys.argv) >= 2:
+        orphanage_phone = sys.argv[1]
+    else:
+        # Prompt user for orphanage phone
+        root_prompt = tk.Tk()
+        root_prompt.withdraw()  # Hide the root window
+        orphanage_phone = simpledialog.askstring("Orphanage Login", "Enter your phone number:")
+        if not orphanage_phone:
+            messagebox.showerror("Error", "Phone number is required!")
+            sys.exit(1)
+        root_prompt.destroy()
+
+    # DB setup
+    migrations.migrate()
+
+    # GUI setup
+    root = tk.Tk()
+    root.title(f"Orphanage Panel - {orphanage_phone}")
+    root.geometry("900x400")
+
+    db = DBWorker(root)
+    OrphanagePanel(root, db, orphanage_phone)
+    expiry_scheduler = expiry.ExpiryScheduler()
+    expiry_scheduler.start()
+
+    def on_closing():
+        expiry_scheduler.stop()
+        db.stop()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.mainloop()
 
-root.protocol("WM_DELETE_WINDOW", on_closing)
 
-# Load data
-load_donations()
-root.mainloop()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import itertools
+import threading
+from bisect import bisect_left
+
+import database
+
+# In-memory directory of orphanages for the hotel forms (hotel.py, ht1.py).
+# The orphanages are read from users.db once and indexed by phone, name and
+# organization prefix, so the orphanage field can suggest matches as the hotel
+# types and a submit can check the phone without a database round trip.
+# The directory is reloaded only when users.db changed: load() compares
+# PRAGMA data_version on a connection of its own that never writes, which
+# changes with every commit to users.db by any connection, so checking costs
+# one pragma.
+
+SUGGESTIONS = 8
+
+_local = threading.local()
+_opened = itertools.count(1)
+
+
+# Prefix index over (key, entry) pairs: the keys sorted, so every key starting
+# with a prefix is one contiguous run found by bisection (a trie flattened into
+# an array)
+class PrefixIndex:
+    def __init__(self, pairs):
+        pairs = sorted(pairs, key=lambda pair: pair[0])
+        self.keys = [key for key, _ in pairs]
+        self.entries = [entry for _, entry in pairs]
+
+    def find(self, prefix, limit):
+        found = []
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and len(found) < limit and self.keys[i].startswith(prefix):
+            found.append(self.entries[i])
+            i += 1
+        return found
+
+
+def _words(text):
+    # "Aarav Home 12" is found by "aarav", "home" and "12"
+    words = (text or "").lower().split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class OrphanageDirectory:
+    # rows: (phone, name, organization_name, address)
+    def __init__(self, rows):
+        self.by_phone = {}
+        for row in rows:
+            self.by_phone.setdefault(row[0], row)
+        entries = list(self.by_phone.values())
+        self.phones = PrefixIndex((entry[0], entry) for entry in entries)
+        self.names = PrefixIndex((key, entry) for entry in entries
+                                 for key in set(_words(entry[1]) + _words(entry[2])))
+
+    def __len__(self):
+        return len(self.by_phone)
+
+    # (phone, name, organization_name, address), or None when no orphanage has the phone
+    def lookup(self, phone):
+        return self.by_phone.get(phone)
+
+    # Orphanages whose phone, or a word of whose name or organization, starts with `text`
+    def complete(self, text, limit=SUGGESTIONS):
+        text = text.strip()
+        if not text:
+            return []
+        found = self.phones.find(text, limit)
+        for entry in self.names.find(text.lower(), limit * 2):
+            if len(found) >= limit:
+                break
+            if entry not in found:
+                found.append(entry)
+        return found
+
+    @staticmethod
+    def label(entry):
+        phone, name, organization, address = entry
+        return f"{phone}  {organization or name}" + (f" ({address})" if address else "")
+
+
+# The thread's plain users.db connection (database.thread_connection, closed
+# with the thread's other connections), used only for the version check and
+# the load: data_version only counts commits by other connections, so nothing
+# may write through it. A new connection gets a new token, since
+# data_version numbering restarts.
+def _connection(users_db):
+    conn = database.thread_connection(users_db)
+    if conn is not getattr(_local, "conn", None):
+        _local.conn, _local.token = conn, next(_opened)
+    return conn, _local.token
+
+
+# Version of users.db as seen from this thread: it changes with every commit
+# to users.db by another connection. Also used by matching.orphanage_index.
+def users_version(db):
+    conn, token = _connection(db.users_db)
+    return token, conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+# Runs on the database worker (db is a db_worker.Connections). Returns None
+# when users.db is unchanged since `version`, else (version, OrphanageDirectory).
+def load(db, version=None):
+    current = users_version(db)
+    if current == version:
+        return None
+    rows = _connection(db.users_db)[0].execute("""
+        SELECT phone, name, organization_name, address FROM users WHERE role = 'Orphanage' ORDER BY id
+    """).fetchall()
+    return current, OrphanageDirectory(rows)
+
+
+# The directory as held by one form on the Tk thread; `db` is its DBWorker
+class DirectoryCache:
+    def __init__(self, db):
+        self.db = db
+        self.directory = None
+        self.version = None
+
+    # Reload if users.db changed; on_ready() is called once the check is done
+    def refresh(self, on_ready=None):
+        def loaded(result):
+            if result is not None:
+                self.version, self.directory = result
+            if on_ready is not None:
+                on_ready()
+
+        def failed(_error):
+            if on_ready is not None:
+                on_ready()
+        self.db.submit(load, self.version, on_done=loaded, on_error=failed, quiet=True)
+
+    # [(phone, label)] for the autocomplete list
+    def complete(self, text):
+        if self.directory is None:
+            return []
+        return [(entry[0], self.directory.label(entry)) for entry in self.directory.complete(text)]
+
+    # Calls on_valid() or on_invalid(). A known phone needs no database work;
+    # an unknown one is checked again after reloading a changed directory.
+    # Without a directory (it failed to load) the phone is left to the insert.
+    def validate(self, phone, on_valid, on_invalid):
+        if self.directory is not None and self.directory.lookup(phone) is not None:
+            on_valid()
+            return
+
+        def recheck():
+            if self.directory is None or self.directory.lookup(phone) is not None:
+                on_valid()
+            else:
+                on_invalid()
+        self.refresh(recheck)
@@ -0,0 +1,63 @@
+import re
+
+# Full-text search over the FTS5 shadow tables created in migrations.py.
+# Every word typed by the admin becomes a prefix term; all terms must match
+# and results come back best match first (bm25). Ranking is done over the
+# newest SEARCH_CANDIDATES hits so broad terms ("pending") stay cheap on big tables.
+
+SEARCH_LIMIT = 500
+SEARCH_CANDIDATES = 2000
+
+USER_COLUMNS = "users.id, users.name, users.email, users.phone, users.role, users.address, users.organization_name"
+# Same columns as data_access.FOOD_SELECT (orphanage and hotel names joined from users)
+DONATION_COLUMNS = ("d.id, d.food_name, d.quantity, d.document_path, d.document_id, d.orphanage_phone, "
+                    "COALESCE(o.organization_name, o.name), COALESCE(h.organization_name, h.name), "
+                    "d.hotel_address, d.donation_date, d.status")
+ARCHIVED_SUFFIX = " (archived)"  # appended to the status of archived donations
+ARCHIVE_COLUMNS = DONATION_COLUMNS.replace("d.status", f"d.status || '{ARCHIVED_SUFFIX}'")
+
+
+# Turn free text into an FTS5 query: "rice 98" -> "rice"* "98"*
+def match_expression(keyword):
+    terms = re.findall(r"\w+", keyword.lower())
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_users(cursor, keyword, limit=SEARCH_LIMIT):
+    match = match_expression(keyword)
+    if not match:
+        return []
+    cursor.execute(f"""
+        SELECT {USER_COLUMNS}
+        FROM (
+            SELECT rowid, bm25(users_fts) AS score FROM users_fts
+            WHERE users_fts MATCH ?
+            ORDER BY rowid DESC
+            LIMIT ?
+        ) AS hits JOIN users ON users.id = hits.rowid
+        ORDER BY hits.score
+        LIMIT ?
+    """, (match, SEARCH_CANDIDATES, limit))
+    return cursor.fetchall()
+
+
+# archive=True searches food_donations_archive (see archive.py) instead
+def search_donations(cursor, keyword, limit=SEARCH_LIMIT, archive=False):
+    match = match_expression(keyword)
+    if not match:
+        return []
+    table = "food_donations_archive" if archive else "food_donations"
+    cursor.execute(f"""
+        SELECT {ARCHIVE_COLUMNS if archive else DONATION_COLUMNS}
+        FROM (
+            SELECT rowid, bm25({table}_fts) AS score FROM {table}_fts
+            WHERE {table}_fts MATCH ?
+            ORDER BY rowid DESC
+            LIMIT ?
+        ) AS hits JOIN {table} d ON d.id = hits.rowid
+        LEFT JOIN users o ON o.id = d.orphanage_id
+        LEFT JOIN users h ON h.id = d.hotel_id
+        ORDER BY hits.score
+        LIMIT ?
+    """, (match, SEARCH_CANDIDATES, limit))
+    return cursor.fetchall()
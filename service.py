@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import data_access
+import expiry
+import migrations
+import notifications
+import service_client
+from db_worker import Connections
+
+# Headless HTTP/JSON service over the data_access functions (see
+# service_client.py for the protocol). An asyncio server parses requests and
+# hands the database work to threads: reads go to a pool of READERS threads,
+# writes to a single writer thread, so writes never contend for the SQLite
+# write lock among themselves and reads (WAL) never wait for them. Every thread
+# reuses its own connection (database.thread_connection). Connections are
+# kept alive between requests. The SMS dispatcher and the expiry scheduler run
+# in the same process.
+# Usage: python service.py [--host 127.0.0.1] [--port 8765] [--readers 4]
+
+HOST = "127.0.0.1"  # local clients only; there is no authentication
+PORT = 8765
+READERS = 4
+MAX_BODY = 1024 * 1024
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def error_status(error):
+    if isinstance(error, sqlite3.IntegrityError):
+        return 409
+    if isinstance(error, sqlite3.OperationalError):
+        return 503  # e.g. database is locked
+    if isinstance(error, (ValueError, TypeError)):
+        return 400
+    return 500
+
+
+class Service:
+    # on_write() is called after each write, e.g. to wake the SMS dispatcher
+    def __init__(self, users_db=migrations.USERS_DB, donations_db=migrations.DONATIONS_DB, readers=READERS, on_write=None):
+        self.on_write = on_write
+        self.connections = Connections(users_db, donations_db)
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix="service-read")
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="service-write")
+        self.operations = {name: (getattr(data_access, name), self.readers) for name in service_client.READ_OPERATIONS}
+        self.operations.update({name: (getattr(data_access, name), self.writer) for name in service_client.WRITE_OPERATIONS})
+
+    async def call(self, operation, args):
+        fn, executor = self.operations[operation]
+        if operation == "pending_changes":
+            # The watermark's data_version belongs to whichever reader connection
+            # produced it; drop it so the changes are always looked up
+            args = [args[0], [None] + list(args[1][1:])]
+        result = await asyncio.get_running_loop().run_in_executor(executor, fn, self.connections, *args)
+        if executor is self.writer and self.on_write is not None:
+            self.on_write()
+        return result
+
+    # (status, payload) for one request
+    async def dispatch(self, method, target, body):
+        path = urlsplit(target).path
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if not path.startswith("/api/"):
+            return 404, {"error": f"no such path: {path}"}
+        operation = path[len("/api/"):]
+        if operation not in self.operations:
+            return 404, {"error": f"no such operation: {operation}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            args = json.loads(body or b"{}").get("args", [])
+            return 200, {"result": await self.call(operation, list(args))}
+        except Exception as e:
+            return error_status(e), {"error": str(e), "type": type(e).__name__}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {"error": "request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                status, payload = await self.dispatch(method, target, body)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # client went away or sent a malformed request
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        writer.write((f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                      f"Content-Type: application/json\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + body)
+        await writer.drain()
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"serving on http://{host}:{port}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        # Close the writer's connection; reader threads exit with the process
+        self.writer.submit(self.connections.close).result()
+        self.writer.shutdown()
+        self.readers.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON service for the donation system")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--readers", type=int, default=READERS)
+    parser.add_argument("--users-db", default=migrations.USERS_DB)
+    parser.add_argument("--donations-db", default=migrations.DONATIONS_DB)
+    args = parser.parse_args()
+
+    migrations.migrate(args.users_db, args.donations_db)
+    sms_dispatcher = notifications.SMSDispatcher(args.donations_db)
+    expiry_scheduler = expiry.ExpiryScheduler(args.donations_db, on_expired=lambda _: sms_dispatcher.notify())
+    sms_dispatcher.start()
+    expiry_scheduler.start()
+    service = Service(args.users_db, args.donations_db, args.readers, on_write=sms_dispatcher.notify)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        expiry_scheduler.stop()
+        sms_dispatcher.stop()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
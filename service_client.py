@@ -0,0 +1,89 @@
+import http.client
+import json
+import os
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+
+# Client for service.py, the local HTTP/JSON API.
+# Each operation is a data_access function called remotely:
+#   POST /api/<name>  {"args": [...]}  ->  {"result": ...} or {"error": ..., "type": ...}
+# The database worker (db_worker.DBWorker) sends the operations listed below
+# to the service when HFD_SERVICE_URL is set, so the panels run as thin
+# clients; everything else (imports, exports, documents, admin edits) still
+# runs locally. Rows come back as JSON lists instead of tuples.
+
+SERVICE_URL_ENV = "HFD_SERVICE_URL"  # e.g. http://127.0.0.1:8765
+TIMEOUT = 30
+
+# Operations served from the reader pool
+READ_OPERATIONS = {
+    "find_user", "find_orphanage", "donation_status", "pending_snapshot", "pending_changes", "past_donations",
+    "archived_donations",
+    "search_users", "search_donations", "users_page", "user_row", "food_page", "food_row", "analytics",
+}
+# Operations run one at a time by the service's single writer
+WRITE_OPERATIONS = {"register_user", "submit_donation", "submit_food_request", "set_donation_status", "queue_sms"}
+
+# Error types re-raised on the client, so callers can keep their except clauses
+ERROR_TYPES = {
+    "IntegrityError": sqlite3.IntegrityError,
+    "OperationalError": sqlite3.OperationalError,
+    "ValueError": ValueError,
+    "OSError": OSError,
+    "FileNotFoundError": FileNotFoundError,
+}
+
+
+class ServiceError(RuntimeError):
+    pass
+
+
+class ServiceClient:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self._local = threading.local()
+
+    # True when `fn` is a data_access function the service provides
+    def handles(self, fn):
+        return getattr(fn, "__module__", None) == "data_access" and fn.__name__ in READ_OPERATIONS | WRITE_OPERATIONS
+
+    # One keep-alive connection per calling thread
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=TIMEOUT)
+        return conn
+
+    def call(self, operation, *args):
+        body = json.dumps({"args": args})
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", f"/api/{operation}", body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                payload = json.loads(response.read() or b"{}")
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # The service closed an idle connection; reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise ERROR_TYPES.get(payload.get("type"), ServiceError)(payload.get("error", f"HTTP {response.status}"))
+        return payload["result"]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+# ServiceClient for HFD_SERVICE_URL, or None to use the database directly
+def from_environment():
+    url = os.environ.get(SERVICE_URL_ENV)
+    return ServiceClient(url) if url else None
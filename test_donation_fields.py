@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import time
+import unittest
+
+import donation_fields
+import migrations
+
+# Best-before deadlines are real epoch seconds for the hotel's local times.
+# Run with a non-UTC zone pinned so local and UTC wall-clock times differ.
+# Usage: python -m unittest test_donation_fields
+
+IST = "Asia/Kolkata"  # UTC+05:30
+HOUR = 3600
+
+
+class BestBeforeTimeZoneTest(unittest.TestCase):
+    def setUp(self):
+        self.saved_tz = os.environ.get("TZ")
+        os.environ["TZ"] = IST
+        time.tzset()
+
+    def tearDown(self):
+        if self.saved_tz is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = self.saved_tz
+        time.tzset()
+
+    def test_explicit_time_is_local(self):
+        # 2026-10-01 18:30 IST is 13:00 UTC
+        deadline = donation_fields.parse_best_before("2026-10-01 18:30", "2026-10-01")
+        self.assertEqual(deadline, 1790859600)
+        self.assertEqual(time.strftime("%Y-%m-%d %H:%M", time.localtime(deadline)), "2026-10-01 18:30")
+
+    def test_defaults_start_at_local_midnight(self):
+        midnight = int(time.mktime((2026, 10, 1, 0, 0, 0, 0, 0, -1)))
+        self.assertEqual(donation_fields.parse_best_before("", "2026-10-01"),
+                         midnight + donation_fields.DEFAULT_SHELF_LIFE_HOURS * HOUR)
+        self.assertEqual(donation_fields.parse_best_before("2026-10-02", "2026-10-01"), midnight + 48 * HOUR)
+
+    def test_backfill_matches_new_rows(self):
+        donation_ts = donation_fields.date_to_ts("2026-10-01")
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE food_donations (donation_ts INTEGER)")
+        conn.execute("INSERT INTO food_donations VALUES (?)", (donation_ts,))
+        for statement in dict(migrations.DONATIONS_MIGRATIONS)[10][:2]:
+            conn.execute(statement)
+        self.assertEqual(conn.execute("SELECT best_before_ts FROM food_donations").fetchone()[0],
+                         donation_fields.parse_best_before("", "2026-10-01"))
+
+    def test_display_is_local(self):
+        deadline = donation_fields.parse_best_before("2026-10-01 18:30", "2026-10-01")
+        conn = sqlite3.connect(":memory:")
+        shown = conn.execute("SELECT strftime('%Y-%m-%d %H:%M', ?, 'unixepoch', 'localtime')", (deadline,)).fetchone()[0]
+        self.assertEqual(shown, "2026-10-01 18:30")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,196 @@
+import tkinter as tk
+
+# Virtual grid for large tables shown in a ttk.Treeview.
+# Rows are fetched with keyset pagination over the integer id column and only a
+# sliding window of pages is kept in the tree: the visible rows plus a prefetch
+# margin. Scrolling near either edge of the window fetches the next/previous
+# page and drops the page furthest away. Each tree item uses the row id as iid
+# so a single row can be refreshed or removed after an edit, and after a bulk
+# edit only the affected rows inside the window are touched.
+#
+# Fetches are asynchronous: fetch_page/fetch_row receive a callback that is
+# called with the rows once they arrive (see db_worker.DBWorker). Results that
+# arrive after the grid was reloaded are ignored. fetch_page also gets an
+# error callback; a failed page fetch is retried on the next scroll.
+
+PAGE_SIZE = 100
+MAX_PAGES = 5  # rows kept in the tree = PAGE_SIZE * MAX_PAGES
+PREFETCH_MARGIN = 0.15  # fraction of the window left before the next page is fetched
+
+
+class VirtualGrid:
+    def __init__(self, tree, fetch_page, fetch_row, scrollbar=None, page_size=PAGE_SIZE, max_pages=MAX_PAGES,
+                 fetch_rows=None):
+        self.tree = tree
+        self.fetch_page = fetch_page  # fetch_page(anchor_id, limit, forward, on_rows, on_error)
+        self.fetch_row = fetch_row  # fetch_row(row_id, on_row), row is None when deleted
+        self.fetch_rows = fetch_rows  # fetch_rows(row_ids, on_rows), deleted rows are left out
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.pages = []  # lists of row ids currently in the tree, in order
+        self.more_before = False
+        self.more_after = False
+        self.paging = False
+        self.loading = False
+        self.generation = 0  # bumped on every reload so stale fetches are dropped
+        self.tree.configure(yscrollcommand=self._on_scroll)
+
+    # Show the first page of the table
+    def reload(self):
+        self._clear()
+        self.paging = True
+        self.loading = True
+        self.fetch_page(0, self.page_size, True, self._guard(self._show_first_page), self._guard(self._page_failed))
+
+    def _show_first_page(self, rows):
+        self.loading = False
+        self.more_after = len(rows) == self.page_size
+        if rows:
+            self.pages.append(self._insert_rows(rows, tk.END))
+        self.tree.yview_moveto(0)
+
+    # Show a fixed result set (e.g. search results) without paging
+    def show_rows(self, rows):
+        self._clear()
+        self.paging = False
+        self.pages.append(self._insert_rows(rows, tk.END))
+        self.tree.yview_moveto(0)
+
+    # Re-read one row after an update; rows outside the window are left alone
+    def refresh_row(self, row_id):
+        if not self.tree.exists(str(row_id)):
+            return
+        self.fetch_row(row_id, self._guard(lambda row: self._apply_row(row_id, row)))
+
+    def _apply_row(self, row_id, row):
+        if row is None:
+            self.remove_row(row_id)
+        elif self.tree.exists(str(row_id)):
+            self.tree.item(str(row_id), values=row)
+
+    # Re-read the rows among `row_ids` that are in the window, in one fetch
+    def refresh_rows(self, row_ids):
+        present = self._present(row_ids)
+        if not present:
+            return
+        if self.fetch_rows is None:
+            for iid in present:
+                self.refresh_row(iid)
+            return
+        self.fetch_rows(present, self._guard(lambda rows: self._apply_rows(present, rows)))
+
+    def _apply_rows(self, row_ids, rows):
+        found = {str(row[0]): row for row in rows}
+        self.remove_rows([iid for iid in row_ids if iid not in found])
+        for iid, row in found.items():
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=row)
+
+    def remove_rows(self, row_ids):
+        present = self._present(row_ids)
+        if not present:
+            return
+        self.tree.delete(*present)
+        removed = set(present)
+        self.pages = [[iid for iid in page if iid not in removed] for page in self.pages]
+        self.pages = [page for page in self.pages if page]
+
+    # iids of the window's rows among `row_ids` (which may be far more than the window)
+    def _present(self, row_ids):
+        wanted = {str(row_id) for row_id in row_ids}
+        return [iid for page in self.pages for iid in page if iid in wanted]
+
+    def remove_row(self, row_id):
+        iid = str(row_id)
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+        for page in self.pages:
+            if iid in page:
+                page.remove(iid)
+        self.pages = [page for page in self.pages if page]
+
+    # Wrap a fetch callback so it is skipped if the grid was reloaded meanwhile
+    def _guard(self, callback):
+        generation = self.generation
+
+        def guarded(value):
+            if generation == self.generation:
+                callback(value)
+        return guarded
+
+    def _clear(self):
+        self.generation += 1
+        self.loading = False
+        self.tree.delete(*self.tree.get_children())
+        self.pages = []
+        self.more_before = False
+        self.more_after = False
+
+    def _insert_rows(self, rows, index):
+        iids = []
+        for offset, row in enumerate(rows):
+            iid = str(row[0])
+            position = index if index == tk.END else index + offset
+            self.tree.insert("", position, iid=iid, values=row)
+            iids.append(iid)
+        return iids
+
+    def _on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if not self.paging or self.loading or not self.pages:
+            return
+        if float(last) >= 1 - PREFETCH_MARGIN and self.more_after:
+            self.loading = True
+            self.fetch_page(int(self.pages[-1][-1]), self.page_size, True, self._guard(self._append_page),
+                            self._guard(lambda error: self._page_failed(error, after=True)))
+        elif float(first) <= PREFETCH_MARGIN and self.more_before:
+            self.loading = True
+            self.fetch_page(int(self.pages[0][0]), self.page_size, False, self._guard(self._prepend_page),
+                            self._guard(lambda error: self._page_failed(error, before=True)))
+
+    # A page fetch failed: allow paging again in the direction that failed
+    def _page_failed(self, _error, before=False, after=False):
+        self.loading = False
+        self.more_before = self.more_before or before
+        self.more_after = self.more_after or after
+
+    def _append_page(self, rows):
+        try:
+            self.more_after = len(rows) == self.page_size
+            if not rows:
+                return
+            anchor = self._top_item()
+            self.pages.append(self._insert_rows(rows, tk.END))
+            if len(self.pages) > self.max_pages:
+                self.tree.delete(*self.pages.pop(0))
+                self.more_before = True
+            self._restore_view(anchor)
+        finally:
+            self.loading = False
+
+    def _prepend_page(self, rows):
+        try:
+            self.more_before = len(rows) == self.page_size
+            if not rows:
+                return
+            anchor = self._top_item()
+            self.pages.insert(0, self._insert_rows(rows, 0))
+            if len(self.pages) > self.max_pages:
+                self.tree.delete(*self.pages.pop())
+                self.more_after = True
+            self._restore_view(anchor)
+        finally:
+            self.loading = False
+
+    # First row currently visible, used to keep the view steady while pages change
+    def _top_item(self):
+        return self.tree.identify_row(1)
+
+    def _restore_view(self, anchor):
+        if not anchor or not self.tree.exists(anchor):
+            return
+        total = len(self.tree.get_children())
+        if total:
+            self.tree.yview_moveto(self.tree.index(anchor) / total)